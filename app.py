@@ -11,6 +11,8 @@ import player_matching as match
 import court_designer as designer
 import leaderboard as lb
 import storage
+import persistence_worker
+import rating_engines
 
 # Set page configuration
 st.set_page_config(
@@ -42,6 +44,12 @@ storage.initialize_storage()
 
 # Инициализация session state и загрузка данных произошла в storage.initialize_storage()
 
+# Рейтинги пересчитаны другим движком при загрузке - сообщаем один раз
+if st.session_state.get('rating_engine_changed'):
+    previous_engine, current_engine = st.session_state.pop('rating_engine_changed')
+    st.info(f"Ratings were recalculated with the {rating_engines.ENGINES[current_engine]['label']} engine "
+            f"(previously {rating_engines.ENGINES.get(previous_engine, {}).get('label', previous_engine)}).")
+
 if 'courts' not in st.session_state:
     st.session_state.courts = []
 
@@ -114,6 +122,18 @@ with tab1:
                     **Algorithm Description:** 
                     Random distribution of players across courts without considering ratings.
                 """)
+            
+            # Rating engine used for skill-based balancing; switching recalculates all ratings
+            engine_names = list(rating_engines.ENGINES)
+            st.selectbox(
+                "Rating engine:",
+                engine_names,
+                index=engine_names.index(rating_engines.selected_engine()),
+                format_func=lambda name: rating_engines.ENGINES[name]['label'],
+                key="rating_engine_select",
+                on_change=pm.select_rating_engine,
+                args=("rating_engine_select",),
+            )
         
         # Check if tournament is active and has participants
         active_tournament_id = st.session_state.get('active_tournament_id')
@@ -370,5 +390,11 @@ if st.session_state.get('show_results_notification', False):
 # Автоматическое сохранение данных
 storage.auto_save_data()
 
+# Фоновая запись повторяет неудавшиеся сохранения, но пользователь должен о них знать
+write_errors = persistence_worker.write_errors()
+if write_errors:
+    st.warning("Some data could not be saved yet and will be retried: " +
+               "; ".join(f"{key}: {error}" for key, error in write_errors.items()))
+
 # Enable auto-refresh if timer is active
 enable_auto_refresh()
@@ -0,0 +1,220 @@
+"""
+Бенчмарк хранилища: время сохранения и загрузки, пиковая память и размер файлов
+
+Генерирует синтетических игроков и историю игр (synthetic_data) для масштабов клуба, лиги и федерации
+и замеряет основные операции storage для каждого бэкенда. Каждый замер выполняется
+в отдельном временном каталоге.
+
+Запуск:
+    python benchmark_storage.py
+    python benchmark_storage.py --scales club league --backends json --csv results.csv
+
+Пиковая память считается через tracemalloc и учитывает только объекты Python
+(буферы Arrow и SQLite в нее не входят). Трассировка памяти замедляет операции
+в несколько раз, поэтому время и память замеряются в двух отдельных прогонах.
+"""
+import os
+
+# Записи выполняются синхронно, чтобы время записи попадало в замер
+os.environ['ROTATION_ASYNC_WRITES'] = '0'
+
+import gc
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import storage
+import sqlite_storage
+import history_archive
+import game_store
+import synthetic_data
+
+# Масштаб: (количество игр, количество игроков)
+SCALES = {
+    'club': (1_000, 50),
+    'league': (100_000, 2_000),
+    'federation': (1_000_000, 20_000),
+}
+
+BACKENDS = ['json', 'sqlite']
+
+# Доля игр, сыгранных в турнирах
+TOURNAMENT_SHARE = 0.7
+
+def generate_data(player_count, game_count, seed=0):
+    """
+    Создает синтетических игроков и историю парных игр (synthetic_data)
+
+    Parameters:
+    - player_count: Количество игроков
+    - game_count: Количество игр
+    - seed: Начальное значение генератора случайных чисел
+
+    Returns:
+    - (DataFrame в формате st.session_state.players_df, список записей об играх
+      в формате st.session_state.game_history)
+    """
+    rng = np.random.default_rng(seed)
+    players_df, skill = synthetic_data.generate_roster(player_count, seed=rng)
+    games = synthetic_data.generate_season(players_df['id'].to_numpy(), skill, game_count, seed=rng,
+                                           tournament_share=TOURNAMENT_SHARE)
+    synthetic_data.apply_season(players_df, games)
+
+    # Название и размер турнира в бинарном формате не хранятся - добавляем их в записи
+    records = game_store.array_to_records(games)
+    for game in records:
+        tournament = game['tournament']
+        if tournament:
+            tournament['tournament_name'] = f"Турнир {tournament['tournament_id']}"
+            tournament['total_games'] = synthetic_data.GAMES_PER_TOURNAMENT
+    return players_df, records
+
+def _measure(func, track_memory):
+    """
+    Выполняет функцию и возвращает время в секундах или пиковую память в МБ
+    """
+    gc.collect()
+    if not track_memory:
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+def _path_size(path):
+    """
+    Возвращает размер файла или каталога в МБ (0, если его нет)
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 2**20
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 2**20
+
+def _reset_session():
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    storage.invalidate_load_cache()
+
+def run_case(backend, players_df, games, track_memory):
+    """
+    Замеряет операции хранилища для одного бэкенда и масштаба в текущем каталоге
+
+    Parameters:
+    - backend: 'json' или 'sqlite'
+    - players_df: Игроки
+    - games: История игр
+    - track_memory: False - замерять время, True - пиковую память
+
+    Returns:
+    - (словарь операция -> результат замера, словарь файл -> размер в МБ)
+    """
+    storage.STORAGE_BACKEND = backend
+    _reset_session()
+    results = {}
+
+    def record(operation, func):
+        results[operation] = _measure(func, track_memory)
+
+    # Первое сохранение всей истории (журналы или база, архив Parquet и бинарный файл)
+    st.session_state.players_df = players_df.copy()
+    st.session_state.game_history = list(games)
+    record('save_game_history (full)', storage.save_game_history)
+
+    # Дозапись одной игры к уже сохраненной истории
+    st.session_state.game_history.append(dict(games[-1]))
+    record('save_game_history (append 1)', storage.save_game_history)
+
+    record('save_players_data', storage.save_players_data)
+
+    # Загрузка в новой сессии с пустым кэшем процесса
+    _reset_session()
+    record('load_game_history', storage.load_game_history)
+    _reset_session()
+    record('load_players_data', storage.load_players_data)
+    record('load_players_data (cached)', storage.load_players_data)
+    record('history_archive.read_games', history_archive.read_games)
+    record('game_store.player_totals', lambda: game_store.player_totals(game_store.open_games()))
+
+    if backend == 'sqlite':
+        artifacts = {'database': sqlite_storage.DATABASE_FILE}
+    else:
+        artifacts = {'players': storage.PLAYERS_DATA_FILE, 'history journals': storage.GAME_HISTORY_SHARDS_DIR}
+    artifacts['parquet archive'] = history_archive.ARCHIVE_DIR
+    artifacts['binary store'] = game_store.GAME_STORE_FILE
+
+    return results, {name: _path_size(path) for name, path in artifacts.items()}
+
+def run_benchmarks(scales, backends):
+    """
+    Запускает замеры для всех сочетаний масштаба и бэкенда
+
+    Returns:
+    - (DataFrame замеров, DataFrame размеров файлов)
+    """
+    timings, sizes = [], []
+    origin = os.getcwd()
+    for scale in scales:
+        game_count, player_count = SCALES[scale]
+        players_df, games = generate_data(player_count, game_count)
+        for backend in backends:
+            print(f"{scale} ({game_count} игр), {backend}...", file=sys.stderr)
+            passes = {}
+            for track_memory in (False, True):
+                workdir = tempfile.mkdtemp(prefix='rotation-bench-')
+                try:
+                    os.chdir(workdir)
+                    passes[track_memory] = run_case(backend, players_df, games, track_memory)
+                finally:
+                    os.chdir(origin)
+                    shutil.rmtree(workdir, ignore_errors=True)
+
+            seconds, case_sizes = passes[False]
+            peak_mb, _ = passes[True]
+            for operation in seconds:
+                timings.append({
+                    'backend': backend, 'scale': scale, 'games': game_count, 'players': player_count,
+                    'operation': operation, 'seconds': round(seconds[operation], 4),
+                    'peak_mb': round(peak_mb[operation], 1),
+                })
+            for artifact, size_mb in case_sizes.items():
+                sizes.append({
+                    'backend': backend, 'scale': scale, 'games': game_count,
+                    'artifact': artifact, 'size_mb': round(size_mb, 2),
+                })
+    return pd.DataFrame(timings), pd.DataFrame(sizes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк хранилища истории игр и игроков")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES))
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--csv', help="Сохранить замеры в CSV (для сравнения версий)")
+    args = parser.parse_args()
+
+    # Вне streamlit run каждое обращение к session_state выдает предупреждение
+    logging.disable(logging.WARNING)
+
+    timings, sizes = run_benchmarks(args.scales, args.backends)
+
+    print(timings.to_string(index=False))
+    print()
+    print(sizes.to_string(index=False))
+
+    if args.csv:
+        timings.to_csv(args.csv, index=False)
+        sizes.to_csv(f"{os.path.splitext(args.csv)[0]}_sizes.csv", index=False)
+
+if __name__ == '__main__':
+    main()
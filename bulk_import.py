@@ -0,0 +1,419 @@
+import os
+import numpy as np
+import pandas as pd
+import streamlit as st
+from datetime import datetime
+
+import storage
+import json_stream
+import game_store
+import history_archive
+import schemas
+import player_registry
+import rating_engines
+
+# Количество строк файла, проверяемых за один проход
+IMPORT_CHUNK_SIZE = 10_000
+
+# Сколько ошибок показывать в отчете об импорте
+MAX_REPORTED_ERRORS = 100
+
+# Колонки игрока, которые берутся из файла
+PLAYER_IMPORT_COLUMNS = ['id', 'name', 'email', 'phone']
+
+# Колонки игры в плоском формате (CSV): слоты игроков как в колоночном архиве
+GAME_IMPORT_COLUMNS = ['timestamp', 'court_number', *history_archive.PLAYER_SLOTS,
+                       'team_a_score', 'team_b_score', 'tournament_id', 'tournament_name']
+
+def read_chunks(source, file_format, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Читает файл импорта порциями
+
+    Parameters:
+    - source: Путь к файлу или открытый файл
+    - file_format: 'csv' или 'json' (JSON - массив объектов)
+    - chunk_size: Количество строк в порции
+
+    Yields:
+    - DataFrame с очередной порцией строк (индекс - номер строки в файле, с 1)
+    """
+    offset = 1
+    if file_format == 'csv':
+        # Все значения читаем строками - телефоны и ID проверяются и приводятся ниже
+        chunks = pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    else:
+        chunks = _json_chunks(source, chunk_size)
+
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+def _json_chunks(source, chunk_size):
+    batch = []
+    for item in json_stream.iter_json_array(source):
+        batch.append(item)
+        if len(batch) >= chunk_size:
+            yield pd.DataFrame(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+def detect_format(file_name):
+    """
+    Определяет формат файла импорта по расширению ('csv' или 'json')
+    """
+    return 'json' if os.path.splitext(file_name)[1].lower() == '.json' else 'csv'
+
+def _column(chunk, name, default=''):
+    if name in chunk.columns:
+        return chunk[name]
+    return pd.Series(default, index=chunk.index, dtype=object)
+
+def _text(values):
+    return values.fillna('').astype(str).str.strip()
+
+def _new_report():
+    return {'added': 0, 'updated': 0, 'duplicates': 0, 'errors': []}
+
+def _add_errors(report, mask, message):
+    """
+    Добавляет в отчет строки, отмеченные маской, с одним сообщением
+    """
+    for row in mask.index[mask][:MAX_REPORTED_ERRORS - len(report['errors'])]:
+        report['errors'].append((int(row), message))
+
+def _normalize_players(chunk, report):
+    """
+    Проверяет порцию игроков и возвращает корректные строки с колонками PLAYER_IMPORT_COLUMNS
+    """
+    players = pd.DataFrame({
+        'name': _text(_column(chunk, 'name')),
+        'email': _text(_column(chunk, 'email')),
+        'phone': _text(_column(chunk, 'phone')),
+    })
+    raw_ids = _text(_column(chunk, 'id'))
+    ids = pd.to_numeric(raw_ids, errors='coerce')
+
+    missing_name = players['name'] == ''
+    bad_id = (raw_ids != '') & (ids.isna() | (ids <= 0) | (ids != np.floor(ids)))
+    _add_errors(report, missing_name, "Player name is empty")
+    _add_errors(report, bad_id & ~missing_name, "Player id must be a positive integer")
+
+    players['id'] = ids.astype('Int64')
+    return players[~missing_name & ~bad_id][PLAYER_IMPORT_COLUMNS]
+
+def import_players(source, file_format, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Импортирует список игроков из CSV или JSON
+
+    Файл должен содержать колонку name; колонки id, email и phone необязательны.
+    Строки с известным ID обновляют контакты игрока, строки без ID, совпадающие
+    с существующим игроком по имени и email, считаются дубликатами. Новые игроки
+    добавляются одной операцией и сохраняются одной записью.
+
+    Parameters:
+    - source: Путь к файлу или открытый файл
+    - file_format: 'csv' или 'json'
+    - chunk_size: Количество строк, проверяемых за один проход
+
+    Returns:
+    - Отчет: словарь с количеством added, updated, duplicates и списком errors (строка, сообщение)
+    """
+    report = _new_report()
+    players = pd.concat(
+        [_normalize_players(chunk, report) for chunk in read_chunks(source, file_format, chunk_size)]
+        or [pd.DataFrame(columns=PLAYER_IMPORT_COLUMNS)]
+    )
+
+    # Повторы внутри файла: по ID, а для строк без ID - по имени и email
+    players['_key'] = players['name'].str.lower() + '|' + players['email'].str.lower()
+    with_id = players[players['id'].notna()]
+    without_id = players[players['id'].isna()]
+    unique = pd.concat([
+        with_id.drop_duplicates('id', keep='last'),
+        without_id.drop_duplicates('_key', keep='last'),
+    ])
+    report['duplicates'] += len(players) - len(unique)
+
+    players_df = st.session_state.players_df
+    existing_ids = players_df['id'].astype('int64') if 'id' in players_df.columns else pd.Series(dtype='int64')
+    existing_keys = (_text(_column(players_df, 'name')).str.lower() + '|'
+                     + _text(_column(players_df, 'email')).str.lower())
+
+    # Контакты известных игроков обновляем по ID; обновленными считаются только строки,
+    # в которых что-то действительно изменилось
+    updates = unique[unique['id'].notna() & unique['id'].isin(existing_ids)].set_index('id')
+    updated_ids = []
+    if not updates.empty:
+        matched = existing_ids.isin(updates.index)
+        new_columns = {}
+        changed = pd.Series(False, index=existing_ids.index[matched])
+        for column in ('name', 'email', 'phone'):
+            new_values = existing_ids[matched].map(updates[column])
+            # Пустые значения в файле не затирают существующие контакты
+            current = _text(_column(players_df, column))[matched]
+            new_values = new_values.where(new_values != '', current)
+            new_columns[column] = new_values
+            changed |= new_values != current
+        rows = changed.index[changed]
+        if len(rows):
+            for column, new_values in new_columns.items():
+                players_df.loc[rows, column] = new_values[rows]
+            player_registry.invalidate(players_df)
+        updated_ids = existing_ids[rows].astype('int64').tolist()
+        report['updated'] = len(updated_ids)
+
+    new_rows = unique[~(unique['id'].notna() & unique['id'].isin(existing_ids))]
+    is_duplicate = new_rows['id'].isna() & new_rows['_key'].isin(existing_keys)
+    report['duplicates'] += int(is_duplicate.sum())
+    new_rows = new_rows[~is_duplicate].copy()
+
+    # Новым игрокам без ID выдаем ID после максимального известного
+    next_id = int(max(existing_ids.max() if len(existing_ids) else 0,
+                      new_rows['id'].max() if new_rows['id'].notna().any() else 0)) + 1
+    missing = new_rows['id'].isna()
+    new_rows.loc[missing, 'id'] = np.arange(next_id, next_id + int(missing.sum()))
+
+    if not new_rows.empty:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        new_ids = new_rows['id'].astype('int64').tolist()
+        new_players = pd.DataFrame({
+            'id': new_ids,
+            'name': new_rows['name'].values,
+            'email': new_rows['email'].values,
+            'phone': new_rows['phone'].values,
+            'wins': 0,
+            'losses': 0,
+            'points_won': 0,
+            'points_lost': 0,
+            'points_difference': 0,
+            'rating': rating_engines.initial_rating(),
+            'created_at': timestamp,
+            'last_played': '',
+        })
+        st.session_state.players_df = schemas.concat_frame(players_df, new_players, schemas.PLAYER_SCHEMA)
+
+        # Начальная запись истории рейтинга, как при добавлении игрока вручную
+        if 'rating_history' not in st.session_state:
+            st.session_state.rating_history = {}
+        for player_id in new_ids:
+            st.session_state.rating_history.setdefault(player_id, []).append({
+                'timestamp': timestamp,
+                'rating': rating_engines.initial_rating(),
+                'engine': rating_engines.selected_engine()
+            })
+        report['added'] = len(new_ids)
+
+    changed_ids = new_rows['id'].astype('int64').tolist() + updated_ids
+    if changed_ids:
+        storage.save_players_data(player_ids=changed_ids)
+
+    return report
+
+def _normalize_games(chunk, known_ids, report):
+    """
+    Проверяет порцию игр и возвращает корректные строки с колонками GAME_IMPORT_COLUMNS
+    """
+    games = pd.DataFrame(index=chunk.index)
+    games['timestamp'] = pd.to_datetime(_column(chunk, 'timestamp', None), format='ISO8601', errors='coerce').dt.floor('s')
+
+    # Формат истории игр (JSON): списки игроков команд и словарь турнира
+    if 'team_a_players' in chunk.columns or 'team_b_players' in chunk.columns:
+        for team in ('team_a', 'team_b'):
+            team_players = _column(chunk, f'{team}_players', None)
+            games[f'{team}_p1'] = team_players.str[0]
+            games[f'{team}_p2'] = team_players.str[1]
+        tournament = _column(chunk, 'tournament', None)
+        games['tournament_id'] = tournament.str.get('tournament_id')
+        games['tournament_name'] = tournament.str.get('tournament_name')
+    else:
+        for slot in history_archive.PLAYER_SLOTS:
+            games[slot] = _column(chunk, slot, None)
+        games['tournament_id'] = _column(chunk, 'tournament_id', None)
+        games['tournament_name'] = _column(chunk, 'tournament_name', None)
+
+    # Пустые ячейки CSV и некорректные значения становятся NaN
+    for column in [*history_archive.PLAYER_SLOTS, 'tournament_id']:
+        games[column] = pd.to_numeric(games[column], errors='coerce')
+    for column in ('team_a_score', 'team_b_score', 'court_number'):
+        games[column] = pd.to_numeric(_column(chunk, column, None), errors='coerce')
+    games['court_number'] = games['court_number'].fillna(0)
+    games['tournament_name'] = games['tournament_name'].where(games['tournament_name'].notna(), None)
+
+    scores = games[['team_a_score', 'team_b_score']]
+    slots = games[history_archive.PLAYER_SLOTS]
+
+    bad_timestamp = games['timestamp'].isna()
+    bad_score = (scores.isna() | (scores < 0) | (scores != np.floor(scores))).any(axis=1)
+    empty_team = slots['team_a_p1'].isna() | slots['team_b_p1'].isna()
+    unknown_player = (slots.notna() & ~slots.isin(known_ids)).any(axis=1)
+    # Один игрок не может занимать два слота в игре
+    repeated_player = pd.Series(False, index=games.index)
+    for i, first in enumerate(history_archive.PLAYER_SLOTS):
+        for second in history_archive.PLAYER_SLOTS[i + 1:]:
+            repeated_player |= slots[first].notna() & (slots[first] == slots[second])
+
+    _add_errors(report, bad_timestamp, "Invalid or missing timestamp")
+    _add_errors(report, bad_score & ~bad_timestamp, "Scores must be non-negative integers")
+    invalid = bad_timestamp | bad_score
+    _add_errors(report, empty_team & ~invalid, "Each team needs at least one player")
+    invalid |= empty_team
+    _add_errors(report, unknown_player & ~invalid, "Unknown player id")
+    invalid |= unknown_player
+    _add_errors(report, repeated_player & ~invalid, "The same player appears twice in a game")
+    invalid |= repeated_player
+
+    return games[~invalid][GAME_IMPORT_COLUMNS]
+
+def _game_keys(timestamps, team_a, team_b, team_a_score, team_b_score):
+    """
+    Строит ключи игр для поиска повторов (порядок игроков внутри команды не важен)
+    """
+    team_a = np.sort(team_a, axis=1)
+    team_b = np.sort(team_b, axis=1)
+    return pd.DataFrame({
+        'timestamp': timestamps,
+        'a1': team_a[:, 0], 'a2': team_a[:, 1],
+        'b1': team_b[:, 0], 'b2': team_b[:, 1],
+        'team_a_score': team_a_score, 'team_b_score': team_b_score,
+    })
+
+def _games_to_records(games):
+    """
+    Преобразует проверенные строки игр в записи формата st.session_state.game_history
+    """
+    list_names = {t['id']: t.get('name') for t in st.session_state.get('tournaments_list', []) if 'id' in t}
+    slots = {slot: games[slot].astype('Int64').tolist() for slot in history_archive.PLAYER_SLOTS}
+
+    records = []
+    for i, (timestamp, court, team_a_score, team_b_score, tournament_id, tournament_name) in enumerate(zip(
+            games['timestamp'].array.to_pydatetime(), games['court_number'].astype(int).tolist(),
+            games['team_a_score'].astype(int).tolist(), games['team_b_score'].astype(int).tolist(),
+            games['tournament_id'].tolist(), games['tournament_name'].tolist())):
+        tournament = {}
+        if not pd.isna(tournament_id):
+            tournament_id = int(tournament_id)
+            tournament = {
+                'tournament_id': tournament_id,
+                'tournament_name': tournament_name or list_names.get(tournament_id) or f"Турнир {tournament_id}",
+            }
+        records.append({
+            'timestamp': timestamp,
+            'court_number': court,
+            'team_a_players': [p for p in (slots['team_a_p1'][i], slots['team_a_p2'][i]) if not pd.isna(p)],
+            'team_b_players': [p for p in (slots['team_b_p1'][i], slots['team_b_p2'][i]) if not pd.isna(p)],
+            'team_a_score': team_a_score,
+            'team_b_score': team_b_score,
+            'tournament': tournament,
+        })
+    return records
+
+def import_games(source, file_format, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Импортирует результаты прошлых игр из CSV или JSON
+
+    CSV: колонки timestamp, team_a_p1, team_a_p2, team_b_p1, team_b_p2, team_a_score,
+    team_b_score и необязательные court_number, tournament_id, tournament_name.
+    JSON: массив записей в формате истории игр (team_a_players, team_b_players, tournament).
+
+    Все проверки и поиск повторов (внутри файла и с уже сохраненной историей)
+    выполняются векторно по порциям. Статистика игроков обновляется одной операцией
+    по всем импортированным играм. Импортированные игры обычно старше уже сыгранных,
+    поэтому рейтинги пересчитываются полностью - вся история проигрывается в порядке времени.
+
+    Parameters:
+    - source: Путь к файлу или открытый файл
+    - file_format: 'csv' или 'json'
+    - chunk_size: Количество строк, проверяемых за один проход
+
+    Returns:
+    - Отчет: словарь с количеством added, duplicates и списком errors (строка, сообщение)
+    """
+    from player_management import calculate_ratings
+
+    report = _new_report()
+    known_ids = st.session_state.players_df['id'].astype('int64').to_numpy()
+    games = pd.concat(
+        [_normalize_games(chunk, known_ids, report) for chunk in read_chunks(source, file_format, chunk_size)]
+        or [pd.DataFrame(columns=GAME_IMPORT_COLUMNS)]
+    )
+    if games.empty:
+        return report
+
+    slots = games[history_archive.PLAYER_SLOTS].fillna(game_store.NO_PLAYER).astype('int64').to_numpy()
+    keys = _game_keys(
+        games['timestamp'].astype('datetime64[s]').astype('int64').to_numpy(),
+        slots[:, :2], slots[:, 2:],
+        games['team_a_score'].astype('int64').to_numpy(), games['team_b_score'].astype('int64').to_numpy(),
+    )
+    keys.index = games.index
+
+    # Повторы внутри файла и игры, которые уже есть в истории
+    stored = storage.load_game_array()
+    stored_keys = _game_keys(stored['timestamp'], stored['team_a'], stored['team_b'],
+                             stored['team_a_score'], stored['team_b_score']).drop_duplicates()
+    in_history = keys.merge(stored_keys.assign(_stored=True), how='left', on=list(keys.columns))['_stored'].notna()
+    is_new = ~keys.duplicated().values & ~in_history.values
+    report['duplicates'] = int((~is_new).sum())
+    games = games[is_new].sort_values('timestamp', kind='stable')
+    if games.empty:
+        return report
+
+    records = _games_to_records(games)
+    array = game_store.records_to_array(records)
+    players_df = st.session_state.players_df
+    storage.apply_game_totals(players_df, array)
+
+    # Дата последней игры - самая поздняя из импортированных, если она новее известной
+    player_ids = np.concatenate([array['team_a'][:, 0], array['team_a'][:, 1],
+                                 array['team_b'][:, 0], array['team_b'][:, 1]])
+    present = player_ids != game_store.NO_PLAYER
+    latest = pd.Series(np.tile(array['timestamp'], 4)[present]).groupby(player_ids[present]).max()
+    imported = players_df['id'].astype('int64').map(pd.to_datetime(latest, unit='s'))
+    current = pd.to_datetime(_column(players_df, 'last_played', None), format=schemas.DATETIME_FORMAT, errors='coerce')
+    players_df['last_played'] = imported.where(imported.notna() & (current.isna() | (imported > current)), current)
+
+    st.session_state.game_history.extend(records)
+    report['added'] = len(records)
+
+    # Игры попадают в журнал раньше снимка игроков, который их учитывает
+    storage.save_game_history()
+    calculate_ratings()
+    storage.save_players_data()
+
+    return report
+
+def _show_report(report, label):
+    st.success(f"{label}: added {report['added']}, updated {report['updated']}, "
+               f"duplicates skipped {report['duplicates']}, rejected {len(report['errors'])}"
+               f"{'+' if len(report['errors']) >= MAX_REPORTED_ERRORS else ''}")
+    if report['errors']:
+        st.dataframe(pd.DataFrame(report['errors'], columns=['Row', 'Error']).sort_values('Row'),
+                     hide_index=True, use_container_width=True)
+
+def display_bulk_import():
+    """
+    Отображает интерфейс импорта игроков и истории игр из файлов
+    """
+    st.subheader("Import Players")
+    st.caption("CSV or JSON with a `name` column and optional `id`, `email`, `phone`.")
+    players_file = st.file_uploader("Players file", type=['csv', 'json'], key="import_players_file")
+    if players_file is not None and st.button("Import Players", key="btn_import_players"):
+        try:
+            report = import_players(players_file, detect_format(players_file.name))
+            _show_report(report, "Players")
+        except Exception as e:
+            st.error(f"Import failed: {e}")
+
+    st.subheader("Import Game Results")
+    st.caption("CSV with `timestamp`, `team_a_p1`, `team_a_p2`, `team_b_p1`, `team_b_p2`, "
+               "`team_a_score`, `team_b_score` (optional `court_number`, `tournament_id`, `tournament_name`) "
+               "or a JSON game history export. Player ids must already exist.")
+    games_file = st.file_uploader("Games file", type=['csv', 'json'], key="import_games_file")
+    if games_file is not None and st.button("Import Games", key="btn_import_games"):
+        try:
+            report = import_games(games_file, detect_format(games_file.name))
+            _show_report(report, "Games")
+        except Exception as e:
+            st.error(f"Import failed: {e}")
@@ -6,6 +6,9 @@ from datetime import datetime
 import player_management as pm
 import player_matching as match
 import tournament as tr
+import storage
+import player_registry
+import rating_engines
 
 def distribute_players(players_df=None):
     """
@@ -163,6 +166,7 @@ def display_courts(courts, players_df):
                                                 if t['id'] == active_tournament_id), None)
                             if tournament_idx is not None:
                                 st.session_state.tournaments_list[tournament_idx]['current_game'] += 1
+                                storage.mark_dirty('tournaments')
                         st.rerun()
     
     # Calculate number of columns for layout
@@ -222,20 +226,15 @@ def display_courts(courts, players_df):
                             
                             # If skill-based team balancing is selected, show balance information
                             if st.session_state.get('matchmaking_strategy', '') == 'Skill-Based Balanced Teams':
-                                # Calculate team balance
-                                team_a_rating = sum(players_df.loc[players_df['id'] == player_id, 'rating'].values[0] 
-                                                  for player_id in court['team_a'])
-                                team_b_rating = sum(players_df.loc[players_df['id'] == player_id, 'rating'].values[0] 
-                                                  for player_id in court['team_b'])
+                                # Calculate team balance (on the same skill estimates the teams were balanced on)
+                                rating_diff = match.calculate_court_balance(court, players_df)
                                 
-                                # Rating difference
-                                rating_diff = abs(team_a_rating - team_b_rating)
-                                
-                                # Determine color based on difference
-                                if rating_diff < 0.5:
+                                # Determine color based on difference (thresholds follow the rating engine's scale)
+                                scale = rating_engines.rating_scale()
+                                if rating_diff < 0.5 * scale:
                                     balance_color = "green"
                                     balance_text = "Excellent Balance"
-                                elif rating_diff < 1.5:
+                                elif rating_diff < 1.5 * scale:
                                     balance_color = "orange"
                                     balance_text = "Good Balance"
                                 else:
@@ -248,10 +247,8 @@ def display_courts(courts, players_df):
                         # Display teams
                         if not court['is_rest']:
                             # Get player names for display
-                            team_a_names = [players_df.loc[players_df['id'] == player_id, 'name'].values[0] 
-                                           for player_id in court['team_a']]
-                            team_b_names = [players_df.loc[players_df['id'] == player_id, 'name'].values[0] 
-                                           for player_id in court['team_b']]
+                            team_a_names = player_registry.player_values(court['team_a'], 'name', players_df)
+                            team_b_names = player_registry.player_values(court['team_b'], 'name', players_df)
                             
                             # Используем HTML для подсветки победителей/проигравших
                             if team_a_style:
@@ -269,7 +266,7 @@ def display_courts(courts, players_df):
                                     player_name = team_a_names[i]
                                     if show_ratings:
                                         # Get player rating
-                                        player_rating = players_df.loc[players_df['id'] == player_id, 'rating'].values[0]
+                                        player_rating = player_registry.player_value(player_id, 'rating', players_df)
                                         if team_a_style:
                                             st.markdown(f'{team_a_div}- {player_name} <em>(rating: {player_rating:.2f})</em></div>', unsafe_allow_html=True)
                                         else:
@@ -321,7 +318,7 @@ def display_courts(courts, players_df):
                                     player_name = team_b_names[i]
                                     if show_ratings:
                                         # Get player rating
-                                        player_rating = players_df.loc[players_df['id'] == player_id, 'rating'].values[0]
+                                        player_rating = player_registry.player_value(player_id, 'rating', players_df)
                                         if team_b_style:
                                             st.markdown(f'{team_b_div}- {player_name} <em>(rating: {player_rating:.2f})</em></div>', unsafe_allow_html=True)
                                         else:
@@ -367,7 +364,7 @@ def display_courts(courts, players_df):
                             # For rest court, just list all players
                             st.markdown("**Resting Players**")
                             for player_id in court['team_a']:
-                                player_name = players_df.loc[players_df['id'] == player_id, 'name'].values[0]
+                                player_name = player_registry.player_value(player_id, 'name', players_df)
                                 st.write(f"- {player_name}")
 
 def record_game_results():
@@ -381,10 +378,8 @@ def record_game_results():
                 st.subheader(f"Court {court['court_number']} Results")
                 
                 # Get player names for display
-                team_a_names = [st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id, 'name'].values[0] 
-                                for player_id in court['team_a']]
-                team_b_names = [st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id, 'name'].values[0] 
-                                for player_id in court['team_b']]
+                team_a_names = player_registry.player_values(court['team_a'], 'name')
+                team_b_names = player_registry.player_values(court['team_b'], 'name')
                 
                 # Определяем, какая команда выигрывает (если есть счет)
                 team_a_score_key = f"team_a_score_{i}"
@@ -439,14 +434,18 @@ def record_game_results():
         submit_button = st.form_submit_button("Submit Game Results")
         
         if submit_button:
-            # Process results for each court
+            # Collect results of all courts and apply them as one round
+            results = []
             for i, court in enumerate(st.session_state.courts):
                 if not court['is_rest']:
-                    team_a_score = st.session_state[f"team_a_score_{i}"]
-                    team_b_score = st.session_state[f"team_b_score_{i}"]
-                    
-                    # Update player statistics
-                    pm.update_player_stats(i, team_a_score, team_b_score)
+                    results.append({
+                        'court_idx': i,
+                        'team_a_score': st.session_state[f"team_a_score_{i}"],
+                        'team_b_score': st.session_state[f"team_b_score_{i}"]
+                    })
+            
+            # Update player statistics
+            pm.update_round_stats(results)
             
             st.success("Game results recorded successfully!")
 
@@ -528,16 +527,8 @@ def display_tournament_selector():
                     # Select tournament participants from all players
                     st.subheader("Select Tournament Participants")
                     
-                    # Get list of all players
-                    players_df = st.session_state.players_df
-                    
-                    # Create multiselect for player selection
-                    selected_players = st.multiselect(
-                        "Select Players",
-                        options=players_df['id'].tolist(),
-                        format_func=lambda x: players_df.loc[players_df['id'] == x, 'name'].values[0],
-                        key="selected_tournament_players"
-                    )
+                    # Search players by name and pick them from the matches
+                    selected_players = pm.select_players("Select Players", "selected_tournament_players")
                     
                     # Get tournament player limit if defined
                     players_limit = tournament.get('players_limit', tournament['players_count'])
@@ -573,6 +564,7 @@ def display_tournament_selector():
                                 if 'participants' not in st.session_state.tournaments_list[tournament_idx]:
                                     st.session_state.tournaments_list[tournament_idx]['participants'] = []
                                 st.session_state.tournaments_list[tournament_idx]['participants'] = selected_players
+                                storage.mark_dirty('tournaments')
                             
                             # Reload page
                             st.rerun()
@@ -619,6 +611,7 @@ def display_tournament_selector():
                         if tournament_idx is not None:
                             # Change status to completed
                             st.session_state.tournaments_list[tournament_idx]['status'] = 'completed'
+                            storage.mark_dirty('tournaments')
                             # Reset active tournament
                             st.session_state.active_tournament_id = None
                             st.rerun()
@@ -632,11 +625,10 @@ def display_tournament_selector():
                         # Create DataFrame for display
                         participants_data = []
                         for player_id in participants:
-                            player_row = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id].iloc[0]
                             participants_data.append({
                                 'id': player_id,
-                                'name': player_row['name'],
-                                'rating': player_row['rating']
+                                'name': player_registry.player_value(player_id, 'name'),
+                                'rating': player_registry.player_value(player_id, 'rating')
                             })
                         
                         participants_df = pd.DataFrame(participants_data)
@@ -2,9 +2,12 @@ import streamlit as st
 import pandas as pd
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode, GridUpdateMode
 import player_management as pm
+import storage
+import player_registry
+import history_archive
+import rating_engines
 import random
 import numpy as np
-from datetime import datetime
 
 def generate_custom_layout():
     """
@@ -15,7 +18,28 @@ def generate_custom_layout():
         st.error("Сначала добавьте игроков в список")
         return None
 
-    players_df = st.session_state.players_df.copy()
+    # По умолчанию распределяются участники активного турнира, а в небольшом
+    # клубе - все игроки; остальных игроков добавляют через поиск по имени
+    all_players_df = st.session_state.players_df
+    default_ids = []
+    active_tournament_id = st.session_state.get('active_tournament_id')
+    if active_tournament_id is not None:
+        tournament = next((t for t in st.session_state.tournaments_list if t['id'] == active_tournament_id), None)
+        default_ids = (tournament or {}).get('participants', [])
+    elif len(all_players_df) <= player_registry.SEARCH_LIMIT:
+        default_ids = all_players_df['id'].tolist()
+    
+    selected_ids = pm.select_players(
+        "Игроки для распределения", "designer_players",
+        default=default_ids, search_label="Поиск игроков"
+    )
+    if not selected_ids:
+        st.info("Выберите игроков для распределения по кортам")
+        return None
+    
+    # Таблица распределения получает только выбранных игроков и нужные колонки
+    positions = [player_registry.player_position(player_id) for player_id in selected_ids]
+    players_df = all_players_df.iloc[positions][['id', 'name', 'rating']].reset_index(drop=True)
     
     # Добавляем столбец для указания корта и позиции
     if 'court_assignment' not in players_df.columns:
@@ -287,14 +311,15 @@ def auto_generate_results(consider_ratings=True, display_results=True, picklebal
         
         if consider_ratings and not st.session_state.get('random_results_only', False):
             # Вычисляем средний рейтинг команд
-            team_a_ratings = [players_df.loc[players_df['id'] == pid, 'rating'].values[0] for pid in court['team_a']]
-            team_b_ratings = [players_df.loc[players_df['id'] == pid, 'rating'].values[0] for pid in court['team_b']]
+            team_a_ratings = player_registry.player_values(court['team_a'], 'rating', players_df)
+            team_b_ratings = player_registry.player_values(court['team_b'], 'rating', players_df)
             
             team_a_avg_rating = sum(team_a_ratings) / len(team_a_ratings) if team_a_ratings else 0
             team_b_avg_rating = sum(team_b_ratings) / len(team_b_ratings) if team_b_ratings else 0
             
             # Нормализуем разницу рейтингов для влияния на результат
-            rating_diff = team_a_avg_rating - team_b_avg_rating
+            # (в единицах классического рейтинга, независимо от движка)
+            rating_diff = (team_a_avg_rating - team_b_avg_rating) / rating_engines.rating_scale()
             
             if pickleball_scoring:
                 # Генерируем счет по правилам pickleball
@@ -334,13 +359,8 @@ def auto_generate_results(consider_ratings=True, display_results=True, picklebal
             'team_b_score': team_b_score
         })
     
-    # Применяем результаты
-    for result in results:
-        pm.update_player_stats(
-            result['court_idx'],
-            result['team_a_score'],
-            result['team_b_score']
-        )
+    # Применяем результаты всех кортов одним пакетом
+    pm.update_round_stats(results)
     
     if display_results:
         st.success(f"Автоматически сгенерированы результаты для {len(results)} кортов")
@@ -353,10 +373,8 @@ def auto_generate_results(consider_ratings=True, display_results=True, picklebal
                 court = courts[court_idx]
                 
                 # Получаем имена игроков
-                player_names_a = [st.session_state.players_df.loc[st.session_state.players_df['id'] == pid, 'name'].values[0] 
-                               for pid in court['team_a']]
-                player_names_b = [st.session_state.players_df.loc[st.session_state.players_df['id'] == pid, 'name'].values[0] 
-                               for pid in court['team_b']]
+                player_names_a = player_registry.player_values(court['team_a'], 'name')
+                player_names_b = player_registry.player_values(court['team_b'], 'name')
                 
                 team_a_str = ", ".join(player_names_a)
                 team_b_str = ", ".join(player_names_b)
@@ -370,86 +388,29 @@ def auto_generate_results(consider_ratings=True, display_results=True, picklebal
                 
                 st.write(f"**Корт {court['court_number']}:** {result_style}")
     
-    # Пересчитываем рейтинги игроков
-    pm.calculate_ratings()
-    
-    # Сохраняем результаты для истории
-    if 'game_history' not in st.session_state:
-        st.session_state.game_history = []
-    
-    # Добавляем запись в историю игр
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    for result in results:
-        court_idx = result['court_idx']
-        court = courts[court_idx]
-        
-        # Формируем запись истории
-        history_entry = {
-            'timestamp': timestamp,
-            'court_number': court['court_number'],
-            'team_a_players': court['team_a'],
-            'team_b_players': court['team_b'],
-            'team_a_score': result['team_a_score'],
-            'team_b_score': result['team_b_score']
-        }
-        
-        st.session_state.game_history.append(history_entry)
-    
     return results
 
 def display_player_performance():
     """
     Отображает графики и статистику производительности игроков на основе истории игр
     """
-    if 'game_history' not in st.session_state or not st.session_state.game_history:
+    # Читаем всю историю (включая завершенные турниры, не загруженные в сессию) из колоночного архива
+    games_df = storage.load_history_frame()
+    if games_df.empty:
         st.info("Пока нет данных об играх. Проведите несколько игр для отображения статистики.")
         return
     
     st.write("### История результатов игр")
     
-    # Конвертируем историю игр в DataFrame для удобства анализа
-    history_data = []
-    for entry in st.session_state.game_history:
-        # Определяем победителя
-        team_a_won = entry['team_a_score'] > entry['team_b_score']
-        
-        # Добавляем записи для всех игроков в команде A
-        for player_id in entry['team_a_players']:
-            player_name = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id, 'name'].values[0]
-            history_data.append({
-                'timestamp': entry['timestamp'],
-                'player_id': player_id,
-                'player_name': player_name,
-                'team': 'A',
-                'opponent_team': 'B',
-                'court': entry['court_number'],
-                'score': entry['team_a_score'],
-                'opponent_score': entry['team_b_score'],
-                'won': team_a_won,
-                'point_diff': entry['team_a_score'] - entry['team_b_score']
-            })
-        
-        # Добавляем записи для всех игроков в команде B
-        for player_id in entry['team_b_players']:
-            player_name = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id, 'name'].values[0]
-            history_data.append({
-                'timestamp': entry['timestamp'],
-                'player_id': player_id,
-                'player_name': player_name,
-                'team': 'B',
-                'opponent_team': 'A',
-                'court': entry['court_number'],
-                'score': entry['team_b_score'],
-                'opponent_score': entry['team_a_score'],
-                'won': not team_a_won,
-                'point_diff': entry['team_b_score'] - entry['team_a_score']
-            })
-    
-    history_df = pd.DataFrame(history_data)
-    
-    # Преобразуем строку времени в datetime
-    history_df['timestamp'] = pd.to_datetime(history_df['timestamp'])
+    # Разворачиваем игры в строки "игрок - игра"
+    history_df = history_archive.explode_player_rows(games_df)
+    
+    # Имена игроков подставляем через словарь вместо поиска по DataFrame для каждой строки
+    players_df = st.session_state.players_df.drop_duplicates('id')
+    player_names = pd.Series(players_df['name'].values, index=players_df['id'].astype('int64'))
+    history_df['player_name'] = history_df['player_id'].map(player_names)
+    missing_names = history_df['player_name'].isna()
+    history_df.loc[missing_names, 'player_name'] = "Игрок " + history_df.loc[missing_names, 'player_id'].astype(str)
     
     # Отображаем последние результаты
     st.write("#### Последние результаты игр")
@@ -556,24 +517,15 @@ def display_player_performance():
                 # Получаем ID игрока
                 player_id = player_data['player_id'].iloc[0]
                 
-                # Подготавливаем историю рейтинга, если она есть
-                if 'rating_history' in st.session_state and player_id in st.session_state.rating_history:
-                    rating_history = st.session_state.rating_history[player_id]
-                    
-                    # Создаем DataFrame для графика
-                    rating_df = pd.DataFrame({
-                        'date': [entry['timestamp'] for entry in rating_history],
-                        'rating': [entry['rating'] for entry in rating_history]
-                    })
-                    
-                    # Преобразуем дату в формат datetime
-                    rating_df['date'] = pd.to_datetime(rating_df['date'])
-                    
+                # История рейтинга хранится на диске - читаем ряд только этого игрока
+                rating_df = storage.load_rating_history(player_id)
+                
+                if not rating_df.empty:
                     # Строим график
-                    st.line_chart(rating_df.set_index('date')['rating'], use_container_width=True)
+                    st.line_chart(rating_df.set_index('timestamp')['rating'], use_container_width=True)
                     
                     # Выводим текущий рейтинг
-                    current_rating = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id, 'rating'].values[0]
+                    current_rating = player_registry.player_value(player_id, 'rating')
                     st.info(f"Текущий рейтинг: {current_rating:.2f}")
                 else:
                     st.info("История рейтинга пока не доступна. Для отслеживания динамики рейтинга необходимо провести больше игр.")
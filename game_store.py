@@ -0,0 +1,247 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+
+import persistence_worker
+
+# Бинарный файл истории игр: заголовок и записи фиксированной длины
+GAME_STORE_FILE = 'game_history.bin'
+
+# Сигнатура и версия формата (заголовок файла)
+MAGIC = b'RCGAMES1'
+HEADER_SIZE = len(MAGIC)
+
+# Значение для пустого слота игрока и ID турнира для игр вне турнира
+NO_PLAYER = -1
+CASUAL_TOURNAMENT_ID = 0
+
+# Начало отсчета времени игр (записи хранят время без часового пояса)
+EPOCH = datetime(1970, 1, 1)
+
+# Одна парная игра - 32 байта, little-endian, без выравнивания
+GAME_DTYPE = np.dtype([
+    ('timestamp', '<i8'),        # секунды от эпохи для времени игры (без часового пояса, как в записях)
+    ('team_a', '<i4', (2,)),
+    ('team_b', '<i4', (2,)),
+    ('tournament_id', '<i4'),
+    ('court_number', '<i2'),
+    ('team_a_score', '<i2'),
+    ('team_b_score', '<i2'),
+    ('game_number', '<i2'),
+])
+
+def _timestamp_seconds(value):
+    """
+    Приводит время игры (datetime или ISO строку) к секундам от эпохи
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return 0
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (value - EPOCH) // timedelta(seconds=1)
+    return 0
+
+def _timestamps_seconds(values):
+    """
+    Приводит список времен игр к секундам от эпохи одним векторным вызовом
+    """
+    try:
+        parsed = pd.to_datetime(pd.Series(values, dtype=object), format='ISO8601', errors='coerce')
+    except (ValueError, TypeError):
+        parsed = None
+    if parsed is None or parsed.dtype != 'datetime64[ns]':
+        # Времена с разными часовыми поясами - приводим по одному
+        return [_timestamp_seconds(value) for value in values]
+
+    seconds = parsed.fillna(pd.Timestamp(0)).astype('datetime64[s]').astype('int64').to_numpy()
+    # Не разобранные пачкой значения (например, время с часовым поясом среди обычных) - по одному
+    for i in np.flatnonzero(parsed.isna().to_numpy()):
+        seconds[i] = _timestamp_seconds(values[i])
+    return seconds
+
+def records_to_array(games):
+    """
+    Преобразует записи об играх (формат session_state) в структурированный массив
+
+    Parameters:
+    - games: Список записей об играх
+
+    Returns:
+    - numpy массив с dtype GAME_DTYPE
+    """
+    # Поля собираются в списки Python за один проход и записываются в массив
+    # по одному присваиванию на колонку (запись по элементам в numpy в разы медленнее)
+    columns = {name: [] for name in GAME_DTYPE.names}
+    padding = [NO_PLAYER, NO_PLAYER]
+
+    for game in games:
+        tournament = game.get('tournament') or {}
+        columns['timestamp'].append(game.get('timestamp'))
+        for team in ('team_a', 'team_b'):
+            players = game.get(f'{team}_players', [])
+            if len(players) != 2:
+                players = (list(players)[:2] + padding)[:2]
+            columns[team].append(players)
+        columns['tournament_id'].append(tournament.get('tournament_id', CASUAL_TOURNAMENT_ID))
+        columns['court_number'].append(game.get('court_number', 0))
+        columns['team_a_score'].append(game.get('team_a_score', 0))
+        columns['team_b_score'].append(game.get('team_b_score', 0))
+        columns['game_number'].append(tournament.get('game_number', 0))
+
+    array = np.zeros(len(games), dtype=GAME_DTYPE)
+    if len(array):
+        columns['timestamp'] = _timestamps_seconds(columns['timestamp'])
+        for name, values in columns.items():
+            array[name] = values
+    return array
+
+def array_to_records(array):
+    """
+    Преобразует структурированный массив обратно в записи об играх (например, для повтора истории)
+
+    Поля tournament_name и total_games в бинарном формате не хранятся.
+
+    Parameters:
+    - array: Массив с dtype GAME_DTYPE
+
+    Returns:
+    - Список записей об играх
+    """
+    timestamps = pd.to_datetime(array['timestamp'], unit='s').to_pydatetime().tolist()
+    # tolist() по колонкам сразу дает объекты Python, без преобразования каждого элемента numpy
+    rows = zip(timestamps, array['court_number'].tolist(), array['team_a'].tolist(), array['team_b'].tolist(),
+               array['team_a_score'].tolist(), array['team_b_score'].tolist(),
+               array['tournament_id'].tolist(), array['game_number'].tolist())
+
+    games = []
+    for timestamp, court_number, team_a, team_b, team_a_score, team_b_score, tournament_id, game_number in rows:
+        games.append({
+            'timestamp': timestamp,
+            'court_number': court_number,
+            'team_a_players': [p for p in team_a if p != NO_PLAYER],
+            'team_b_players': [p for p in team_b if p != NO_PLAYER],
+            'team_a_score': team_a_score,
+            'team_b_score': team_b_score,
+            'tournament': {'tournament_id': tournament_id, 'game_number': game_number}
+            if tournament_id != CASUAL_TOURNAMENT_ID else {},
+        })
+    return games
+
+def write_games(games, path=GAME_STORE_FILE):
+    """
+    Атомарно перезаписывает бинарный файл истории
+
+    Parameters:
+    - games: Полный список записей об играх
+    - path: Путь к файлу
+    """
+    data = records_to_array(games).tobytes()
+    with persistence_worker.atomic_write(path, binary=True) as f:
+        f.write(MAGIC)
+        f.write(data)
+
+def append_games(games, path=GAME_STORE_FILE):
+    """
+    Дописывает игры в конец бинарного файла истории
+
+    Parameters:
+    - games: Список новых записей об играх
+    - path: Путь к файлу
+    """
+    if not games:
+        return
+    if not os.path.exists(path):
+        write_games(games, path)
+        return
+
+    size = os.path.getsize(path)
+    partial = (size - HEADER_SIZE) % GAME_DTYPE.itemsize
+    with open(path, 'r+b') as f:
+        if partial:
+            # Отбрасываем недописанную запись (например, после сбоя во время записи)
+            f.truncate(size - partial)
+        f.seek(0, os.SEEK_END)
+        f.write(records_to_array(games).tobytes())
+
+def game_count(path=GAME_STORE_FILE):
+    """
+    Возвращает количество игр в бинарном файле (без чтения записей)
+    """
+    if not os.path.exists(path):
+        return 0
+    return max(0, os.path.getsize(path) - HEADER_SIZE) // GAME_DTYPE.itemsize
+
+def open_games(path=GAME_STORE_FILE):
+    """
+    Отображает бинарный файл истории в память только для чтения
+
+    Записи не читаются с диска заранее: страницы подгружаются операционной
+    системой при обращении, поэтому открытие не зависит от размера истории.
+
+    Parameters:
+    - path: Путь к файлу
+
+    Returns:
+    - numpy.memmap (или пустой массив) с dtype GAME_DTYPE
+    """
+    count = game_count(path)
+    if count == 0:
+        return np.zeros(0, dtype=GAME_DTYPE)
+
+    with open(path, 'rb') as f:
+        if f.read(HEADER_SIZE) != MAGIC:
+            raise ValueError(f"{path}: неизвестный формат файла истории")
+
+    return np.memmap(path, dtype=GAME_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+def player_mask(games, player_id):
+    """
+    Возвращает булеву маску игр, в которых участвовал игрок
+    """
+    return (games['team_a'] == player_id).any(axis=1) | (games['team_b'] == player_id).any(axis=1)
+
+def player_totals(games):
+    """
+    Считает итоги игроков по всей истории векторными операциями
+
+    Parameters:
+    - games: Массив с dtype GAME_DTYPE
+
+    Returns:
+    - DataFrame с колонками id, games, wins, losses, points_won, points_lost, points_difference
+    """
+    columns = ['id', 'games', 'wins', 'losses', 'points_won', 'points_lost', 'points_difference']
+    if len(games) == 0:
+        return pd.DataFrame(columns=columns)
+
+    # Каждая игра дает по строке на каждый слот: (игрок, свои очки, очки соперника)
+    team_a_score = games['team_a_score'].astype(np.int64)
+    team_b_score = games['team_b_score'].astype(np.int64)
+    player_ids = np.concatenate([games['team_a'][:, 0], games['team_a'][:, 1],
+                                 games['team_b'][:, 0], games['team_b'][:, 1]])
+    own = np.concatenate([team_a_score, team_a_score, team_b_score, team_b_score])
+    other = np.concatenate([team_b_score, team_b_score, team_a_score, team_a_score])
+
+    present = player_ids != NO_PLAYER
+    player_ids, own, other = player_ids[present], own[present], other[present]
+
+    ids, index = np.unique(player_ids, return_inverse=True)
+    played = np.bincount(index, minlength=len(ids))
+    wins = np.bincount(index, weights=own > other, minlength=len(ids)).astype(np.int64)
+    points_won = np.bincount(index, weights=own, minlength=len(ids)).astype(np.int64)
+    points_lost = np.bincount(index, weights=other, minlength=len(ids)).astype(np.int64)
+
+    return pd.DataFrame({
+        'id': ids,
+        'games': played,
+        'wins': wins,
+        'losses': played - wins,
+        'points_won': points_won,
+        'points_lost': points_lost,
+        'points_difference': points_won - points_lost,
+    })
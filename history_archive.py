@@ -0,0 +1,293 @@
+import os
+import uuid
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+
+# Каталог колоночного архива истории игр (Parquet, разбиение по турниру и месяцу)
+ARCHIVE_DIR = 'game_history_archive'
+
+# ID турнира для игр вне турнира (турниры нумеруются с 1)
+CASUAL_TOURNAMENT_ID = 0
+
+# Слоты игроков: парная игра - по два игрока в команде
+PLAYER_SLOTS = ['team_a_p1', 'team_a_p2', 'team_b_p1', 'team_b_p2']
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('s')),
+    ('court_number', pa.int16()),
+    ('team_a_p1', pa.int32()),
+    ('team_a_p2', pa.int32()),
+    ('team_b_p1', pa.int32()),
+    ('team_b_p2', pa.int32()),
+    ('team_a_score', pa.int16()),
+    ('team_b_score', pa.int16()),
+    ('tournament_name', pa.string()),
+    ('game_number', pa.int16()),
+    ('total_games', pa.int16()),
+    ('tournament_id', pa.int32()),
+    ('month', pa.string()),
+])
+
+# Колонки, по которым две записи считаются одной и той же игрой
+GAME_KEY_COLUMNS = ['timestamp', 'court_number', *PLAYER_SLOTS, 'team_a_score', 'team_b_score']
+
+# Сколько файлов может накопиться в одном разделе, прежде чем дозапись объединит их в один
+PARTITION_COMPACT_THRESHOLD = 20
+
+# Колонки разбиения - по ним отбрасываются целые каталоги еще до чтения файлов
+PARTITIONING = ds.partitioning(
+    pa.schema([('tournament_id', pa.int32()), ('month', pa.string())]),
+    flavor='hive'
+)
+
+def games_to_table(games):
+    """
+    Преобразует записи об играх (формат session_state) в таблицу Arrow
+
+    Parameters:
+    - games: Список записей об играх
+
+    Returns:
+    - pyarrow.Table со схемой ARCHIVE_SCHEMA
+    """
+    columns = {name: [] for name in ARCHIVE_SCHEMA.names if name != 'month'}
+
+    for game in games:
+        tournament = game.get('tournament') or {}
+        team_a = list(game.get('team_a_players', []))
+        team_b = list(game.get('team_b_players', []))
+
+        columns['timestamp'].append(game.get('timestamp'))
+        columns['court_number'].append(game.get('court_number'))
+        for slot, team, position in (('team_a_p1', team_a, 0), ('team_a_p2', team_a, 1),
+                                     ('team_b_p1', team_b, 0), ('team_b_p2', team_b, 1)):
+            columns[slot].append(team[position] if position < len(team) else None)
+        columns['team_a_score'].append(game.get('team_a_score'))
+        columns['team_b_score'].append(game.get('team_b_score'))
+        columns['tournament_name'].append(tournament.get('tournament_name'))
+        columns['game_number'].append(tournament.get('game_number'))
+        columns['total_games'].append(tournament.get('total_games'))
+        columns['tournament_id'].append(tournament.get('tournament_id', CASUAL_TOURNAMENT_ID))
+
+    df = pd.DataFrame(columns)
+    # Одно векторное преобразование на колонку вместо разбора каждой записи
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601').dt.floor('s')
+    df['month'] = df['timestamp'].dt.strftime('%Y-%m')
+    for slot in PLAYER_SLOTS:
+        df[slot] = pd.to_numeric(df[slot]).astype('Int32')
+    df['tournament_id'] = pd.to_numeric(df['tournament_id']).fillna(CASUAL_TOURNAMENT_ID).astype('int32')
+
+    return pa.Table.from_pandas(df, schema=ARCHIVE_SCHEMA, preserve_index=False)
+
+def append_to_archive(games, archive_dir=ARCHIVE_DIR):
+    """
+    Дописывает игры в архив новыми Parquet файлами в соответствующих разделах
+
+    Разделы, в которых после дозаписи слишком много файлов, сразу объединяются в один файл.
+
+    Parameters:
+    - games: Список записей об играх
+    - archive_dir: Каталог архива
+    """
+    if not games:
+        return
+
+    table = games_to_table(games)
+    ds.write_dataset(
+        table,
+        archive_dir,
+        format='parquet',
+        partitioning=PARTITIONING,
+        existing_data_behavior='overwrite_or_ignore',
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet"
+    )
+
+    partitions = table.select(['tournament_id', 'month']).group_by(['tournament_id', 'month']).aggregate([])
+    for tournament_id, month in zip(partitions['tournament_id'].to_pylist(), partitions['month'].to_pylist()):
+        partition_dir = os.path.join(archive_dir, f"tournament_id={tournament_id}", f"month={month}")
+        if fragment_count(partition_dir) > PARTITION_COMPACT_THRESHOLD:
+            _compact_partition(partition_dir)
+
+def _compact_partition(partition_dir):
+    """
+    Объединяет файлы одного раздела в один файл и атомарно подменяет им каталог раздела
+    """
+    schema = pa.schema([field for field in ARCHIVE_SCHEMA if field.name not in ('tournament_id', 'month')])
+    table = ds.dataset(partition_dir, format='parquet', schema=schema).to_table()
+
+    # Служебные каталоги лежат внутри архива, поэтому начинаются с точки - сканирование их пропускает
+    parent, name = os.path.split(partition_dir)
+    tmp_dir = os.path.join(parent, f".{name}.tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp_dir)
+    pq.write_table(table, os.path.join(tmp_dir, "part-0.parquet"))
+
+    old_dir = os.path.join(parent, f".{name}.old-{uuid.uuid4().hex}")
+    os.rename(partition_dir, old_dir)
+    os.rename(tmp_dir, partition_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def _write_partitioned_copy(table, archive_dir):
+    """
+    Записывает таблицу во временный каталог (по одному файлу на раздел)
+    и атомарно подменяет им каталог архива
+    """
+    tmp_dir = f"{archive_dir}.tmp-{uuid.uuid4().hex}"
+    ds.write_dataset(
+        table,
+        tmp_dir,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template="part-{i}.parquet",
+        create_dir=True
+    )
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    old_dir = f"{archive_dir}.old-{uuid.uuid4().hex}"
+    if os.path.exists(archive_dir):
+        os.rename(archive_dir, old_dir)
+    os.rename(tmp_dir, archive_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def rebuild_archive(games, archive_dir=ARCHIVE_DIR):
+    """
+    Полностью пересобирает архив из списка игр
+
+    Parameters:
+    - games: Полный список записей об играх
+    - archive_dir: Каталог архива
+    """
+    _write_partitioned_copy(games_to_table(games), archive_dir)
+
+def compact_archive(archive_dir=ARCHIVE_DIR):
+    """
+    Объединяет мелкие файлы, накопленные дозаписями, в один файл на раздел
+    """
+    if not archive_exists(archive_dir):
+        return
+    _write_partitioned_copy(_dataset(archive_dir).to_table(), archive_dir)
+
+def fragment_count(archive_dir=ARCHIVE_DIR):
+    """
+    Возвращает количество Parquet файлов в архиве (или в каталоге одного раздела)
+    """
+    if not archive_exists(archive_dir):
+        return 0
+    return sum(
+        1 for _, _, files in os.walk(archive_dir) for name in files if name.endswith('.parquet')
+    )
+
+def archived_tournament_ids(archive_dir=ARCHIVE_DIR):
+    """
+    Возвращает ID турниров, для которых в архиве есть игры (по именам каталогов разделов)
+    """
+    if not archive_exists(archive_dir):
+        return []
+    ids = []
+    for name in os.listdir(archive_dir):
+        if name.startswith('tournament_id='):
+            try:
+                ids.append(int(name.split('=', 1)[1]))
+            except ValueError:
+                continue
+    return sorted(i for i in ids if i != CASUAL_TOURNAMENT_ID)
+
+def archive_exists(archive_dir=ARCHIVE_DIR):
+    """
+    Проверяет, создан ли архив
+    """
+    return os.path.isdir(archive_dir)
+
+def _dataset(archive_dir=ARCHIVE_DIR):
+    return ds.dataset(archive_dir, format='parquet', partitioning=PARTITIONING, schema=ARCHIVE_SCHEMA)
+
+def read_games(player_id=None, tournament_id=None, start=None, end=None, columns=None, archive_dir=ARCHIVE_DIR):
+    """
+    Читает игры из архива с фильтрацией на этапе сканирования
+
+    Фильтр по турниру и месяцу отсекает целые разделы (каталоги),
+    фильтры по игроку и времени применяются к статистике групп строк Parquet.
+
+    Parameters:
+    - player_id: ID игрока (None - любой)
+    - tournament_id: ID турнира (None - любой, CASUAL_TOURNAMENT_ID - игры вне турнира)
+    - start: Начало интервала (datetime, включительно)
+    - end: Конец интервала (datetime, включительно)
+    - columns: Список нужных колонок (None - все)
+    - archive_dir: Каталог архива
+
+    Returns:
+    - DataFrame с играми, отсортированный по времени
+    """
+    if not archive_exists(archive_dir):
+        return ARCHIVE_SCHEMA.empty_table().to_pandas()
+
+    conditions = []
+    if tournament_id is not None:
+        conditions.append(pc.field('tournament_id') == int(tournament_id))
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions.append(pc.field('month') >= start.strftime('%Y-%m'))
+        conditions.append(pc.field('timestamp') >= pa.scalar(start.to_pydatetime(), pa.timestamp('s')))
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions.append(pc.field('month') <= end.strftime('%Y-%m'))
+        conditions.append(pc.field('timestamp') <= pa.scalar(end.to_pydatetime(), pa.timestamp('s')))
+    if player_id is not None:
+        player_condition = None
+        for slot in PLAYER_SLOTS:
+            slot_condition = pc.field(slot) == int(player_id)
+            player_condition = slot_condition if player_condition is None else player_condition | slot_condition
+        conditions.append(player_condition)
+
+    scan_filter = None
+    for condition in conditions:
+        scan_filter = condition if scan_filter is None else scan_filter & condition
+
+    table = _dataset(archive_dir).to_table(columns=columns, filter=scan_filter)
+    df = table.to_pandas()
+    if 'timestamp' in df.columns:
+        df = df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+    return df
+
+def explode_player_rows(games_df):
+    """
+    Разворачивает таблицу игр в строки "игрок - игра" векторными операциями
+
+    Parameters:
+    - games_df: DataFrame игр (формат read_games)
+
+    Returns:
+    - DataFrame с колонками timestamp, player_id, team, opponent_team, court,
+      score, opponent_score, won, point_diff, tournament_id
+    """
+    parts = []
+    for slot in PLAYER_SLOTS:
+        team = 'A' if slot.startswith('team_a') else 'B'
+        own, other = ('team_a_score', 'team_b_score') if team == 'A' else ('team_b_score', 'team_a_score')
+        slot_games = games_df[games_df[slot].notna()]
+        parts.append(pd.DataFrame({
+            'timestamp': slot_games['timestamp'],
+            'player_id': slot_games[slot].astype('int64'),
+            'team': team,
+            'opponent_team': 'B' if team == 'A' else 'A',
+            'court': slot_games['court_number'],
+            'score': slot_games[own].astype('int64'),
+            'opponent_score': slot_games[other].astype('int64'),
+            'won': slot_games[own] > slot_games[other],
+            'point_diff': slot_games[own].astype('int64') - slot_games[other].astype('int64'),
+            'tournament_id': slot_games['tournament_id'],
+        }))
+
+    if not parts:
+        return pd.DataFrame(columns=['timestamp', 'player_id', 'team', 'opponent_team', 'court',
+                                     'score', 'opponent_score', 'won', 'point_diff', 'tournament_id'])
+
+    # Порядок как при построчном разборе: игры по времени, внутри игры - команда A, затем B
+    rows = pd.concat(parts)
+    rows['_slot'] = rows['team'].map({'A': 0, 'B': 1})
+    rows = rows.rename_axis('_game').sort_values(['_game', '_slot'], kind='stable')
+    return rows.drop(columns='_slot').reset_index(drop=True)
@@ -0,0 +1,88 @@
+import io
+import os
+import json
+
+# Размер порции, читаемой из файла за один раз (в символах)
+CHUNK_SIZE = 64 * 1024
+
+def _skip_whitespace(buffer, position):
+    while position < len(buffer) and buffer[position] in ' \t\n\r':
+        position += 1
+    return position
+
+def iter_json_array(source, chunk_size=CHUNK_SIZE):
+    """
+    Потоково читает JSON массив и выдает его элементы по одному
+
+    В памяти одновременно находятся только текущая порция файла и один элемент,
+    поэтому объем памяти не зависит от размера файла.
+
+    Parameters:
+    - source: Путь к файлу или открытый файл (текстовый или бинарный в UTF-8)
+    - chunk_size: Размер порции чтения
+
+    Yields:
+    - Элементы массива (разобранные json объекты)
+
+    Raises:
+    - json.JSONDecodeError: Файл не является корректным JSON массивом
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from _iter_array(f, chunk_size)
+    elif isinstance(source, io.TextIOBase):
+        yield from _iter_array(source, chunk_size)
+    else:
+        # Загруженные файлы (например, из st.file_uploader) открыты в бинарном режиме
+        yield from _iter_array(io.TextIOWrapper(source, encoding='utf-8'), chunk_size)
+
+def _iter_array(f, chunk_size):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    # Что ожидается дальше: '[' - начало массива, 'first' - первый элемент или ']',
+    # ',' - разделитель или ']', 'item' - очередной элемент
+    state = '['
+
+    while True:
+        position = _skip_whitespace(buffer, position)
+        if position == len(buffer):
+            if eof:
+                raise json.JSONDecodeError("Неожиданный конец файла", buffer, position)
+            # Отбрасываем разобранную часть и дочитываем следующую порцию
+            chunk = f.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+
+        char = buffer[position]
+        if state == '[':
+            if char != '[':
+                raise json.JSONDecodeError("Ожидался массив", buffer, position)
+            position += 1
+            state = 'first'
+            continue
+        if state in ('first', ',') and char == ']':
+            return
+        if state == ',':
+            if char != ',':
+                raise json.JSONDecodeError("Ожидалась ',' или ']'", buffer, position)
+            position += 1
+            state = 'item'
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            end = None
+        if end is None or (end == len(buffer) and not eof):
+            # Элемент не поместился в прочитанную часть - дочитываем и разбираем заново
+            if eof:
+                raise json.JSONDecodeError("Некорректный элемент массива", buffer, position)
+            chunk = f.read(chunk_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+
+        yield item
+        position = end
+        state = ','
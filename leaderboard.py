@@ -5,6 +5,7 @@ import time
 from datetime import datetime, timedelta
 import random
 import html
+import storage
 
 def display_leaderboard():
     """
@@ -278,6 +279,7 @@ def display_leaderboard_animation_demo():
         
         # Обновляем данные игроков
         st.session_state.players_df = df
+        storage.mark_dirty('players')
         
         # Показываем уведомление
         st.success("Рейтинги игроков обновлены! Проверьте изменения в таблице лидеров.")
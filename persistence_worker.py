@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Задержка перед записью: все сохранения, пришедшие за это время, объединяются в одну запись
+WRITE_DEBOUNCE_SECONDS = 0.5
+
+# Пауза перед повторной попыткой после неудачной записи
+WRITE_RETRY_SECONDS = 5
+
+# Фоновая запись включена по умолчанию; ROTATION_ASYNC_WRITES=0 - синхронная запись (скрипты, бенчмарки)
+ASYNC_WRITES = os.environ.get('ROTATION_ASYNC_WRITES', '1') != '0'
+
+# Ожидающие записи: ключ -> {'replace': (writer, snapshot) или None, 'append': (writer, [records]) или None}
+# Записи выполняются в порядке ключей словаря - в порядке постановки в очередь
+_pending = {}
+_condition = threading.Condition()
+_busy = False
+# Ключи пачки, которая записывается в данный момент
+_writing = set()
+# Ошибки неудавшихся записей: ключ -> текст ошибки (задание остается в очереди до успешной записи)
+_errors = {}
+_thread = None
+
+@contextmanager
+def atomic_write(path, binary=False):
+    """
+    Открывает файл для атомарной записи: данные пишутся во временный файл,
+    который затем заменяет целевой через os.replace
+
+    При сбое во время записи на диске остается либо старая, либо новая версия файла.
+
+    Parameters:
+    - path: Путь к файлу
+
+    Yields:
+    - Текстовый файловый объект для записи
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with (os.fdopen(fd, 'wb') if binary else os.fdopen(fd, 'w', encoding='utf-8')) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def write_json_atomic(path, data, indent=4):
+    """
+    Атомарно записывает JSON файл
+
+    Parameters:
+    - path: Путь к файлу
+    - data: Данные для сериализации
+    - indent: Отступ JSON
+    """
+    with atomic_write(path) as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+
+def _ensure_thread():
+    """
+    Запускает фоновый поток записи, если он еще не запущен
+    """
+    global _thread
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_run, name='persistence-worker', daemon=True)
+        _thread.start()
+
+def submit_replace(key, writer, snapshot):
+    """
+    Ставит в очередь запись полного снимка данных
+
+    Если для того же ключа уже ожидает запись, она заменяется новым снимком,
+    который записывается после всех записей, поставленных в очередь раньше него.
+
+    Parameters:
+    - key: Ключ коллекции (обычно путь к файлу)
+    - writer: Функция writer(snapshot), выполняющая запись
+    - snapshot: Независимая копия данных, снятая в потоке скрипта
+    """
+    if not ASYNC_WRITES:
+        writer(snapshot)
+        return
+
+    with _condition:
+        # Полный снимок перекрывает и предыдущий снимок, и ожидающие дозаписи;
+        # ключ переносится в конец очереди, так как снимок может зависеть от более ранних записей
+        _pending.pop(key, None)
+        _pending[key] = {'replace': (writer, snapshot), 'append': None}
+        _condition.notify_all()
+    _ensure_thread()
+
+def submit_append(key, writer, records, after_pending=False):
+    """
+    Ставит в очередь дозапись записей
+
+    Дозаписи для одного ключа объединяются и передаются в writer одним списком
+    в порядке поступления.
+
+    Parameters:
+    - key: Ключ коллекции (обычно путь к файлу)
+    - writer: Функция writer(records), выполняющая дозапись
+    - records: Список новых записей
+    - after_pending: Записи зависят от записей других ключей, поставленных в очередь раньше:
+      ключ переносится в конец очереди
+    """
+    if not records:
+        return
+
+    if not ASYNC_WRITES:
+        writer(list(records))
+        return
+
+    with _condition:
+        job = _pending.pop(key, None) if after_pending else _pending.get(key)
+        if job is None:
+            job = {'replace': None, 'append': None}
+        _pending[key] = job
+        if job['append'] is None:
+            job['append'] = (writer, list(records))
+        else:
+            job['append'][1].extend(records)
+        _condition.notify_all()
+    _ensure_thread()
+
+def _run():
+    """
+    Основной цикл фонового потока: ждет задания, выдерживает паузу и записывает пачку
+    """
+    global _pending, _busy, _writing
+    while True:
+        with _condition:
+            while not _pending:
+                _condition.wait()
+
+        # Даем накопиться серии сохранений (например, результаты нескольких кортов подряд)
+        time.sleep(WRITE_DEBOUNCE_SECONDS)
+
+        with _condition:
+            # Запись может выполняться из flush() в другом потоке - ждем ее окончания
+            while _busy:
+                _condition.wait()
+            batch = _pending
+            _pending = {}
+            _busy = True
+            _writing = set(batch)
+
+        failed = {}
+        try:
+            failed = _write_batch(batch)
+        finally:
+            with _condition:
+                _requeue(failed)
+                _busy = False
+                _writing = set()
+                _condition.notify_all()
+
+        if failed:
+            # Не повторяем неудачную запись сразу (например, диск заполнен)
+            time.sleep(WRITE_RETRY_SECONDS)
+
+def _write_batch(batch):
+    """
+    Выполняет накопленные записи
+
+    Returns:
+    - Задания, запись которых не удалась: ключ -> оставшаяся часть задания
+    """
+    failed = {}
+    for key, job in batch.items():
+        try:
+            if job['replace'] is not None:
+                writer, snapshot = job['replace']
+                writer(snapshot)
+                # Снимок записан - при ошибке дозаписи повторяется только она
+                job = {'replace': None, 'append': job['append']}
+            if job['append'] is not None:
+                writer, records = job['append']
+                writer(records)
+            _errors.pop(key, None)
+        except Exception as e:
+            print(f"Ошибка при фоновом сохранении {key}: {e}")
+            _errors[key] = str(e)
+            failed[key] = job
+    return failed
+
+def _requeue(failed):
+    """
+    Возвращает неудавшиеся задания в начало очереди (вызывается под _condition)
+
+    Задания, поставленные для тех же ключей во время записи, объединяются
+    с неудавшимися: новый снимок перекрывает их, новые дозаписи идут после них.
+    """
+    global _pending
+    if not failed:
+        return
+    queue = {}
+    for key, job in failed.items():
+        newer = _pending.pop(key, None)
+        if newer is not None and newer['replace'] is not None:
+            job = newer
+        elif newer is not None and newer['append'] is not None:
+            if job['append'] is None:
+                job = {'replace': job['replace'], 'append': newer['append']}
+            else:
+                writer, records = job['append']
+                job = {'replace': job['replace'], 'append': (writer, records + newer['append'][1])}
+        queue[key] = job
+    queue.update(_pending)
+    _pending = queue
+
+def flush(timeout=None):
+    """
+    Немедленно выполняет все ожидающие записи и ждет их завершения
+
+    Parameters:
+    - timeout: Максимальное время ожидания в секундах (None - без ограничения)
+
+    Returns:
+    - True, если все записи завершены; False - если время ожидания истекло
+      или часть записей не удалась (они остаются в очереди, см. write_errors)
+    """
+    global _pending, _busy, _writing
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    with _condition:
+        # Ждем, пока фоновый поток закончит текущую пачку
+        while _busy:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _condition.wait(remaining)
+        batch = _pending
+        _pending = {}
+        _busy = True
+        _writing = set(batch)
+
+    # Оставшиеся задания записываем в вызывающем потоке, не дожидаясь паузы
+    failed = {}
+    try:
+        failed = _write_batch(batch)
+    finally:
+        with _condition:
+            _requeue(failed)
+            _busy = False
+            _writing = set()
+            _condition.notify_all()
+    return not failed
+
+def write_errors():
+    """
+    Возвращает ошибки записей, которые не удались и ожидают повторной попытки
+
+    Returns:
+    - Словарь ключ коллекции -> текст последней ошибки (пустой, если все записано)
+    """
+    with _condition:
+        return dict(_errors)
+
+def is_pending(key):
+    """
+    Проверяет, есть ли для ключа записи, которые еще не попали на диск
+    (ожидают в очереди или выполняются)
+
+    Parameters:
+    - key: Ключ коллекции
+
+    Returns:
+    - True, если запись еще не завершена
+    """
+    with _condition:
+        return key in _pending or key in _writing
+
+# Не теряем ожидающие записи при завершении процесса
+atexit.register(flush)
@@ -2,8 +2,17 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import storage
+import game_store
+import bulk_import
+import player_registry
+import schemas
+import synthetic_data
+import rating_engines
 from datetime import datetime
-import random
+
+# Columns shown in the player editor and the ones users may edit
+PLAYER_EDITOR_COLUMNS = ['name', 'email', 'phone', 'wins', 'losses', 'points_difference', 'rating']
+EDITABLE_PLAYER_COLUMNS = ['name', 'email', 'phone']
 
 def manage_players():
     """
@@ -62,8 +71,34 @@ def manage_players():
         return
     
     # No active tournament - show full player management interface
-    edited_df = st.data_editor(
-        st.session_state.players_df[['name', 'email', 'phone', 'wins', 'losses', 'points_difference', 'rating']],
+    display_player_editor(key_prefix="manage_players_editor")
+
+def display_player_editor(key_prefix="player_editor"):
+    """
+    Display the editable player table
+    
+    Edits are applied in the editor's on_change callback from its edit deltas,
+    so reruns without edits neither touch players_df nor save anything.
+    
+    Parameters:
+    - key_prefix: Widget key prefix (must differ between editors shown on one page)
+    """
+    players_df = st.session_state.players_df
+    
+    # Missing columns are added to the displayed table only
+    display_df = players_df.reindex(columns=PLAYER_EDITOR_COLUMNS)
+    for col in PLAYER_EDITOR_COLUMNS:
+        if col not in players_df.columns:
+            display_df[col] = "" if col in EDITABLE_PLAYER_COLUMNS else 0
+    
+    # A new key after every applied change resets the editor, so its deltas
+    # always refer to the rows shown in the current table
+    editor_key = f"{key_prefix}_{st.session_state.get('player_editor_version', 0)}"
+    st.data_editor(
+        display_df,
+        key=editor_key,
+        on_change=apply_player_edits,
+        args=(editor_key, players_df['id'].tolist()),
         num_rows="dynamic", 
         use_container_width=True,
         column_config={
@@ -82,111 +117,206 @@ def manage_players():
         },
         disabled=["wins", "losses", "points_difference", "rating"],
     )
+
+def apply_player_edits(editor_key, row_ids):
+    """
+    Apply the player editor's edit deltas to players_df
     
-    # Handle adding/removing players
-    if edited_df.shape[0] != st.session_state.players_df.shape[0]:
-        if edited_df.shape[0] > st.session_state.players_df.shape[0]:
-            # Players added
-            num_new_players = edited_df.shape[0] - st.session_state.players_df.shape[0]
-            
-            # Проверяем наличие колонки 'id' и генерируем новые ID
-            if 'id' not in st.session_state.players_df.columns:
-                # Если колонки id еще нет, создаем её и начинаем с 1
-                st.session_state.players_df['id'] = list(range(1, st.session_state.players_df.shape[0] + 1))
-                new_ids = list(range(st.session_state.players_df.shape[0] + 1, 
-                                    st.session_state.players_df.shape[0] + 1 + num_new_players))
-            else:
-                # Если колонка id существует, продолжаем с максимального значения
-                new_ids = list(range(st.session_state.players_df['id'].max() + 1, 
-                                    st.session_state.players_df['id'].max() + 1 + num_new_players))
-            
-            new_players = pd.DataFrame({
-                'id': new_ids,
-                'name': edited_df.iloc[-num_new_players:]['name'].values,
-                'email': edited_df.iloc[-num_new_players:]['email'].values if 'email' in edited_df.columns else [""] * num_new_players,
-                'phone': edited_df.iloc[-num_new_players:]['phone'].values if 'phone' in edited_df.columns else [""] * num_new_players,
-                'wins': [0] * num_new_players,
-                'losses': [0] * num_new_players,
-                'points_won': [0] * num_new_players,
-                'points_lost': [0] * num_new_players,
-                'points_difference': [0] * num_new_players,
-                'rating': [0] * num_new_players,
-                'created_at': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")] * num_new_players,
-                'last_played': [""] * num_new_players
+    Parameters:
+    - editor_key: Session state key of the st.data_editor widget
+    - row_ids: Player IDs of the displayed rows, in display order
+    
+    Returns:
+    - True if any player was added, changed or removed
+    """
+    changes = st.session_state.get(editor_key) or {}
+    players_df = st.session_state.players_df
+    
+    # Edited cells: only contact columns, only values that actually differ
+    updated_ids = []
+    for position, values in changes.get('edited_rows', {}).items():
+        player_id = row_ids[int(position)]
+        label = player_registry.player_label(player_id, players_df)
+        if label is None:
+            continue
+        changed = False
+        for column, value in values.items():
+            if column not in EDITABLE_PLAYER_COLUMNS:
+                continue
+            value = "" if value is None else value
+            if column not in players_df.columns or players_df.at[label, column] != value:
+                players_df.at[label, column] = value
+                changed = True
+        if changed:
+            updated_ids.append(player_id)
+    if updated_ids:
+        # Имена изменены на месте - индекс поиска по именам нужно перестроить
+        player_registry.invalidate(players_df)
+    
+    # Removed rows are matched by ID, so players with the same name are kept
+    removed_ids = [row_ids[int(position)] for position in changes.get('deleted_rows', [])]
+    if removed_ids:
+        players_df = players_df[~players_df['id'].isin(removed_ids)]
+    
+    # Added rows become new players with IDs after the current maximum
+    added_rows = changes.get('added_rows', [])
+    new_ids = []
+    if added_rows:
+        next_id = int(players_df['id'].max()) + 1 if len(players_df) else 1
+        new_ids = list(range(next_id, next_id + len(added_rows)))
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        new_players = pd.DataFrame({
+            'id': new_ids,
+            'name': [row.get('name') or "" for row in added_rows],
+            'email': [row.get('email') or "" for row in added_rows],
+            'phone': [row.get('phone') or "" for row in added_rows],
+            'wins': 0,
+            'losses': 0,
+            'points_won': 0,
+            'points_lost': 0,
+            'points_difference': 0,
+            'rating': rating_engines.initial_rating(),
+            'created_at': timestamp,
+            'last_played': ""
+        })
+        players_df = schemas.concat_frame(players_df, new_players, schemas.PLAYER_SCHEMA)
+        
+        # Инициализируем историю рейтинга для новых игроков
+        if 'rating_history' not in st.session_state:
+            st.session_state.rating_history = {}
+        for player_id in new_ids:
+            st.session_state.rating_history.setdefault(player_id, []).append({
+                'timestamp': timestamp,
+                'rating': rating_engines.initial_rating(),
+                'engine': rating_engines.selected_engine()
             })
-            
-            # Инициализируем историю рейтинга для новых игроков
-            if 'rating_history' not in st.session_state:
-                st.session_state.rating_history = {}
-                
-            # Получаем текущее время для записи в историю
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-            # Создаем начальную запись рейтинга для каждого нового игрока
-            for player_id in new_ids:
-                if player_id not in st.session_state.rating_history:
-                    st.session_state.rating_history[player_id] = []
-                    
-                st.session_state.rating_history[player_id].append({
-                    'timestamp': timestamp,
-                    'rating': 0.0
-                })
-            
-            st.session_state.players_df = pd.concat([st.session_state.players_df, new_players], ignore_index=True)
-            
-            # Сохраняем обновленные данные
-            storage.save_players_data()
-        else:
-            # Players removed
-            # Find names that were in the original but not in the edited
-            original_names = set(st.session_state.players_df['name'])
-            edited_names = set(edited_df['name'])
-            removed_names = original_names - edited_names
-            
-            # Remove those players
-            st.session_state.players_df = st.session_state.players_df[~st.session_state.players_df['name'].isin(removed_names)]
-            
-            # Сохраняем обновленные данные
-            storage.save_players_data()
-            
-    # Update player information
-    st.session_state.players_df['name'] = edited_df['name'].values
-    st.session_state.players_df['email'] = edited_df['email'].values
-    st.session_state.players_df['phone'] = edited_df['phone'].values
     
-    # Recalculate ratings after changes
-    calculate_ratings()
+    if not (updated_ids or removed_ids or new_ids):
+        return False
     
-    # Сохраняем данные игроков
-    storage.save_players_data()
+    st.session_state.players_df = players_df
+    st.session_state.player_editor_version = st.session_state.get('player_editor_version', 0) + 1
+    
+    # Removals rewrite the whole table, other changes save only the affected rows
+    if removed_ids:
+        storage.save_players_data()
+    else:
+        storage.save_players_data(player_ids=updated_ids + new_ids)
+    return True
+
+def select_players(label, state_key, players_df=None, default=None, search_label="Search players"):
+    """
+    Search-then-select player picker
+    
+    The multiselect offers only the selected players and the matches of the name
+    search, so its size does not depend on the roster size.
+    
+    Parameters:
+    - label: Multiselect label
+    - state_key: Session state key that keeps the selected player IDs
+    - players_df: DataFrame with players to choose from (None - st.session_state.players_df)
+    - default: Initially selected player IDs
+    - search_label: Search field label
+    
+    Returns:
+    - List of selected player IDs
+    """
+    if players_df is None:
+        players_df = st.session_state.players_df
+    if state_key not in st.session_state:
+        st.session_state[state_key] = list(default or [])
+    
+    selected = [player_id for player_id in st.session_state[state_key]
+                if player_registry.player_position(player_id, players_df) is not None]
+    query = st.text_input(search_label, key=f"{state_key}_search")
+    matches = player_registry.search_players(query, players_df=players_df)
+    selected_set = set(selected)
+    options = selected + [player_id for player_id in matches if player_id not in selected_set]
+    
+    # The selection is stored in the callback, before the rerun that may rebuild the widget
+    widget_key = f"{state_key}_widget"
+    def store_selection():
+        st.session_state[state_key] = list(st.session_state[widget_key])
+    
+    st.multiselect(
+        label,
+        options=options,
+        default=selected,
+        format_func=lambda player_id: player_registry.player_name(player_id, default=str(player_id), players_df=players_df),
+        key=widget_key,
+        on_change=store_selection,
+    )
+    st.session_state[state_key] = selected
+    return selected
 
-def calculate_ratings():
+def calculate_ratings(player_ids=None, games=None):
     """
-    Calculate player ratings based on wins, losses and point differences
+    Calculate player ratings with the selected rating engine (rating_engines)
+    
+    Parameters:
+    - player_ids: IDs of players whose stats changed (None - recalculate all players)
+    - games: Games these players just played (array with game_store.GAME_DTYPE);
+      used by engines that rate games (Elo, Glicko-2)
+    
+    Если ID переданы, пересчитываются и попадают в историю рейтингов только эти игроки,
+    поэтому стоимость обновления после игры не зависит от размера списка игроков.
+    При полном пересчете движки, которым нужны игры, проигрывают всю историю заново.
     """
-    if len(st.session_state.players_df) > 0:
+    players_df = st.session_state.players_df
+    if len(players_df) > 0:
+        engine = rating_engines.get_engine()
+        
         # Проверяем и инициализируем все необходимые колонки
         for col in ['wins', 'losses', 'points_won', 'points_lost', 'points_difference']:
-            if col not in st.session_state.players_df.columns:
-                st.session_state.players_df[col] = 0
+            if col not in players_df.columns:
+                players_df[col] = 0
         
-        # Проверяем, нужно ли вычислить points_difference
-        if 'points_difference' not in st.session_state.players_df.columns:
-            st.session_state.players_df['points_difference'] = st.session_state.players_df['points_won'] - st.session_state.players_df['points_lost']
+        # Без колонки рейтинга пересчитываем всех игроков
+        full = player_ids is None or 'rating' not in players_df.columns
+        if full:
+            rated = np.arange(len(players_df))
+        else:
+            rated = [player_registry.player_position(player_id) for player_id in dict.fromkeys(player_ids)]
+            rated = np.array([position for position in rated if position is not None], dtype=int)
+        
+        # Движку нужно состояние и остальных игроков новых игр (например, соперников).
+        # Позиции берутся из индекса ID -> позиция, который хранится в сессии между раундами,
+        # и читаются только строки этих игроков, а не колонки целиком
+        positions, local = rated, np.arange(len(rated))
+        if not full and engine['players'] is not None and games is not None and len(games):
+            others = [player_registry.player_position(player_id) for player_id in engine['players'](games).tolist()]
+            positions = np.union1d(rated, [position for position in others if position is not None]).astype(int)
+            local = np.searchsorted(positions, rated)
+        
+        # Колонки рейтинга и состояния движка (например, отклонение Glicko-2), NaN - еще нет значения
+        columns = ['rating'] + engine['columns']
+        state = {
+            column: players_df[column].to_numpy()[positions].astype(float) if column in players_df.columns else np.full(len(positions), np.nan)
+            for column in columns
+        }
         
         # Сохраняем предыдущие рейтинги для отслеживания изменений
-        old_ratings = {}
-        if 'rating' in st.session_state.players_df.columns:
-            for _, row in st.session_state.players_df.iterrows():
-                if 'id' in row and 'rating' in row:
-                    old_ratings[row['id']] = row['rating']
-        
-        # Simple rating formula: (wins - losses) + (points_difference / 100)
-        st.session_state.players_df['rating'] = (
-            st.session_state.players_df['wins'] - 
-            st.session_state.players_df['losses'] + 
-            st.session_state.players_df['points_difference'] / 100
-        )
+        old_ratings = state['rating'][local]
+        
+        if full and engine['uses_games']:
+            # Полный пересчет - вся история от начальных значений в порядке времени
+            # (в журнал игры попадают в порядке записи, импортированные прошлые игры - в конце)
+            state = {column: np.full(len(players_df), np.nan) for column in columns}
+            games = storage.load_game_array()
+            games = games[np.argsort(games['timestamp'], kind='stable')]
+        new_state = {column: values[local] for column, values in engine['rate'](players_df, positions, state, games).items()}
+        new_ratings = new_state['rating']
+        
+        # Значения хранятся в компактных колонках схемы (рейтинг - float32)
+        for column, values in new_state.items():
+            dtype = schemas.FRAME_DTYPES[schemas.PLAYER_SCHEMA[column]]
+            if len(rated) == len(players_df):
+                players_df[column] = values.astype(dtype)
+                continue
+            if column not in players_df.columns:
+                fill = 0 if schemas.PLAYER_SCHEMA[column] == schemas.INT else np.nan
+                players_df[column] = pd.Series(fill, index=players_df.index).astype(dtype)
+            players_df.iloc[rated, players_df.columns.get_loc(column)] = values.astype(players_df[column].dtype)
         
         # Обновляем историю рейтингов для каждого игрока
         if 'rating_history' not in st.session_state:
@@ -194,16 +324,13 @@ def calculate_ratings():
             
         # Получаем текущее время для записи в историю
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # ID игроков, рейтинг которых изменился (новые игроки без рейтинга тоже считаются измененными)
+        changed = ~(np.abs(old_ratings - new_ratings) < 0.001)
+        changed_ids = players_df['id'].to_numpy()[rated][changed].tolist()
             
-        # Обновляем историю рейтингов для каждого игрока
-        for _, row in st.session_state.players_df.iterrows():
-            player_id = row['id']
-            current_rating = row['rating']
-            
-            # Пропускаем, если рейтинг не изменился
-            if player_id in old_ratings and abs(old_ratings[player_id] - current_rating) < 0.001:
-                continue
-                
+        # Добавляем записи в историю только для изменившихся игроков
+        for player_id, current_rating in zip(changed_ids, new_ratings[changed].tolist()):
             # Создаем запись для игрока, если ее еще нет
             if player_id not in st.session_state.rating_history:
                 st.session_state.rating_history[player_id] = []
@@ -211,22 +338,41 @@ def calculate_ratings():
             # Добавляем новую запись в историю
             st.session_state.rating_history[player_id].append({
                 'timestamp': timestamp,
-                'rating': current_rating
+                'rating': current_rating,
+                'engine': rating_engines.selected_engine()
             })
+        
+        # Отмечаем измененных игроков для следующего автосохранения
+        if changed_ids:
+            storage.mark_dirty('players', ids=changed_ids)
+
+def select_rating_engine(widget_key):
+    """
+    Switch the rating engine and recalculate all ratings with it
+    
+    Parameters:
+    - widget_key: Key of the select box holding the engine name
+    """
+    st.session_state.rating_engine = st.session_state[widget_key]
+    calculate_ratings()
+    storage.save_players_data()
 
 def display_player_stats():
     """
     Display player statistics sorted by rating with player management interface
     """
     # Создаем вкладки для различных разделов
-    stats_tab, manage_tab, test_tab = st.tabs(["Player Statistics", "Player Management", "Test Data"])
+    stats_tab, manage_tab, test_tab, import_tab = st.tabs(["Player Statistics", "Player Management", "Test Data", "Import Data"])
+    
+    with import_tab:
+        bulk_import.display_bulk_import()
     
     with test_tab:
         st.subheader("Generate Test Players")
         col1, col2 = st.columns([3, 1])
         
         with col1:
-            test_players_count = st.slider("Number of test players to generate:", 1, 30, 15)
+            test_players_count = st.number_input("Number of test players to generate:", 1, 5000, 15)
         
         with col2:
             if st.button("Generate Players", use_container_width=True):
@@ -287,119 +433,7 @@ def display_player_stats():
         else:
             # No active tournament - show full player management interface
             
-            # Проверяем наличие необходимых столбцов и создаем их при необходимости
-            required_columns = ['name', 'email', 'phone', 'wins', 'losses', 'points_difference', 'rating']
-            existing_columns = st.session_state.players_df.columns.tolist()
-            
-            # Создаем копию DataFrame для избежания ошибок при изменении
-            df_for_editing = st.session_state.players_df.copy()
-            
-            # Добавляем недостающие столбцы
-            for col in required_columns:
-                if col not in existing_columns:
-                    if col in ['wins', 'losses', 'points_difference', 'rating']:
-                        df_for_editing[col] = 0
-                    else:
-                        df_for_editing[col] = ""
-            
-            # Теперь используем DataFrame с добавленными столбцами
-            edited_df = st.data_editor(
-                df_for_editing[required_columns],
-                num_rows="dynamic", 
-                use_container_width=True,
-                column_config={
-                    "name": "Player Name",
-                    "email": "Email",
-                    "phone": "Phone",
-                    "wins": "Wins",
-                    "losses": "Losses",
-                    "points_difference": "Points Difference",
-                    "rating": st.column_config.NumberColumn(
-                        "Rating",
-                        help="Player rating based on performance",
-                        format="%.2f",
-                        step=0.01,
-                    ),
-                },
-                disabled=["wins", "losses", "points_difference", "rating"],
-            )
-            
-            # Handle adding/removing players
-            if edited_df.shape[0] != st.session_state.players_df.shape[0]:
-                if edited_df.shape[0] > st.session_state.players_df.shape[0]:
-                    # Players added
-                    num_new_players = edited_df.shape[0] - st.session_state.players_df.shape[0]
-                    
-                    # Проверяем наличие колонки 'id' и генерируем новые ID
-                    if 'id' not in st.session_state.players_df.columns:
-                        # Если колонки id еще нет, создаем её и начинаем с 1
-                        st.session_state.players_df['id'] = list(range(1, st.session_state.players_df.shape[0] + 1))
-                        new_ids = list(range(st.session_state.players_df.shape[0] + 1, 
-                                            st.session_state.players_df.shape[0] + 1 + num_new_players))
-                    else:
-                        # Если колонка id существует, продолжаем с максимального значения
-                        new_ids = list(range(st.session_state.players_df['id'].max() + 1, 
-                                            st.session_state.players_df['id'].max() + 1 + num_new_players))
-                    
-                    new_players = pd.DataFrame({
-                        'id': new_ids,
-                        'name': edited_df.iloc[-num_new_players:]['name'].values,
-                        'email': edited_df.iloc[-num_new_players:]['email'].values if 'email' in edited_df.columns else [""] * num_new_players,
-                        'phone': edited_df.iloc[-num_new_players:]['phone'].values if 'phone' in edited_df.columns else [""] * num_new_players,
-                        'wins': [0] * num_new_players,
-                        'losses': [0] * num_new_players,
-                        'points_won': [0] * num_new_players,
-                        'points_lost': [0] * num_new_players,
-                        'points_difference': [0] * num_new_players,
-                        'rating': [0] * num_new_players,
-                        'created_at': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")] * num_new_players,
-                        'last_played': [""] * num_new_players
-                    })
-                    
-                    # Инициализируем историю рейтинга для новых игроков
-                    if 'rating_history' not in st.session_state:
-                        st.session_state.rating_history = {}
-                        
-                    # Получаем текущее время для записи в историю
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        
-                    # Создаем начальную запись рейтинга для каждого нового игрока
-                    for player_id in new_ids:
-                        if player_id not in st.session_state.rating_history:
-                            st.session_state.rating_history[player_id] = []
-                            
-                        st.session_state.rating_history[player_id].append({
-                            'timestamp': timestamp,
-                            'rating': 0.0
-                        })
-                    
-                    st.session_state.players_df = pd.concat([st.session_state.players_df, new_players], ignore_index=True)
-                    
-                    # Сохраняем обновленные данные
-                    storage.save_players_data()
-                else:
-                    # Players removed
-                    # Find names that were in the original but not in the edited
-                    original_names = set(st.session_state.players_df['name'])
-                    edited_names = set(edited_df['name'])
-                    removed_names = original_names - edited_names
-                    
-                    # Remove those players
-                    st.session_state.players_df = st.session_state.players_df[~st.session_state.players_df['name'].isin(removed_names)]
-                    
-                    # Сохраняем обновленные данные
-                    storage.save_players_data()
-                    
-            # Update player information
-            st.session_state.players_df['name'] = edited_df['name'].values
-            st.session_state.players_df['email'] = edited_df['email'].values
-            st.session_state.players_df['phone'] = edited_df['phone'].values
-            
-            # Recalculate ratings after changes
-            calculate_ratings()
-            
-            # Сохраняем данные игроков
-            storage.save_players_data()
+            display_player_editor()
     
     with stats_tab:
         # Проверяем, есть ли колонка 'rating'
@@ -410,12 +444,14 @@ def display_player_stats():
         # Если players_df пуст или все равно нет рейтинга, добавляем колонку с нулями
         if 'rating' not in st.session_state.players_df.columns:
             st.session_state.players_df['rating'] = 0.0
+            storage.mark_dirty('players')
         
         # Проверяем наличие нужных колонок и добавляем их, если они отсутствуют
         required_columns = ['name', 'wins', 'losses', 'points_won', 'points_lost', 'points_difference', 'rating', 'email', 'phone']
         for col in required_columns:
             if col not in st.session_state.players_df.columns:
                 st.session_state.players_df[col] = 0 if col not in ['name', 'email', 'phone'] else ''
+                storage.mark_dirty('players')
         
         # Копируем датафрейм перед сортировкой
         sorted_df = st.session_state.players_df.copy()
@@ -516,86 +552,73 @@ def update_player_stats(court_idx, team_a_score, team_b_score):
     - team_a_score: Score of team A
     - team_b_score: Score of team B
     """
-    court = st.session_state.courts[court_idx]
-    
-    # Check if this is a rest court
-    if court['is_rest']:
-        return
-    
-    team_a_ids = court['team_a']
-    team_b_ids = court['team_b']
-    
-    score_diff = team_a_score - team_b_score
-    
-    # Проверяем, существует ли колонка points_difference
-    if 'points_difference' not in st.session_state.players_df.columns:
-        st.session_state.players_df['points_difference'] = st.session_state.players_df['points_won'] - st.session_state.players_df['points_lost']
-    
-    # Проверяем наличие колонок points_won и points_lost
-    for col in ['points_won', 'points_lost']:
-        if col not in st.session_state.players_df.columns:
-            st.session_state.players_df[col] = 0
-    
-    # Update stats for team A
-    for player_id in team_a_ids:
-        player_idx = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id].index[0]
-        
-        if team_a_score > team_b_score:
-            st.session_state.players_df.at[player_idx, 'wins'] += 1
-        else:
-            st.session_state.players_df.at[player_idx, 'losses'] += 1
-        
-        # Обновляем количество набранных и пропущенных очков
-        st.session_state.players_df.at[player_idx, 'points_won'] += team_a_score
-        st.session_state.players_df.at[player_idx, 'points_lost'] += team_b_score
-        
-        # Обновляем разницу очков
-        st.session_state.players_df.at[player_idx, 'points_difference'] = (
-            st.session_state.players_df.at[player_idx, 'points_won'] - 
-            st.session_state.players_df.at[player_idx, 'points_lost']
-        )
-        
-        # Обновляем дату последней игры
-        st.session_state.players_df.at[player_idx, 'last_played'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Update stats for team B
-    for player_id in team_b_ids:
-        player_idx = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id].index[0]
-        
-        if team_b_score > team_a_score:
-            st.session_state.players_df.at[player_idx, 'wins'] += 1
-        else:
-            st.session_state.players_df.at[player_idx, 'losses'] += 1
-        
-        # Обновляем количество набранных и пропущенных очков
-        st.session_state.players_df.at[player_idx, 'points_won'] += team_b_score
-        st.session_state.players_df.at[player_idx, 'points_lost'] += team_a_score
-        
-        # Обновляем разницу очков
-        st.session_state.players_df.at[player_idx, 'points_difference'] = (
-            st.session_state.players_df.at[player_idx, 'points_won'] - 
-            st.session_state.players_df.at[player_idx, 'points_lost']
-        )
-        
-        # Обновляем дату последней игры
-        st.session_state.players_df.at[player_idx, 'last_played'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    update_round_stats([{
+        'court_idx': court_idx,
+        'team_a_score': team_a_score,
+        'team_b_score': team_b_score
+    }])
+
+def update_round_stats(results):
+    """
+    Применяет результаты всех кортов раунда одним пакетом
     
-    # Сохраняем историю игры
-    save_game_history(court_idx, court, team_a_score, team_b_score)
+    Победы, поражения и очки всех игроков раунда добавляются векторными операциями
+    только в строки участников, рейтинги пересчитываются один раз для них же,
+    история и игроки сохраняются одной записью.
     
-    # Recalculate ratings
-    calculate_ratings()
+    Parameters:
+    - results: Список словарей с ключами court_idx, team_a_score, team_b_score
+    """
+    played = [(result, st.session_state.courts[result['court_idx']]) for result in results]
+    played = [(result, court) for result, court in played if not court['is_rest']]
+    if not played:
+        return
     
-    # Сохраняем обновленные данные игроков и историю игр
-    storage.save_players_data()
+    # Сохраняем историю игр раунда
+    first_game = len(st.session_state.get('game_history', []))
+    for result, court in played:
+        save_game_history(result['court_idx'], court, result['team_a_score'], result['team_b_score'])
+    round_games = st.session_state.game_history[first_game:]
+    
+    # Победы, поражения и очки игроков всех кортов складываются по ID
+    # и записываются только в строки участников (через индекс игроков)
+    players_df = st.session_state.players_df
+    round_array = game_store.records_to_array(round_games)
+    totals = game_store.player_totals(round_array)
+    positions = [player_registry.player_position(player_id) for player_id in totals['id'].tolist()]
+    totals = totals[[position is not None for position in positions]]
+    labels = players_df.index[[position for position in positions if position is not None]]
+    
+    for column in ('wins', 'losses', 'points_won', 'points_lost'):
+        if column not in players_df.columns:
+            players_df[column] = 0
+        players_df.loc[labels, column] += totals[column].to_numpy().astype(players_df[column].dtype)
+    
+    # Обновляем разницу очков и дату последней игры
+    players_df.loc[labels, 'points_difference'] = players_df.loc[labels, 'points_won'] - players_df.loc[labels, 'points_lost']
+    players_df.loc[labels, 'last_played'] = datetime.now().replace(microsecond=0)
+    changed_ids = players_df.loc[labels, 'id'].tolist()
+    
+    # Recalculate ratings (Elo rates the round's games in one step)
+    calculate_ratings(player_ids=changed_ids, games=round_array)
+    
+    # Сохраняем историю игр и обновленные данные игроков
+    # (игры попадают в журнал раньше снимка игроков, который их учитывает)
     storage.save_game_history()
+    storage.save_players_data(player_ids=changed_ids)
 
 def generate_test_players(num_players=15):
     """
-    Генерирует случайных тестовых игроков с начальными характеристиками
+    Генерирует случайных тестовых игроков со статистикой синтетического сезона
+    
+    Игры сезона записываются в историю, как сыгранные, чтобы статистика игроков
+    совпадала с журналом игр.
     
     Parameters:
     - num_players: Количество игроков для генерации
+    
+    Returns:
+    - Количество добавленных игроков
     """
     # Проверяем, есть ли структура players_df
     if 'players_df' not in st.session_state or st.session_state.players_df is None:
@@ -609,75 +632,27 @@ def generate_test_players(num_players=15):
     # Проверяем наличие колонки 'id' и определяем начальный ID
     next_id = 1
     if 'id' in st.session_state.players_df.columns and not st.session_state.players_df.empty:
-        next_id = st.session_state.players_df['id'].max() + 1 if not st.session_state.players_df.empty else 1
-    
-    # Создаем имена
-    first_names = ["Alex", "David", "Elena", "Sophia", "Michael", "Julia", "Ivan", "Anna", "Pavel", 
-                  "Natalia", "Victor", "Marina", "Sergey", "Olga", "Andrey", "Tatiana", "Nikolay", "Irina"]
-    last_names = ["Smith", "Johnson", "Williams", "Jones", "Brown", "Davis", "Miller", "Wilson", 
-                 "Moore", "Taylor", "Anderson", "Thomas", "Jackson", "White", "Harris", "Martin"]
-    
-    # Генерируем случайных игроков
-    new_players = []
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    for i in range(num_players):
-        player_id = next_id + i
-        name = f"{random.choice(first_names)} {random.choice(last_names)}"
-        
-        # Случайное количество игр для каждого игрока (0-5)
-        num_games = random.randint(0, 5)
-        wins = random.randint(0, num_games)
-        losses = num_games - wins
-        
-        # Случайное количество очков
-        points_won = random.randint(0, 50)
-        points_lost = random.randint(0, 40)
-        points_difference = points_won - points_lost
-        
-        # Рассчитываем начальный рейтинг
-        rating = (wins - losses) + (points_difference / 100)
-        
-        # Создаем email и телефон
-        email = f"{name.lower().replace(' ', '.')}@example.com"
-        phone = f"+7{random.randint(9000000000, 9999999999)}"
-        
-        # Записываем в лист нового игрока
-        new_players.append({
-            'id': player_id,
-            'name': name,
-            'email': email,
-            'phone': phone,
-            'wins': wins,
-            'losses': losses,
-            'points_won': points_won,
-            'points_lost': points_lost,
-            'points_difference': points_difference,
-            'rating': rating,
-            'created_at': timestamp,
-            'last_played': timestamp if num_games > 0 else ""
-        })
-        
-        # Инициализируем историю рейтинга
-        if 'rating_history' not in st.session_state:
-            st.session_state.rating_history = {}
-            
-        if player_id not in st.session_state.rating_history:
-            st.session_state.rating_history[player_id] = []
-            
-        st.session_state.rating_history[player_id].append({
-            'timestamp': timestamp,
-            'rating': rating
-        })
+        next_id = int(st.session_state.players_df['id'].max()) + 1
     
-    # Добавляем новых игроков в DataFrame
-    new_players_df = pd.DataFrame(new_players)
-    st.session_state.players_df = pd.concat([st.session_state.players_df, new_players_df], ignore_index=True)
+    # Статистика - итоги короткого сезона между новыми игроками (в среднем 3 игры на игрока)
+    new_players_df, games = synthetic_data.generate_league(num_players, games_per_player=3, start_id=next_id)
     
-    # Сохраняем обновленные данные
-    storage.save_players_data()
+    # Рейтинг еще не рассчитан - calculate_ratings посчитает его и добавит в историю каждого нового игрока
+    new_players_df['rating'] = np.nan
+    st.session_state.players_df = schemas.concat_frame(st.session_state.players_df, new_players_df, schemas.PLAYER_SCHEMA)
+    new_ids = new_players_df['id'].tolist()
+    
+    # В играх сезона участвуют только новые игроки, поэтому их можно учесть поверх текущих рейтингов
+    if 'game_history' not in st.session_state:
+        st.session_state.game_history = []
+    st.session_state.game_history.extend(game_store.array_to_records(games))
+    calculate_ratings(player_ids=new_ids, games=games)
+    
+    # Игры попадают в журнал раньше снимка игроков, который их учитывает
+    storage.save_game_history()
+    storage.save_players_data(player_ids=new_ids)
     
-    return len(new_players)
+    return len(new_ids)
 
 def save_game_history(court_idx, court, team_a_score, team_b_score):
     """
@@ -3,13 +3,17 @@ import pandas as pd
 import numpy as np
 import random
 from itertools import combinations
+import player_registry
+import rating_engines
 
-def get_skill_based_courts(players_df):
+def get_skill_based_courts(players_df, conservative=True):
     """
     Создает распределение игроков по кортам на основе их рейтинга/навыков
     
     Parameters:
     - players_df: DataFrame с информацией об игроках, включая их рейтинг
+    - conservative: Балансировать по консервативной оценке силы (рейтинг минус
+      неопределенность, для движков рейтинга с неопределенностью)
     
     Returns:
     - List of courts with optimized player allocations
@@ -18,8 +22,11 @@ def get_skill_based_courts(players_df):
         st.warning("Для создания корта требуется минимум 4 игрока")
         return []
     
-    # Получаем копию DataFrame с игроками, отсортированными по рейтингу
-    sorted_players = players_df.sort_values(by='rating', ascending=False).copy()
+    # Сортировка и деление на команды идут по колонке rating, поэтому консервативная
+    # оценка подставляется в нее (assign и sort_values возвращают новый DataFrame)
+    if conservative:
+        players_df = players_df.assign(rating=rating_engines.conservative_ratings(players_df))
+    sorted_players = players_df.sort_values(by='rating', ascending=False)
     
     # Получаем ID игроков, отсортированных по рейтингу
     player_ids = sorted_players['id'].tolist()
@@ -119,8 +126,7 @@ def create_balanced_teams(court_players, players_df):
     - team_b: Список ID игроков для команды B
     """
     # Получаем рейтинги игроков
-    player_ratings = {player_id: players_df.loc[players_df['id'] == player_id, 'rating'].values[0] 
-                      for player_id in court_players}
+    player_ratings = dict(zip(court_players, player_registry.player_values(court_players, 'rating', players_df)))
     
     # Генерируем все возможные комбинации для команды А (2 игрока из 4)
     possible_teams = list(combinations(court_players, 2))
@@ -169,6 +175,21 @@ def get_optimized_rotation(current_courts, players_df):
     # Используем алгоритм расположения по навыкам для создания новых кортов
     return get_skill_based_courts(players_df[players_df['id'].isin(all_players)])
 
+def team_skill(player_ids, players_df):
+    """
+    Суммарная консервативная оценка силы команды (та же, по которой балансируются корты)
+    
+    Parameters:
+    - player_ids: Список ID игроков команды
+    - players_df: DataFrame с информацией о игроках
+    
+    Returns:
+    - Сумма оценок игроков команды
+    """
+    positions = [player_registry.player_position(player_id, players_df) for player_id in player_ids]
+    team_df = players_df.iloc[[position for position in positions if position is not None]]
+    return float(rating_engines.conservative_ratings(team_df).sum())
+
 def display_matchmaking_settings():
     """
     Отображает настройки для алгоритма подбора игроков
@@ -197,10 +218,5 @@ def calculate_court_balance(court, players_df):
     if court['is_rest'] or not court['team_a'] or not court['team_b']:
         return 0
     
-    # Получаем рейтинги игроков
-    team_a_rating = sum(players_df.loc[players_df['id'] == player_id, 'rating'].values[0] 
-                        for player_id in court['team_a'])
-    team_b_rating = sum(players_df.loc[players_df['id'] == player_id, 'rating'].values[0] 
-                        for player_id in court['team_b'])
-    
-    return abs(team_a_rating - team_b_rating)
\ No newline at end of file
+    # Суммарные оценки силы команд
+    return abs(team_skill(court['team_a'], players_df) - team_skill(court['team_b'], players_df))
\ No newline at end of file
@@ -0,0 +1,177 @@
+import bisect
+import streamlit as st
+
+# Сколько индексов DataFrame хранить в сессии (основная таблица и подвыборки, например участники турнира)
+MAX_CACHED_INDEXES = 4
+
+# Сколько игроков по умолчанию возвращает поиск по имени
+SEARCH_LIMIT = 50
+
+def _index_for(players_df):
+    """
+    Возвращает индекс ID игрока -> позиция строки для DataFrame игроков
+
+    Индекс строится одним проходом по колонке id и хранится в сессии, пока
+    DataFrame не заменен (добавление и удаление игроков создают новый DataFrame).
+    Значения колонок не кэшируются и читаются из DataFrame при каждом обращении.
+    """
+    return _cached('player_index_cache', players_df, _build_position_index)
+
+def _build_position_index(players_df):
+    # При повторяющихся ID берется первая строка, как при фильтрации по id
+    ids = players_df['id'].tolist() if 'id' in players_df.columns else []
+    positions = {}
+    for position, player_id in enumerate(ids):
+        positions.setdefault(player_id, position)
+    return positions
+
+def _cached(cache_key, players_df, build):
+    """
+    Возвращает индекс из кэша сессии или строит его для DataFrame
+    """
+    if cache_key not in st.session_state:
+        st.session_state[cache_key] = []
+    cache = st.session_state[cache_key]
+
+    for i, (frame, size, index) in enumerate(cache):
+        # Ссылка на DataFrame хранится в записи кэша, поэтому сравнение по is надежно
+        if frame is players_df and size == len(players_df):
+            if i:
+                cache.insert(0, cache.pop(i))
+            return index
+
+    index = build(players_df)
+    cache.insert(0, (players_df, len(players_df), index))
+    del cache[MAX_CACHED_INDEXES:]
+    return index
+
+def _build_name_index(players_df):
+    """
+    Строит индекс имен: отсортированные ключи и ID игроков с этими ключами
+
+    Ключи - имя целиком и каждое слово имени в нижнем регистре, поэтому
+    "smi" находит "Anna Smith", а "anna s" - ее же по началу полного имени.
+    """
+    if 'name' not in players_df.columns or 'id' not in players_df.columns:
+        return [], []
+
+    entries = []
+    for name, player_id in zip(players_df['name'].fillna('').astype(str).tolist(), players_df['id'].tolist()):
+        name = ' '.join(name.lower().split())
+        entries.append((name, player_id))
+        words = name.split(' ')
+        if len(words) > 1:
+            entries.extend((word, player_id) for word in words)
+    entries.sort(key=lambda entry: entry[0])
+    return [key for key, _ in entries], [player_id for _, player_id in entries]
+
+def search_players(query, limit=SEARCH_LIMIT, players_df=None):
+    """
+    Ищет игроков по началу имени или любого слова имени
+
+    Поиск - двоичный по отсортированному индексу имен, который строится один раз
+    для DataFrame и хранится в сессии, поэтому не просматривает всю таблицу.
+
+    Parameters:
+    - query: Строка поиска (пустая строка - первые игроки по алфавиту)
+    - limit: Максимальное количество результатов
+    - players_df: DataFrame игроков (None - st.session_state.players_df)
+
+    Returns:
+    - Список ID игроков (без повторов)
+    """
+    keys, ids = _cached('player_name_index_cache', _frame(players_df), _build_name_index)
+    words = query.lower().split()
+    prefix = ' '.join(words)
+
+    # Запрос из нескольких слов также ищем по первому слову, остальные слова
+    # проверяем по полному имени кандидата
+    lookups = [(prefix, [])]
+    if len(words) > 1:
+        lookups.append((words[0], words[1:]))
+
+    found = {}
+    for lookup, other_words in lookups:
+        start = bisect.bisect_left(keys, lookup)
+        for position in range(start, len(keys)):
+            if len(found) >= limit or not keys[position].startswith(lookup):
+                break
+            player_id = ids[position]
+            if player_id in found:
+                continue
+            if other_words:
+                name_words = player_name(player_id, default='', players_df=players_df).lower().split()
+                if not all(any(word.startswith(other) for word in name_words) for other in other_words):
+                    continue
+            found[player_id] = True
+    return list(found)
+
+def invalidate(players_df=None):
+    """
+    Сбрасывает индексы DataFrame после изменения его строк на месте (например, переименования)
+    """
+    players_df = _frame(players_df)
+    for cache_key in ('player_index_cache', 'player_name_index_cache'):
+        cache = st.session_state.get(cache_key, [])
+        cache[:] = [entry for entry in cache if entry[0] is not players_df]
+
+def _frame(players_df):
+    return st.session_state.players_df if players_df is None else players_df
+
+def player_position(player_id, players_df=None):
+    """
+    Возвращает позицию строки игрока в DataFrame (None, если игрока нет)
+
+    Parameters:
+    - player_id: ID игрока
+    - players_df: DataFrame игроков (None - st.session_state.players_df)
+    """
+    return _index_for(_frame(players_df)).get(player_id)
+
+def player_label(player_id, players_df=None):
+    """
+    Возвращает метку индекса строки игрока для обновления через .at (None, если игрока нет)
+    """
+    players_df = _frame(players_df)
+    position = _index_for(players_df).get(player_id)
+    return None if position is None else players_df.index[position]
+
+def player_value(player_id, column, players_df=None):
+    """
+    Возвращает значение колонки для игрока
+
+    Parameters:
+    - player_id: ID игрока
+    - column: Имя колонки
+    - players_df: DataFrame игроков (None - st.session_state.players_df)
+
+    Returns:
+    - Значение колонки
+
+    Raises:
+    - KeyError: Игрока с таким ID нет
+    """
+    players_df = _frame(players_df)
+    position = _index_for(players_df).get(player_id)
+    if position is None:
+        raise KeyError(player_id)
+    return players_df.iat[position, players_df.columns.get_loc(column)]
+
+def player_values(player_ids, column, players_df=None):
+    """
+    Возвращает значения колонки для списка игроков (в том же порядке)
+    """
+    players_df = _frame(players_df)
+    positions = _index_for(players_df)
+    values = players_df[column].to_numpy()
+    return [values[positions[player_id]] for player_id in player_ids]
+
+def player_name(player_id, default=None, players_df=None):
+    """
+    Возвращает имя игрока или default, если игрока нет
+    """
+    players_df = _frame(players_df)
+    position = _index_for(players_df).get(player_id)
+    if position is None:
+        return default
+    return players_df.iat[position, players_df.columns.get_loc('name')]
@@ -0,0 +1,420 @@
+"""
+Движки рейтинга игроков
+
+Движок описывается словарем в ENGINES:
+- label: Название для интерфейса
+- rate: Функция rate(players_df, positions, state, games). state - текущие значения
+  колонок рейтинга игроков в строках positions ('rating' и columns движка, NaN - еще
+  нет значения), games - новые игры (game_store.GAME_DTYPE). Возвращает словарь
+  колонка -> новые значения в строках positions
+- players: Функция players(games) -> ID игроков, состояние которых нужно движку
+  (их строки добавляются в positions), или None, если игры не используются
+- columns: Дополнительные колонки игроков, в которых движок хранит свое состояние
+- initial_rating: Рейтинг нового игрока
+- uses_games: Нужны ли движку сами игры (при полном пересчете вся история
+  проигрывается заново от начальных рейтингов)
+- scale: Сколько очков рейтинга соответствует одной чистой победе классического
+  рейтинга (для порогов баланса команд и генерации результатов)
+"""
+import os
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import game_store
+
+# Движок по умолчанию: 'classic' (им посчитаны данные, сохраненные без выбора движка);
+# 'elo' и 'glicko' включаются явно - переменной окружения или переключателем в интерфейсе
+RATING_ENGINE = os.environ.get('ROTATION_RATING_ENGINE', 'classic').lower()
+
+# Параметры Эло: начальный рейтинг, коэффициент K и делитель логистической кривой
+ELO_INITIAL_RATING = 1500.0
+ELO_K_FACTOR = 32.0
+ELO_DIVISOR = 400.0
+
+# Параметры Glicko-2: начальные рейтинг, отклонение и волатильность, ограничение
+# изменения волатильности (tau) и перевод в шкалу Glicko-2
+GLICKO_INITIAL_RATING = 1500.0
+GLICKO_INITIAL_DEVIATION = 350.0
+GLICKO_INITIAL_VOLATILITY = 0.06
+GLICKO_TAU = 0.5
+GLICKO_SCALE = 173.7178
+
+# Точность и предельное число итераций при расчете волатильности
+GLICKO_EPSILON = 1e-6
+GLICKO_MAX_ITERATIONS = 100
+
+# Колонки состояния Glicko-2 (rating_period - номер ночи последнего периода игрока, 0 - еще не играл)
+GLICKO_COLUMNS = ['rating_deviation', 'rating_volatility', 'rating_period']
+
+# Рейтинговый период - одна ночь: игры до этого часа относятся к предыдущей ночи
+RATING_PERIOD_START_HOUR = 6
+
+# Консервативная оценка силы: рейтинг минус столько отклонений
+CONSERVATIVE_DEVIATIONS = 2.0
+
+def classic_ratings(players_df, positions, state, games):
+    """
+    Классический рейтинг: (победы - поражения) + разница очков / 100
+
+    Рейтинг считается только по агрегатам игроков, игры не используются.
+    """
+    def column(name):
+        return players_df[name].to_numpy()[positions].astype(float)
+
+    return {'rating': column('wins') - column('losses') + column('points_difference') / 100}
+
+def _independent_batches(slots):
+    """
+    Делит игры на последовательные пачки, внутри которых игроки не повторяются
+
+    Игры одной пачки (например, все корты раунда) не зависят друг от друга
+    и обновляются одной векторной операцией, а пачки - по порядку, поэтому
+    результат совпадает с последовательным применением игр.
+
+    Parameters:
+    - slots: Массив позиций игроков (игры x 4), -1 - пустой слот
+
+    Returns:
+    - Список границ пачек [(начало, конец), ...]
+    """
+    batches = []
+    start = 0
+    seen = set()
+    for i, game in enumerate(slots.tolist()):
+        players = [position for position in game if position >= 0]
+        if seen.intersection(players):
+            batches.append((start, i))
+            start = i
+            seen = set()
+        seen.update(players)
+    if len(slots):
+        batches.append((start, len(slots)))
+    return batches
+
+def _game_ids(games):
+    """
+    Возвращает ID игроков игр (игры x 4: два слота команды A, затем B)
+    """
+    return np.concatenate([games['team_a'], games['team_b']], axis=1).astype(np.int64)
+
+def _present_ids(ids):
+    """
+    Возвращает различные ID игроков из массива слотов (без пустых слотов)
+    """
+    ids = np.unique(ids)
+    return ids[ids != game_store.NO_PLAYER]
+
+def game_players(games):
+    """
+    Возвращает ID игроков, сыгравших в играх
+    """
+    return _present_ids(_game_ids(games))
+
+def _slots_of(players_df, positions, ids):
+    """
+    Переводит ID игроков в индексы массивов состояния (строки positions)
+
+    Индекс строится только по строкам positions, поэтому его стоимость не зависит
+    от размера таблицы. Пустые слоты и игроки вне positions получают -1.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    local_ids = players_df['id'].to_numpy()[positions].astype(np.int64)
+    slots = pd.Index(local_ids).get_indexer(ids.ravel()).reshape(ids.shape)
+    slots[ids == game_store.NO_PLAYER] = -1
+    return slots
+
+def _team_a_results(games):
+    """
+    Результат игры для команды A: победа - 1, ничья - 0.5, поражение - 0
+    """
+    team_a_score = games['team_a_score'].astype(np.int64)
+    team_b_score = games['team_b_score'].astype(np.int64)
+    return np.where(team_a_score > team_b_score, 1.0, np.where(team_a_score < team_b_score, 0.0, 0.5))
+
+def elo_ratings(players_df, positions, state, games):
+    """
+    Рейтинг Эло для парных игр
+
+    Рейтинг команды - средний рейтинг ее игроков. Каждый игрок команды получает
+    K * (результат - ожидаемый результат), где ожидаемый результат зависит от
+    разницы рейтингов команд. Все игры пачки обновляются одной векторной операцией.
+
+    Parameters:
+    - players_df: DataFrame игроков
+    - positions: Позиции строк игроков (включая всех игроков games)
+    - state: Текущие рейтинги игроков positions ({'rating': массив}, NaN - игрок еще без рейтинга)
+    - games: Массив игр с dtype game_store.GAME_DTYPE, применяемых к текущим рейтингам
+
+    Returns:
+    - {'rating': новые рейтинги игроков в строках positions}
+    """
+    ratings = np.where(np.isnan(state['rating']), ELO_INITIAL_RATING, state['rating'])
+    if games is None or len(games) == 0:
+        return {'rating': ratings}
+
+    # Игроки, которых нет в таблице, пропускаются
+    slots = _slots_of(players_df, positions, _game_ids(games))
+    present = slots >= 0
+    result = _team_a_results(games)
+    sign = np.array([1.0, 1.0, -1.0, -1.0])
+
+    for start, end in _independent_batches(slots):
+        batch, mask = slots[start:end], present[start:end]
+        values = np.where(mask, ratings[np.where(mask, batch, 0)], 0.0)
+        counts = mask.reshape(-1, 2, 2).sum(axis=2)
+        team = values.reshape(-1, 2, 2).sum(axis=2) / np.maximum(counts, 1)
+        # Игры, где у команды нет ни одного известного игрока, рейтинг не меняют
+        rated = (counts > 0).all(axis=1)
+
+        expected = 1 / (1 + 10 ** ((team[:, 1] - team[:, 0]) / ELO_DIVISOR))
+        delta = np.where(rated, ELO_K_FACTOR * (result[start:end] - expected), 0.0)
+        np.add.at(ratings, batch[mask], (delta[:, None] * sign)[mask])
+
+    return {'rating': ratings}
+
+def _game_nights(games):
+    """
+    Возвращает номер ночи (рейтингового периода) каждой игры - дни от эпохи
+    """
+    return (games['timestamp'].astype(np.int64) - RATING_PERIOD_START_HOUR * 3600) // 86_400
+
+def _glicko_volatility(phi, sigma, v, delta):
+    """
+    Новая волатильность игроков (итерации Illinois из описания Glicko-2, сразу для всех игроков)
+    """
+    a = np.log(sigma ** 2)
+    tau2 = GLICKO_TAU ** 2
+
+    def f(x):
+        ex = np.exp(x)
+        return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - a) / tau2
+
+    # Начальный интервал [A, B], в котором f меняет знак
+    large = delta ** 2 > phi ** 2 + v
+    A = a
+    B = np.where(large, np.log(np.where(large, delta ** 2 - phi ** 2 - v, 1.0)), a - GLICKO_TAU)
+    pending = ~large & (f(B) < 0)
+    while pending.any():
+        B = np.where(pending, B - GLICKO_TAU, B)
+        pending &= f(B) < 0
+
+    fA, fB = f(A), f(B)
+    for _ in range(GLICKO_MAX_ITERATIONS):
+        active = np.abs(B - A) > GLICKO_EPSILON
+        if not active.any():
+            break
+        with np.errstate(divide='ignore', invalid='ignore'):
+            C = np.where(active, A + (A - B) * fA / (fB - fA), B)
+        fC = f(C)
+        crossed = fC * fB < 0
+        A, fA = np.where(active & crossed, B, A), np.where(active, np.where(crossed, fB, fA / 2), fA)
+        B, fB = np.where(active, C, B), np.where(active, fC, fB)
+    return np.exp(A / 2)
+
+def _glicko_period(rating, deviation, volatility, period, slots, results, night):
+    """
+    Один рейтинговый период Glicko-2 по всем играм ночи (массивы состояния изменяются на месте)
+
+    Все игры периода считаются по состоянию игроков на его начало. В парной игре
+    соперник игрока составной: средние рейтинг и дисперсия команды соперников.
+    За каждую пропущенную ночь отклонение игрока растет на его волатильность.
+    """
+    present = slots >= 0
+    players, local = np.unique(slots[present], return_inverse=True)
+    local_slots = np.full(slots.shape, -1)
+    local_slots[present] = local
+
+    # Переход в шкалу Glicko-2
+    mu = (rating[players] - GLICKO_INITIAL_RATING) / GLICKO_SCALE
+    sigma = volatility[players]
+    idle = np.where(period[players] > 0, np.maximum(night - period[players] - 1, 0), 0)
+    max_phi = GLICKO_INITIAL_DEVIATION / GLICKO_SCALE
+    phi = np.minimum(np.sqrt((deviation[players] / GLICKO_SCALE) ** 2 + idle * sigma ** 2), max_phi)
+
+    # Средние рейтинг и дисперсия каждой команды
+    slot_mu = np.where(present, mu[np.maximum(local_slots, 0)], 0.0)
+    slot_phi2 = np.where(present, phi[np.maximum(local_slots, 0)] ** 2, 0.0)
+    counts = present.reshape(-1, 2, 2).sum(axis=2)
+    team_mu = slot_mu.reshape(-1, 2, 2).sum(axis=2) / np.maximum(counts, 1)
+    team_phi2 = slot_phi2.reshape(-1, 2, 2).sum(axis=2) / np.maximum(counts, 1)
+
+    # Для каждого слота - команда соперников и результат
+    opponent = np.array([1, 1, 0, 0])
+    opponent_mu, opponent_phi2 = team_mu[:, opponent], team_phi2[:, opponent]
+    score = np.stack([results, results, 1 - results, 1 - results], axis=1)
+    valid = present & (counts[:, opponent] > 0)
+
+    g = 1 / np.sqrt(1 + 3 * opponent_phi2 / np.pi ** 2)
+    expected = 1 / (1 + np.exp(-g * (slot_mu - opponent_mu)))
+    index = local_slots[valid]
+    variance_inv = np.bincount(index, weights=(g ** 2 * expected * (1 - expected))[valid], minlength=len(players))
+    improvement = np.bincount(index, weights=(g * (score - expected))[valid], minlength=len(players))
+
+    rated = variance_inv > 0
+    players, mu, phi, sigma = players[rated], mu[rated], phi[rated], sigma[rated]
+    v = 1 / variance_inv[rated]
+    improvement = improvement[rated]
+
+    new_sigma = _glicko_volatility(phi, sigma, v, v * improvement)
+    phi_star = np.sqrt(phi ** 2 + new_sigma ** 2)
+    new_phi = 1 / np.sqrt(1 / phi_star ** 2 + 1 / v)
+    new_mu = mu + new_phi ** 2 * improvement
+
+    rating[players] = new_mu * GLICKO_SCALE + GLICKO_INITIAL_RATING
+    deviation[players] = np.minimum(new_phi, max_phi) * GLICKO_SCALE
+    volatility[players] = new_sigma
+    period[players] = night
+
+def glicko_ratings(players_df, positions, state, games):
+    """
+    Рейтинг Glicko-2 с отклонением (неопределенностью) и волатильностью каждого игрока
+
+    Рейтинговый период - одна ночь игр (RATING_PERIOD_START_HOUR). Все игры ночи
+    обновляют рейтинги одним векторным шагом по состоянию на начало ночи. Если раунды
+    ночи приходят по одному, состояние игроков на начало ночи и ее игры хранятся
+    в сессии, и каждый раунд пересчитывает период ночи целиком - результат совпадает
+    с обработкой всей ночи сразу.
+
+    Parameters:
+    - players_df: DataFrame игроков
+    - positions: Позиции строк игроков (включая игроков games и открытой ночи, см. glicko_players)
+    - state: Текущие значения колонок рейтинга игроков positions (NaN - еще нет значения)
+    - games: Массив игр с dtype game_store.GAME_DTYPE в порядке времени
+
+    Returns:
+    - Словарь колонка рейтинга -> новые значения в строках positions
+    """
+    columns = ['rating'] + GLICKO_COLUMNS
+    initial = [GLICKO_INITIAL_RATING, GLICKO_INITIAL_DEVIATION, GLICKO_INITIAL_VOLATILITY, 0]
+    arrays = [np.where(np.isnan(state[column]), value, state[column]) for column, value in zip(columns, initial)]
+    rating, deviation, volatility, period = arrays
+
+    if games is not None and len(games):
+        # Открытая ночь из сессии; при пересчете с нуля она не нужна
+        cache = st.session_state.get('rating_period_cache')
+        if np.isnan(state['rating']).all():
+            cache = None
+
+        local_ids = players_df['id'].to_numpy()[positions].astype(np.int64)
+        game_ids, results, nights = _game_ids(games), _team_a_results(games), _game_nights(games)
+        game_slots = _slots_of(players_df, positions, game_ids)
+        # Игры группируются по ночам одной сортировкой (порядок игр внутри ночи сохраняется)
+        order = np.argsort(nights, kind='stable')
+        night_values, starts = np.unique(nights[order], return_index=True)
+        bounds = np.append(starts, len(order))
+
+        for i, night in enumerate(night_values):
+            in_night = order[bounds[i]:bounds[i + 1]]
+            ids, slots, night_results = game_ids[in_night], game_slots[in_night], results[in_night]
+            start = None
+            if cache is not None and cache['night'] == night:
+                # Игроки ночи возвращаются к состоянию на ее начало, период пересчитывается со всеми играми ночи
+                ids = np.concatenate([cache['ids'], ids])
+                slots = np.concatenate([_slots_of(players_df, positions, cache['ids']), slots])
+                night_results = np.concatenate([cache['results'], night_results])
+                start = cache['start']
+                restore = _slots_of(players_df, positions, start.index.to_numpy())
+                known = restore >= 0
+                for array, column in zip(arrays, columns):
+                    array[restore[known]] = start[column].to_numpy()[known]
+
+            if i == len(night_values) - 1:
+                # Состояние на начало ночи игроков, впервые сыгравших в эту ночь
+                players = np.unique(slots[slots >= 0])
+                player_ids = local_ids[players]
+                if start is not None:
+                    players = players[~np.isin(player_ids, start.index)]
+                    player_ids = local_ids[players]
+                added = pd.DataFrame({column: array[players] for array, column in zip(arrays, columns)},
+                                     index=player_ids)
+                start = added if start is None else pd.concat([start, added])
+                cache = {'night': night, 'ids': ids, 'results': night_results, 'start': start}
+
+            _glicko_period(rating, deviation, volatility, period, slots, night_results, night)
+
+        st.session_state.rating_period_cache = cache
+
+    return dict(zip(columns, arrays))
+
+def glicko_players(games):
+    """
+    Игроки, состояние которых нужно Glicko-2: игроки новых игр и открытой ночи из сессии
+    """
+    ids = game_players(games)
+    cache = st.session_state.get('rating_period_cache')
+    if cache is not None:
+        ids = np.union1d(ids, _present_ids(cache['ids']))
+    return ids
+
+ENGINES = {
+    'elo': {
+        'label': 'Elo (doubles)',
+        'rate': elo_ratings,
+        'players': game_players,
+        'columns': [],
+        'initial_rating': ELO_INITIAL_RATING,
+        'uses_games': True,
+        'scale': 40.0,
+    },
+    'glicko': {
+        'label': 'Glicko-2 (rating with uncertainty)',
+        'rate': glicko_ratings,
+        'players': glicko_players,
+        'columns': GLICKO_COLUMNS,
+        'initial_rating': GLICKO_INITIAL_RATING,
+        'uses_games': True,
+        'scale': 40.0,
+    },
+    'classic': {
+        'label': 'Wins and point difference',
+        'rate': classic_ratings,
+        'players': None,
+        'columns': [],
+        'initial_rating': 0.0,
+        'uses_games': False,
+        'scale': 1.0,
+    },
+}
+
+def selected_engine():
+    """
+    Возвращает имя выбранного движка (выбор в сессии или RATING_ENGINE)
+    """
+    name = st.session_state.get('rating_engine', RATING_ENGINE)
+    return name if name in ENGINES else 'classic'
+
+def get_engine(name=None):
+    """
+    Возвращает описание движка (по умолчанию - выбранного)
+    """
+    return ENGINES[name or selected_engine()]
+
+def initial_rating():
+    """
+    Возвращает рейтинг нового игрока для выбранного движка
+    """
+    return get_engine()['initial_rating']
+
+def rating_scale():
+    """
+    Возвращает масштаб рейтинга выбранного движка (очков на одну чистую победу)
+    """
+    return get_engine()['scale']
+
+def conservative_ratings(players_df):
+    """
+    Консервативная оценка силы игроков для балансировки команд
+
+    Для движков с неопределенностью - рейтинг минус CONSERVATIVE_DEVIATIONS отклонений
+    (новичок с неизвестным уровнем не считается сильным игроком), для остальных - рейтинг.
+
+    Returns:
+    - numpy массив в порядке строк players_df
+    """
+    ratings = players_df['rating'].to_numpy(dtype=float)
+    if 'rating_deviation' not in get_engine()['columns'] or 'rating_deviation' not in players_df.columns:
+        return ratings
+    deviation = players_df['rating_deviation'].to_numpy(dtype=float)
+    deviation = np.where(np.isnan(deviation), GLICKO_INITIAL_DEVIATION, deviation)
+    return ratings - CONSERVATIVE_DEVIATIONS * deviation
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# Типы полей схемы
+DATETIME = 'datetime'
+INT = 'int'
+ID = 'id'
+FLOAT = 'float'
+STR = 'str'
+
+# Даты хранятся в ISO 8601 ("2025-03-30 01:37:04", "2025-03-30T01:39:09.732131", "2025-03-30")
+DATETIME_FORMAT = 'ISO8601'
+
+# Типы колонок DataFrame: компактные числа, строки в буферах Arrow вместо объектов Python
+FRAME_DTYPES = {
+    ID: 'int32',
+    INT: 'int32',
+    FLOAT: 'float32',
+    STR: 'string[pyarrow]',
+    DATETIME: 'datetime64[ns]',
+}
+
+# Схемы сущностей: поле -> тип
+PLAYER_SCHEMA = {
+    'id': ID,
+    'name': STR,
+    'phone': STR,
+    'email': STR,
+    'rating': FLOAT,
+    # Состояние движка Glicko-2 (rating_engines): отклонение, волатильность и номер ночи последнего периода
+    'rating_deviation': FLOAT,
+    'rating_volatility': FLOAT,
+    'rating_period': INT,
+    'wins': INT,
+    'losses': INT,
+    'points_won': INT,
+    'points_lost': INT,
+    'points_difference': INT,
+    # На диске - строки "%Y-%m-%d %H:%M:%S" ("" - еще не играл), в DataFrame - datetime64 (NaT)
+    'created_at': DATETIME,
+    'last_played': DATETIME,
+}
+
+GAME_SCHEMA = {
+    'timestamp': DATETIME,
+    'court_number': INT,
+    'team_a_score': INT,
+    'team_b_score': INT,
+}
+
+TOURNAMENT_SCHEMA = {
+    'id': ID,
+    'name': STR,
+    'date': DATETIME,
+    'status': STR,
+    'start_time': DATETIME,
+    'pause_time': DATETIME,
+    'end_time': DATETIME,
+}
+
+def _parse_datetimes(values):
+    """
+    Преобразует список ISO строк в datetime одним векторным вызовом
+
+    Значения, которые не удалось разобрать, возвращаются без изменений.
+
+    Parameters:
+    - values: Список строк
+
+    Returns:
+    - Список datetime объектов (или исходных значений)
+    """
+    try:
+        parsed = pd.to_datetime(pd.Series(values, dtype=object), format=DATETIME_FORMAT)
+    except (ValueError, TypeError):
+        # В пачке есть некорректные строки - разбираем их по одной
+        result = []
+        for value in values:
+            try:
+                result.append(datetime.fromisoformat(value))
+            except (ValueError, TypeError):
+                result.append(value)
+        return result
+
+    result = parsed.array.to_pydatetime().tolist()
+    if parsed.hasnans:
+        # Пустые строки и подобные значения оставляем как были
+        for i in parsed.index[parsed.isna()]:
+            result[i] = values[i]
+    return result
+
+def parse_records(records, schema):
+    """
+    Приводит поля записей к типам схемы (изменяет записи на месте)
+
+    Каждое поле с датой преобразуется одним вызовом на всю коллекцию,
+    остальные ключи записей не просматриваются.
+
+    Parameters:
+    - records: Список словарей
+    - schema: Схема сущности
+
+    Returns:
+    - Тот же список
+    """
+    for field, field_type in schema.items():
+        if field_type != DATETIME:
+            continue
+
+        positions = [i for i, record in enumerate(records) if isinstance(record.get(field), str)]
+        if not positions:
+            continue
+
+        parsed = _parse_datetimes([records[i][field] for i in positions])
+        for i, value in zip(positions, parsed):
+            records[i][field] = value
+
+    return records
+
+def convert_frame(df, schema):
+    """
+    Приводит колонки DataFrame к компактным типам схемы (FRAME_DTYPES)
+
+    Колонки, которые уже имеют нужный тип, не преобразуются, поэтому функцию можно
+    вызывать после каждого добавления строк. Если колонку не удалось преобразовать
+    целиком, она остается без изменений.
+
+    Parameters:
+    - df: DataFrame (изменяется на месте)
+    - schema: Схема сущности
+
+    Returns:
+    - Тот же DataFrame
+    """
+    for field, field_type in schema.items():
+        if field not in df.columns:
+            continue
+
+        dtype = FRAME_DTYPES[field_type]
+        if df[field].dtype == dtype:
+            continue
+
+        try:
+            if field_type == DATETIME:
+                df[field] = pd.to_datetime(df[field], format=DATETIME_FORMAT).astype(dtype)
+            elif field_type == ID:
+                # Компактные целые ID (после миграции в данных нет дробных ID)
+                df[field] = pd.to_numeric(df[field]).astype(dtype)
+            elif field_type == INT:
+                # Отсутствующие счетчики считаются нулевыми
+                df[field] = pd.to_numeric(df[field]).fillna(0).astype(dtype)
+            elif field_type == FLOAT:
+                df[field] = pd.to_numeric(df[field]).astype(dtype)
+            else:
+                df[field] = df[field].fillna('').astype(str).astype(dtype)
+        except (ValueError, TypeError):
+            pass
+
+    return df
+
+def concat_frame(df, new_rows, schema):
+    """
+    Добавляет строки в DataFrame, сохраняя компактные типы колонок схемы
+
+    Parameters:
+    - df: DataFrame
+    - new_rows: DataFrame с новыми строками
+    - schema: Схема сущности
+
+    Returns:
+    - Новый DataFrame
+    """
+    new_rows = convert_frame(new_rows, schema)
+    if df.empty:
+        # У пустой таблицы колонки могут быть без типа - берем типы новых строк
+        return new_rows.reset_index(drop=True)
+    return convert_frame(pd.concat([df, new_rows], ignore_index=True), schema)
+
+def frame_to_records(df, schema):
+    """
+    Преобразует DataFrame в список словарей для JSON и SQLite
+
+    Даты записываются строками "%Y-%m-%d %H:%M:%S" (пустая строка вместо NaT),
+    float32 - кратчайшим десятичным представлением (0.88, а не 0.8799999952316284).
+
+    Parameters:
+    - df: DataFrame
+    - schema: Схема сущности
+
+    Returns:
+    - Список словарей
+    """
+    columns = []
+    for column in df.columns:
+        values = df[column]
+        field_type = schema.get(column)
+        if field_type == DATETIME and pd.api.types.is_datetime64_any_dtype(values):
+            # numpy форматирует даты в несколько раз быстрее, чем strftime
+            text = pd.Series(np.datetime_as_string(values.to_numpy(), unit='s'), index=df.index)
+            values = text.str.replace('T', ' ', regex=False).where(values.notna(), '')
+        elif values.dtype == 'float32':
+            values = values.astype(str).astype('float64')
+        elif isinstance(values.dtype, pd.StringDtype):
+            values = values.astype(object).fillna('')
+        # tolist() сразу дает объекты Python (быстрее, чем to_dict со своей упаковкой значений)
+        columns.append(values.tolist())
+    names = list(df.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
@@ -0,0 +1,536 @@
+import os
+import sqlite3
+import json
+import math
+from datetime import datetime
+
+# Файл встроенной базы данных
+DATABASE_FILE = 'rotation_data.db'
+
+# Колонки таблицы игроков (порядок совпадает с CREATE TABLE)
+PLAYER_COLUMNS = [
+    'id', 'name', 'email', 'phone', 'rating',
+    'wins', 'losses', 'points_won', 'points_lost', 'points_difference',
+    'created_at', 'last_played',
+    'rating_deviation', 'rating_volatility', 'rating_period'
+]
+
+# Колонки, добавленные в таблицу игроков после первой версии схемы (добавляются миграцией)
+ADDED_PLAYER_COLUMNS = {
+    'rating_deviation': 'REAL',
+    'rating_volatility': 'REAL',
+    'rating_period': 'INTEGER DEFAULT 0',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    phone TEXT,
+    rating REAL DEFAULT 0,
+    wins INTEGER DEFAULT 0,
+    losses INTEGER DEFAULT 0,
+    points_won INTEGER DEFAULT 0,
+    points_lost INTEGER DEFAULT 0,
+    points_difference INTEGER DEFAULT 0,
+    created_at TEXT,
+    last_played TEXT,
+    rating_deviation REAL,
+    rating_volatility REAL,
+    rating_period INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    court_number INTEGER,
+    team_a_score INTEGER,
+    team_b_score INTEGER,
+    tournament_id INTEGER,
+    tournament_name TEXT,
+    game_number INTEGER,
+    total_games INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS game_players (
+    game_id INTEGER NOT NULL REFERENCES games(id) ON DELETE CASCADE,
+    team TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    player_id INTEGER NOT NULL,
+    PRIMARY KEY (game_id, team, position)
+);
+
+CREATE TABLE IF NOT EXISTS tournaments (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    date TEXT,
+    status TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_games_timestamp ON games(timestamp);
+CREATE INDEX IF NOT EXISTS idx_games_tournament ON games(tournament_id);
+CREATE INDEX IF NOT EXISTS idx_game_players_player ON game_players(player_id);
+"""
+
+# Базы данных, для которых схема уже создана в этом процессе
+_initialized_paths = set()
+
+def _connect(path=DATABASE_FILE):
+    """
+    Открывает соединение с базой данных и при необходимости создает схему
+
+    Parameters:
+    - path: Путь к файлу базы данных
+
+    Returns:
+    - sqlite3.Connection
+    """
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+
+    # Ключ - абсолютный путь: относительный путь указывает на другой файл после смены каталога
+    key = os.path.abspath(path)
+    if key not in _initialized_paths:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        _initialized_paths.add(key)
+
+    return conn
+
+def _to_sql_value(value):
+    """
+    Приводит значение из DataFrame/session_state к типу, который понимает sqlite3
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        # Тот же формат, что у строковых дат в записях ("YYYY-MM-DD HH:MM:SS"), чтобы сравнение строк было верным
+        return value.isoformat(sep=' ')
+    # numpy скаляры (int64, float64 и т.д.)
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def _to_sql_timestamp(value):
+    """
+    Приводит дату игры или границу интервала (datetime или ISO строку) к формату хранимых дат
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return _to_sql_value(value)
+
+def _to_int(value):
+    """
+    Приводит ID (в том числе float вида 7.0) к int
+    """
+    value = _to_sql_value(value)
+    return int(value) if value is not None else None
+
+def get_meta(key, default=None, path=DATABASE_FILE):
+    """
+    Читает служебное значение из таблицы meta
+
+    Parameters:
+    - key: Ключ
+    - default: Значение по умолчанию, если ключа нет
+    - path: Путь к файлу базы данных
+    """
+    conn = _connect(path)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row is not None else default
+    finally:
+        conn.close()
+
+def set_meta(key, value, path=DATABASE_FILE):
+    """
+    Записывает служебное значение в таблицу meta
+    """
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, str(value))
+            )
+    finally:
+        conn.close()
+
+def add_player_columns(path=DATABASE_FILE):
+    """
+    Добавляет в таблицу игроков существующей базы колонки ADDED_PLAYER_COLUMNS, которых в ней нет
+    """
+    conn = _connect(path)
+    try:
+        existing = {row['name'] for row in conn.execute("PRAGMA table_info(players)")}
+        with conn:
+            for column, column_type in ADDED_PLAYER_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE players ADD COLUMN {column} {column_type}")
+    finally:
+        conn.close()
+
+def normalize_game_timestamps(path=DATABASE_FILE):
+    """
+    Приводит даты игр, записанные ISO строками с 'T', к формату хранимых дат ("YYYY-MM-DD HH:MM:SS")
+    """
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "UPDATE games SET timestamp = replace(timestamp, 'T', ' ') "
+                "WHERE timestamp LIKE '____-__-__T%'"
+            )
+    finally:
+        conn.close()
+
+def save_players(players, player_ids=None, game_offset=None, rating_engine=None, applied_games=None,
+                 path=DATABASE_FILE):
+    """
+    Сохраняет игроков построчными upsert-запросами
+
+    Parameters:
+    - players: Список словарей с данными игроков
+    - player_ids: Если задан, сохраняются только игроки с этими ID,
+      иначе таблица полностью синхронизируется (включая удаление отсутствующих)
+    - game_offset: Смещение в журнале игр, на котором сделан снимок
+      (записывается в meta в той же транзакции)
+    - rating_engine: Движок, которым посчитаны рейтинги снимка (также записывается в meta)
+    - applied_games: Позиции игр журнала после смещения, уже учтенные в снимке
+    - path: Путь к файлу базы данных
+    """
+    if player_ids is not None:
+        wanted = {_to_int(player_id) for player_id in player_ids}
+        players = [p for p in players if _to_int(p.get('id')) in wanted]
+
+    rows = []
+    for player in players:
+        if _to_int(player.get('id')) is None:
+            continue
+        row = [_to_sql_value(player.get(col)) for col in PLAYER_COLUMNS]
+        row[0] = _to_int(row[0])
+        rows.append(row)
+
+    columns = ', '.join(PLAYER_COLUMNS)
+    placeholders = ', '.join('?' for _ in PLAYER_COLUMNS)
+    updates = ', '.join(f"{col} = excluded.{col}" for col in PLAYER_COLUMNS[1:])
+
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.executemany(
+                f"INSERT INTO players ({columns}) VALUES ({placeholders}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                rows
+            )
+
+            if player_ids is None:
+                # Полная синхронизация - удаляем игроков, которых больше нет
+                keep_ids = [row[0] for row in rows]
+                conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id INTEGER PRIMARY KEY)")
+                conn.execute("DELETE FROM keep_ids")
+                conn.executemany("INSERT OR IGNORE INTO keep_ids (id) VALUES (?)", [(i,) for i in keep_ids])
+                conn.execute("DELETE FROM players WHERE id NOT IN (SELECT id FROM keep_ids)")
+
+            if game_offset is not None:
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('players_game_offset', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (str(int(game_offset)),)
+                )
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('players_applied_games', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (json.dumps([int(position) for position in applied_games or []]),)
+                )
+
+            if rating_engine is not None:
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('players_rating_engine', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (rating_engine,)
+                )
+    finally:
+        conn.close()
+
+def load_players(path=DATABASE_FILE):
+    """
+    Загружает всех игроков
+
+    Returns:
+    - Список словарей с данными игроков
+    """
+    conn = _connect(path)
+    try:
+        rows = conn.execute(f"SELECT {', '.join(PLAYER_COLUMNS)} FROM players ORDER BY rowid").fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+def _insert_games(conn, games):
+    """
+    Вставляет записи об играх и составы команд
+    """
+    for game in games:
+        tournament = game.get('tournament') or {}
+        cursor = conn.execute(
+            "INSERT INTO games (timestamp, court_number, team_a_score, team_b_score, "
+            "tournament_id, tournament_name, game_number, total_games) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                _to_sql_timestamp(game.get('timestamp')),
+                _to_sql_value(game.get('court_number')),
+                _to_sql_value(game.get('team_a_score')),
+                _to_sql_value(game.get('team_b_score')),
+                _to_int(tournament.get('tournament_id')),
+                _to_sql_value(tournament.get('tournament_name')),
+                _to_sql_value(tournament.get('game_number')),
+                _to_sql_value(tournament.get('total_games')),
+            )
+        )
+        game_id = cursor.lastrowid
+
+        team_rows = []
+        for team, key in (('A', 'team_a_players'), ('B', 'team_b_players')):
+            for position, player_id in enumerate(game.get(key, [])):
+                team_rows.append((game_id, team, position, _to_int(player_id)))
+        conn.executemany(
+            "INSERT INTO game_players (game_id, team, position, player_id) VALUES (?, ?, ?, ?)",
+            team_rows
+        )
+
+def append_games(games, path=DATABASE_FILE):
+    """
+    Добавляет новые игры в историю
+
+    Parameters:
+    - games: Список записей об играх
+    - path: Путь к файлу базы данных
+    """
+    if not games:
+        return
+
+    conn = _connect(path)
+    try:
+        with conn:
+            _insert_games(conn, games)
+    finally:
+        conn.close()
+
+def replace_games(games, path=DATABASE_FILE):
+    """
+    Полностью заменяет историю игр
+
+    Parameters:
+    - games: Полный список записей об играх
+    - path: Путь к файлу базы данных
+    """
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM games")
+            _insert_games(conn, games)
+    finally:
+        conn.close()
+
+def _rows_to_games(conn, game_rows):
+    """
+    Собирает записи об играх в формате session_state из строк таблиц games и game_players
+    """
+    if not game_rows:
+        return []
+
+    games = {}
+    for row in game_rows:
+        tournament = {}
+        if row['tournament_id'] is not None:
+            tournament = {
+                'tournament_id': row['tournament_id'],
+                'tournament_name': row['tournament_name'],
+                'game_number': row['game_number'],
+                'total_games': row['total_games']
+            }
+        games[row['id']] = {
+            'timestamp': row['timestamp'],
+            'court_number': row['court_number'],
+            'team_a_players': [],
+            'team_b_players': [],
+            'team_a_score': row['team_a_score'],
+            'team_b_score': row['team_b_score'],
+            'tournament': tournament
+        }
+
+    # Составы команд загружаем одним запросом по списку ID игр
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted_games (id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM wanted_games")
+    conn.executemany("INSERT INTO wanted_games (id) VALUES (?)", [(game_id,) for game_id in games])
+    player_rows = conn.execute(
+        "SELECT game_id, team, player_id FROM game_players "
+        "WHERE game_id IN (SELECT id FROM wanted_games) "
+        "ORDER BY game_id, team, position"
+    ).fetchall()
+
+    for row in player_rows:
+        key = 'team_a_players' if row['team'] == 'A' else 'team_b_players'
+        games[row['game_id']][key].append(row['player_id'])
+
+    return list(games.values())
+
+def load_games(path=DATABASE_FILE):
+    """
+    Загружает всю историю игр в порядке добавления
+
+    Returns:
+    - Список записей об играх (даты - ISO строки)
+    """
+    conn = _connect(path)
+    try:
+        game_rows = conn.execute("SELECT * FROM games ORDER BY id").fetchall()
+        return _rows_to_games(conn, game_rows)
+    finally:
+        conn.close()
+
+def load_tournament_games(tournament_id=None, path=DATABASE_FILE):
+    """
+    Загружает игры одного турнира в порядке добавления
+
+    Parameters:
+    - tournament_id: ID турнира (None - игры вне турнира)
+    - path: Путь к файлу базы данных
+
+    Returns:
+    - Список записей об играх (даты - ISO строки)
+    """
+    conn = _connect(path)
+    try:
+        if tournament_id is None:
+            game_rows = conn.execute("SELECT * FROM games WHERE tournament_id IS NULL ORDER BY id").fetchall()
+        else:
+            game_rows = conn.execute(
+                "SELECT * FROM games WHERE tournament_id = ? ORDER BY id", (_to_int(tournament_id),)
+            ).fetchall()
+        return _rows_to_games(conn, game_rows)
+    finally:
+        conn.close()
+
+def list_game_tournaments(path=DATABASE_FILE):
+    """
+    Возвращает ID турниров, для которых есть игры (None - есть игры вне турнира)
+    """
+    conn = _connect(path)
+    try:
+        return [row['tournament_id'] for row in conn.execute("SELECT DISTINCT tournament_id FROM games")]
+    finally:
+        conn.close()
+
+def count_games(path=DATABASE_FILE):
+    """
+    Возвращает количество игр в истории
+    """
+    conn = _connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+    finally:
+        conn.close()
+
+def query_games(player_id=None, tournament_id=None, start=None, end=None, path=DATABASE_FILE):
+    """
+    Выбирает игры по игроку, турниру и диапазону времени с использованием индексов
+
+    Parameters:
+    - player_id: ID игрока (None - любой)
+    - tournament_id: ID турнира (None - любой)
+    - start: Начало интервала (datetime или ISO строка, включительно)
+    - end: Конец интервала (datetime или ISO строка, включительно)
+    - path: Путь к файлу базы данных
+
+    Returns:
+    - Список записей об играх
+    """
+    conditions = []
+    params = []
+
+    if player_id is not None:
+        conditions.append("id IN (SELECT game_id FROM game_players WHERE player_id = ?)")
+        params.append(_to_int(player_id))
+    if tournament_id is not None:
+        conditions.append("tournament_id = ?")
+        params.append(_to_int(tournament_id))
+    if start is not None:
+        conditions.append("timestamp >= ?")
+        params.append(_to_sql_timestamp(start))
+    if end is not None:
+        conditions.append("timestamp <= ?")
+        params.append(_to_sql_timestamp(end))
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = _connect(path)
+    try:
+        game_rows = conn.execute(f"SELECT * FROM games {where} ORDER BY id", params).fetchall()
+        return _rows_to_games(conn, game_rows)
+    finally:
+        conn.close()
+
+def save_tournaments(tournaments, path=DATABASE_FILE):
+    """
+    Сохраняет список турниров (upsert по ID, отсутствующие турниры удаляются)
+
+    Parameters:
+    - tournaments: Список словарей турниров (даты уже сериализованы в строки)
+    - path: Путь к файлу базы данных
+    """
+    rows = []
+    for tournament in tournaments:
+        rows.append((
+            _to_int(tournament.get('id')),
+            _to_sql_value(tournament.get('name')),
+            _to_sql_value(tournament.get('date')),
+            _to_sql_value(tournament.get('status')),
+            json.dumps(tournament, ensure_ascii=False, default=_to_sql_value)
+        ))
+
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO tournaments (id, name, date, status, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name, date = excluded.date, "
+                "status = excluded.status, data = excluded.data",
+                rows
+            )
+            ids = [row[0] for row in rows]
+            if ids:
+                conn.execute(f"DELETE FROM tournaments WHERE id NOT IN ({', '.join('?' for _ in ids)})", ids)
+            else:
+                conn.execute("DELETE FROM tournaments")
+    finally:
+        conn.close()
+
+def load_tournaments(path=DATABASE_FILE):
+    """
+    Загружает список турниров
+
+    Returns:
+    - Список словарей турниров (даты - ISO строки)
+    """
+    conn = _connect(path)
+    try:
+        rows = conn.execute("SELECT data FROM tournaments ORDER BY id").fetchall()
+        return [json.loads(row['data']) for row in rows]
+    finally:
+        conn.close()
@@ -1,152 +1,1133 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 import os
+import copy
+import itertools
+import threading
 from datetime import datetime
+import schemas
+import sqlite_storage
+import persistence_worker
+import history_archive
+import game_store
+import timeseries_store
+import json_stream
+import rating_engines
 
 # Константы для файлов хранения
 PLAYERS_DATA_FILE = 'players_data.json'
 GAME_HISTORY_FILE = 'game_history.json'
 TOURNAMENTS_DATA_FILE = 'tournaments_data.json'
 
-def save_players_data():
+# Журнал истории игр: одна компактная JSON-строка на игру, только дозапись
+# (до версии формата 2 - единый файл, затем разбит по турнирам)
+GAME_HISTORY_JOURNAL_FILE = 'game_history.jsonl'
+
+# Каталог журналов истории по турнирам: tournament_<id>.jsonl и casual.jsonl для игр вне турнира
+GAME_HISTORY_SHARDS_DIR = 'game_history'
+
+# Номер части истории для игр вне турнира (турниры нумеруются с 1)
+CASUAL_SHARD = 0
+
+# Бэкенд хранения: 'json' (файлы выше) или 'sqlite' (sqlite_storage.DATABASE_FILE)
+STORAGE_BACKEND = os.environ.get('ROTATION_STORAGE_BACKEND', 'json').lower()
+
+# Количество файлов в архиве истории, после которого архив уплотняется при запуске
+ARCHIVE_COMPACT_THRESHOLD = 200
+
+# Размер пачки записей, разбираемых за раз при потоковом чтении истории
+STREAM_BATCH_SIZE = 1000
+
+# Служебный файл с версией формата данных (для JSON бэкенда)
+STORAGE_META_FILE = 'storage_meta.json'
+
+# Текущая версия формата данных:
+# 1 - целые ID игроков и турниров, турниры только в формате списка
+# 2 - история игр разбита на журналы по турнирам
+# 3 - состояние рейтинга Glicko-2 у игроков (в базе данных - новые колонки таблицы игроков)
+# 4 - даты игр в базе данных в едином формате "YYYY-MM-DD HH:MM:SS"
+SCHEMA_VERSION = 4
+
+def use_sqlite():
+    """
+    Проверяет, выбран ли SQLite бэкенд хранения
+    """
+    return STORAGE_BACKEND == 'sqlite'
+
+# Кэш разобранных данных, общий для всех сессий процесса:
+# имя коллекции -> (сигнатура исходных файлов, загруженные данные)
+_load_cache = {}
+_load_cache_lock = threading.Lock()
+
+def _source_files(collection):
+    """
+    Возвращает файлы, из которых загружается коллекция
+    ('players', 'tournaments', 'history:<номер части истории>', 'count:<номер части истории>',
+    'ratings:<движок>:<ID игрока>' или 'archive:<фильтры выборки>')
+    """
+    if collection.startswith('archive:'):
+        # Дозапись в архив добавляет новые файлы, пересборка заменяет каталог целиком
+        return sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(history_archive.ARCHIVE_DIR) for name in files
+        )
+    if collection.startswith('ratings:'):
+        # История рейтингов хранится в файлах временных рядов при любом бэкенде
+        _, engine, player_id = collection.split(':', 2)
+        return [timeseries_store.series_path(_rating_history_dir(engine), player_id)]
+    if use_sqlite():
+        # Изменения в режиме WAL сначала попадают в файл -wal
+        return [sqlite_storage.DATABASE_FILE, f"{sqlite_storage.DATABASE_FILE}-wal"]
+    if collection.startswith(('history:', 'count:')):
+        return [_shard_path(int(collection.split(':', 1)[1]))]
+    return {
+        'players': [PLAYERS_DATA_FILE],
+        'tournaments': [TOURNAMENTS_DATA_FILE],
+    }[collection]
+
+def _source_signature(collection):
+    """
+    Возвращает сигнатуру исходных файлов коллекции: бэкенд, время изменения и размер каждого файла
+    """
+    signature = [STORAGE_BACKEND]
+    for path in _source_files(collection):
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+def _cached_load(collection, loader):
+    """
+    Возвращает данные коллекции из кэша процесса или загружает их
+    
+    Запись кэша действительна, пока не изменились время изменения и размер
+    исходных файлов. Возвращаемые данные общие для всех сессий - их нужно копировать.
+    
+    Parameters:
+    - collection: Имя коллекции
+    - loader: Функция загрузки данных с диска
+    
+    Returns:
+    - Загруженные данные
+    """
+    # Сигнатуру снимаем до чтения: если файл изменится во время загрузки, следующая сессия перечитает его
+    signature = _source_signature(collection)
+    with _load_cache_lock:
+        entry = _load_cache.get(collection)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+    
+    data = loader()
+    with _load_cache_lock:
+        _load_cache[collection] = (signature, data)
+    return data
+
+def invalidate_load_cache(collection=None):
+    """
+    Сбрасывает кэш загруженных данных
+    
+    Parameters:
+    - collection: Имя коллекции (None - все коллекции; 'history' - все части истории, 'ratings' - все игроки)
+    """
+    with _load_cache_lock:
+        if collection is None:
+            _load_cache.clear()
+        else:
+            for key in list(_load_cache):
+                if key == collection or key.startswith(f"{collection}:"):
+                    del _load_cache[key]
+
+def _invalidating(collection, writer):
+    """
+    Оборачивает функцию записи так, чтобы после записи сбрасывался кэш коллекции
+    """
+    def write(data):
+        try:
+            writer(data)
+        finally:
+            invalidate_load_cache(collection)
+    return write
+
+def _dirty_flags():
+    """
+    Возвращает словарь флагов несохраненных изменений для текущей сессии
+    
+    - 'players': False (нет изменений), True (изменена вся таблица) или set ID измененных игроков
+    - 'tournaments': bool
+    
+    Изменения истории игр определяются по количеству еще не сохраненных записей.
+    """
+    if 'dirty_flags' not in st.session_state:
+        st.session_state.dirty_flags = {'players': False, 'tournaments': False}
+    return st.session_state.dirty_flags
+
+def mark_dirty(collection, ids=None):
+    """
+    Отмечает, что данные изменились и должны быть сохранены при следующем auto_save_data
+    
+    Parameters:
+    - collection: 'players' или 'tournaments'
+    - ids: Для 'players' - ID измененных игроков (None - изменена вся таблица)
+    """
+    flags = _dirty_flags()
+    if collection == 'players' and ids is not None:
+        if flags['players'] is not True:
+            flags['players'] = set(flags['players'] or ()) | set(ids)
+    else:
+        flags[collection] = True
+
+def is_dirty(collection):
+    """
+    Проверяет, есть ли несохраненные изменения в коллекции
+    
+    Parameters:
+    - collection: 'players', 'history', 'ratings' или 'tournaments'
+    """
+    if collection == 'history':
+        return len(st.session_state.get('game_history', [])) != st.session_state.get('game_history_persisted', 0)
+    if collection == 'ratings':
+        persisted = st.session_state.get('rating_history_persisted', {})
+        return any(len(entries) != persisted.get(player_id, 0)
+                   for player_id, entries in st.session_state.get('rating_history', {}).items())
+    return bool(_dirty_flags()[collection])
+
+# Журнал игр дописывают фоновые записи всех сессий процесса: позиции дозаписей
+# и смещения снимков игроков вычисляются под этой блокировкой
+_game_log_lock = threading.Lock()
+
+def _append_game_log(entries):
+    """
+    Дописывает игры в бинарный журнал (выполняется в фоновом потоке)
+    
+    Позиции игр отмечаются в состоянии журнала добавившей их сессии,
+    чтобы она не приняла свои игры за игры других сессий.
+    
+    Parameters:
+    - entries: Список (состояние журнала сессии или None, запись об игре) в порядке поступления
+    """
+    with _game_log_lock:
+        start = game_store.game_count()
+        game_store.append_games([record for _, record in entries])
+        for position, (log_state, _) in enumerate(entries, start):
+            if log_state is not None:
+                log_state['own'].append(position)
+
+def _rewrite_game_log(snapshot):
+    """
+    Перезаписывает бинарный журнал историей сессии (выполняется в фоновом потоке)
+    
+    Parameters:
+    - snapshot: (состояние журнала сессии или None, полный список записей об играх)
+    """
+    log_state, records = snapshot
+    with _game_log_lock:
+        game_store.write_games(records)
+        if log_state is not None:
+            # Весь новый журнал - история этой сессии, уже учтенная в ее players_df
+            log_state['offset'] = len(records)
+            log_state['own'] = []
+
+def _catch_up_game_log():
+    """
+    Применяет к players_df игры, которые другие сессии дописали в журнал
+    после последней синхронизации этой сессии
+    
+    Returns:
+    - Список ID игроков, данные которых изменились
+    """
+    log_state = st.session_state.get('game_log')
+    if log_state is None:
+        return []
+    
+    with _game_log_lock:
+        game_count = game_store.game_count()
+        own = set(log_state['own']) | log_state.get('applied', set())
+        foreign = [position for position in range(log_state['offset'], game_count) if position not in own]
+        log_state['offset'] = max(log_state['offset'], game_count)
+    if not foreign:
+        return []
+    
+    games = game_store.open_games()[foreign]
+    changed_ids = apply_game_totals(st.session_state.players_df, games)
+    if changed_ids:
+        from player_management import calculate_ratings
+        calculate_ratings(player_ids=changed_ids, games=games)
+    return changed_ids
+
+def _stored_snapshot(snapshot):
     """
-    Сохраняет данные игроков в JSON файл
+    Возвращает снимок игроков в том виде, в каком он записывается (выполняется в фоновом потоке)
+    
+    Снимок учитывает журнал до смещения синхронизации сессии и игры самой сессии,
+    отправленные на запись до снимка. Смещение продвигается через уже записанные
+    позиции этих игр; позиции, отделенные от смещения играми других сессий,
+    перечисляются в applied_games, чтобы при запуске они не были учтены повторно.
+    """
+    stored = {key: value for key, value in snapshot.items() if key != 'game_log'}
+    if snapshot.get('game_log') is not None:
+        log_state, own_count = snapshot['game_log']
+        with _game_log_lock:
+            own = set(log_state['own'][:own_count])
+        while stored['game_offset'] in own:
+            stored['game_offset'] += 1
+        stored['applied_games'] = sorted(position for position in own if position > stored['game_offset'])
+    return stored
+
+def _write_players_file(snapshot):
+    """
+    Записывает снимок игроков в JSON файл (выполняется в фоновом потоке)
+    """
+    persistence_worker.write_json_atomic(PLAYERS_DATA_FILE, _stored_snapshot(snapshot))
+
+def _save_players_snapshot(snapshot):
+    """
+    Полностью синхронизирует игроков в базе данных вместе со смещением журнала игр
+    """
+    snapshot = _stored_snapshot(snapshot)
+    sqlite_storage.save_players(snapshot['players'], game_offset=snapshot['game_offset'],
+                                rating_engine=snapshot['rating_engine'],
+                                applied_games=snapshot.get('applied_games'))
+
+def _upsert_players_rows(snapshots):
+    """
+    Сохраняет в базу данных только переданные строки игроков (выполняется в фоновом потоке)
+    
+    Parameters:
+    - snapshots: Список частичных снимков {'game_offset', 'rating_engine', 'players'} в порядке поступления
+    """
+    latest = _stored_snapshot(snapshots[-1])
+    # Более поздние строки одного игрока перекрывают ранние
+    players = {}
+    for snapshot in snapshots:
+        for player in snapshot['players']:
+            players[player['id']] = player
+    sqlite_storage.save_players(
+        list(players.values()),
+        player_ids=list(players),
+        game_offset=latest['game_offset'],
+        rating_engine=latest['rating_engine'],
+        applied_games=latest.get('applied_games')
+    )
+
+def save_players_data(player_ids=None):
+    """
+    Сохраняет данные игроков в JSON файл или базу данных
+    
+    Снимок игроков помечается смещением в журнале игр (game_offset): агрегаты
+    (победы, поражения, очки) учитывают ровно столько первых игр журнала,
+    и движком, которым посчитаны рейтинги (rating_engine). Перед сохранением
+    сессия доигрывает игры, добавленные в журнал другими сессиями, а смещение
+    определяется по журналу в момент записи.
+    
+    Parameters:
+    - player_ids: ID игроков, данные которых изменились. Для SQLite сохраняются
+      только эти строки; JSON файл всегда переписывается целиком
     """
     if 'players_df' in st.session_state:
-        # Преобразуем DataFrame в список словарей
-        players_data = st.session_state.players_df.to_dict('records')
+        changed_ids = _catch_up_game_log()
+        if player_ids is not None and changed_ids:
+            player_ids = set(player_ids) | set(changed_ids)
         
-        # Обрабатываем datetime объекты для корректной сериализации
-        for player in players_data:
-            for key, value in player.items():
-                if isinstance(value, datetime):
-                    player[key] = value.isoformat()
+        players_df = st.session_state.players_df
+        log_state = st.session_state.get('game_log')
         
-        # Сохраняем в файл
-        with open(PLAYERS_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(players_data, f, ensure_ascii=False, indent=4)
+        if use_sqlite() and player_ids is not None and 'id' in players_df.columns:
+            players_df = players_df[players_df['id'].isin(list(player_ids))]
+        
+        # Преобразуем DataFrame в список словарей (даты - строками, как в файле)
+        players_data = schemas.frame_to_records(players_df, schemas.PLAYER_SCHEMA)
+        
+        snapshot = {
+            'game_offset': log_state['offset'] if log_state is not None else None,
+            'rating_engine': rating_engines.selected_engine(),
+            'players': players_data,
+            # Состояние журнала сессии и число ее игр, учтенных в снимке:
+            # по ним смещение уточняется в момент записи
+            'game_log': (log_state, log_state['submitted']) if log_state is not None else None
+        }
+        
+        # Снимок данных готов - сама запись выполняется в фоновом потоке
+        if use_sqlite():
+            key = f"{sqlite_storage.DATABASE_FILE}:players"
+            if player_ids is None:
+                persistence_worker.submit_replace(key, _invalidating('players', _save_players_snapshot), snapshot)
+            else:
+                persistence_worker.submit_append(
+                    key, _invalidating('players', _upsert_players_rows), [snapshot], after_pending=True
+                )
+        else:
+            # Сохраняем в файл
+            persistence_worker.submit_replace(PLAYERS_DATA_FILE, _invalidating('players', _write_players_file), snapshot)
+        
+        # Снимаем флаги изменений с сохраненных игроков
+        flags = _dirty_flags()
+        if player_ids is None or not use_sqlite():
+            flags['players'] = False
+        elif isinstance(flags['players'], set):
+            flags['players'] = flags['players'] - set(player_ids)
         
         return True
     return False
 
 def load_players_data():
     """
-    Загружает данные игроков из JSON файла
+    Загружает данные игроков из JSON файла или базы данных
+    
+    Разобранные данные берутся из кэша процесса, сессия получает свою копию.
     
     Returns:
         DataFrame с данными игроков или пустой DataFrame если файл не найден
     """
-    if os.path.exists(PLAYERS_DATA_FILE):
+    return _cached_load('players', _read_players_data).copy()
+
+def _read_players_file():
+    """
+    Читает JSON файл игроков
+    
+    Returns:
+    - (список игроков, смещение в журнале игр, движок рейтинга, учтенные игры после смещения);
+      для файлов старого формата смещение и движок - None
+    """
+    with open(PLAYERS_DATA_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return (data.get('players', []), data.get('game_offset'), data.get('rating_engine'),
+                data.get('applied_games') or [])
+    return data, None, None, []
+
+def _read_players_data():
+    """
+    Читает и разбирает данные игроков с диска
+    
+    Смещение в журнале игр, на котором сделан снимок, сохраняется в df.attrs['game_offset'],
+    уже учтенные игры после смещения - в df.attrs['applied_games'],
+    движок рейтинга снимка - в df.attrs['rating_engine'].
+    """
+    players_data = None
+    game_offset = None
+    rating_engine = None
+    applied_games = []
+    if use_sqlite():
         try:
-            with open(PLAYERS_DATA_FILE, 'r', encoding='utf-8') as f:
-                players_data = json.load(f)
+            players_data = sqlite_storage.load_players()
+            game_offset = sqlite_storage.get_meta('players_game_offset')
+            rating_engine = sqlite_storage.get_meta('players_rating_engine')
+            applied_games = json.loads(sqlite_storage.get_meta('players_applied_games', '[]'))
+            if not sqlite_storage.get_meta('imported_players'):
+                # Первый запуск с SQLite - один раз переносим игроков из JSON файла
+                if not players_data and os.path.exists(PLAYERS_DATA_FILE):
+                    players_data, game_offset, rating_engine, applied_games = _read_players_file()
+                    sqlite_storage.save_players(players_data, game_offset=game_offset, rating_engine=rating_engine,
+                                                applied_games=applied_games)
+                sqlite_storage.set_meta('imported_players', 1)
+            if not players_data:
+                players_data = None
+        except Exception as e:
+            st.error(f"Ошибка при загрузке данных игроков: {e}")
+            return pd.DataFrame()
+    
+    if players_data or (not use_sqlite() and os.path.exists(PLAYERS_DATA_FILE)):
+        try:
+            if players_data is None:
+                players_data, game_offset, rating_engine, applied_games = _read_players_file()
             
             # Преобразуем список словарей в DataFrame
             df = pd.DataFrame(players_data)
             
-            # Преобразуем строки в datetime объекты
-            date_columns = [col for col in df.columns if 'date' in col.lower() or 'time' in col.lower()]
-            for col in date_columns:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='ignore')
-            
+            # Приводим колонки к типам схемы (даты - одним преобразованием на колонку)
+            df = schemas.convert_frame(df, schemas.PLAYER_SCHEMA)
+            df.attrs['game_offset'] = int(game_offset) if game_offset is not None else None
+            df.attrs['applied_games'] = [int(position) for position in applied_games]
+            df.attrs['rating_engine'] = rating_engine
             return df
         except Exception as e:
             st.error(f"Ошибка при загрузке данных игроков: {e}")
             return pd.DataFrame()
     else:
         # Возвращаем пустой DataFrame с нужными колонками
-        return pd.DataFrame(columns=[
+        return schemas.convert_frame(pd.DataFrame(columns=[
             'id', 'name', 'phone', 'email', 'rating', 
             'wins', 'losses', 'points_won', 'points_lost', 'points_difference',
             'created_at', 'last_played'
-        ])
+        ]), schemas.PLAYER_SCHEMA)
+
+def apply_game_totals(players_df, games):
+    """
+    Добавляет к агрегатам игроков результаты пачки игр (векторными операциями)
+    
+    Parameters:
+    - players_df: DataFrame игроков (изменяется на месте)
+    - games: Массив игр с dtype game_store.GAME_DTYPE
+    
+    Returns:
+    - Список ID игроков, агрегаты которых изменились
+    """
+    totals = game_store.player_totals(games)
+    if totals.empty or players_df.empty:
+        return []
+    
+    totals = totals.set_index('id')
+    player_ids = players_df['id'].astype('int64')
+    matched = player_ids.isin(totals.index)
+    for column in ('wins', 'losses', 'points_won', 'points_lost'):
+        if column not in players_df.columns:
+            players_df[column] = 0
+        # Приводим к типу колонки (int32), чтобы сложение не расширяло ее до int64
+        players_df.loc[matched, column] += player_ids[matched].map(totals[column]).values.astype(players_df[column].dtype)
+    players_df['points_difference'] = players_df['points_won'] - players_df['points_lost']
+    
+    return players_df.loc[matched, 'id'].tolist()
+
+def _replay_game_tail(players_df, game_offset, game_count, applied_games=()):
+    """
+    Применяет к агрегатам игроков игры журнала, которых еще нет в снимке
+    
+    Parameters:
+    - players_df: DataFrame игроков (изменяется на месте)
+    - game_offset: Смещение, на котором сделан снимок игроков
+    - game_count: Текущее количество игр в журнале
+    - applied_games: Позиции игр после смещения, уже учтенные в снимке
+    
+    Returns:
+    - (список ID игроков, агрегаты которых изменились; примененные игры)
+    """
+    games = game_store.open_games()[game_offset:game_count]
+    if applied_games:
+        applied = set(applied_games)
+        games = games[[position not in applied for position in range(game_offset, game_count)]]
+    return apply_game_totals(players_df, games), games
+
+def _serialize_datetimes(record):
+    """
+    Возвращает копию словаря, в которой datetime значения заменены ISO строками
+    
+    Копия собирается за один проход, без копирования и последующей перезаписи полей.
+    """
+    return {key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in record.items()}
+
+def _serialize_game_record(game):
+    """
+    Подготавливает запись об игре к сериализации (datetime -> ISO строка)
+    
+    Parameters:
+    - game: Словарь с данными игры
+    
+    Returns:
+    - Копия записи, пригодная для json.dumps
+    """
+    return _serialize_datetimes(game)
+
+def _parse_game_records(games):
+    """
+    Преобразует строковые даты записей об играх в datetime объекты по схеме GAME_SCHEMA
+    
+    Parameters:
+    - games: Список записей об играх (изменяются на месте)
+    
+    Returns:
+    - Тот же список
+    """
+    return schemas.parse_records(games, schemas.GAME_SCHEMA)
+
+# Размер блока, которым недописанная строка ищется с конца журнала
+JOURNAL_TAIL_CHUNK = 4096
+
+def _drop_torn_line(path):
+    """
+    Обрезает недописанную последнюю строку журнала (например, после сбоя во время записи),
+    чтобы следующая дозапись не склеила с ней новую запись
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        
+        # Ищем последний перевод строки, читая журнал с конца блоками
+        position = end
+        while position > 0:
+            start = max(0, position - JOURNAL_TAIL_CHUNK)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            position = start
+        f.truncate(0)
+
+def append_game_records(records, path=GAME_HISTORY_JOURNAL_FILE):
+    """
+    Дописывает записи об играх в конец журнала истории
+    
+    Каждая игра занимает одну компактную строку, поэтому стоимость сохранения
+    зависит только от количества новых игр, а не от размера всей истории.
+    
+    Parameters:
+    - records: Список записей об играх
+    - path: Путь к файлу журнала
+    """
+    if not records:
+        return
+    
+    lines = [
+        json.dumps(_serialize_game_record(game), ensure_ascii=False, separators=(',', ':'))
+        for game in records
+    ]
+    
+    _drop_torn_line(path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def rewrite_game_journal(records, path=GAME_HISTORY_JOURNAL_FILE):
+    """
+    Атомарно перезаписывает журнал истории игр (используется для миграции и компактизации)
+    
+    Parameters:
+    - records: Полный список записей об играх
+    - path: Путь к файлу журнала
+    """
+    with persistence_worker.atomic_write(path) as f:
+        for game in records:
+            f.write(json.dumps(_serialize_game_record(game), ensure_ascii=False, separators=(',', ':')) + '\n')
+
+def iter_game_journal(path=GAME_HISTORY_JOURNAL_FILE):
+    """
+    Построчно читает журнал истории игр
+    
+    Parameters:
+    - path: Путь к файлу журнала
+    
+    Yields:
+    - Записи об играх в том виде, в котором они хранятся (даты - строки)
+    """
+    if not os.path.exists(path):
+        return
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                game = json.loads(line)
+            except json.JSONDecodeError:
+                # Недописанная строка (например, сбой во время записи) - пропускаем
+                continue
+            yield game
+
+def _shard_of(game):
+    """
+    Возвращает номер части истории для игры (ID турнира или CASUAL_SHARD)
+    """
+    return int((game.get('tournament') or {}).get('tournament_id') or CASUAL_SHARD)
+
+def _shard_path(shard):
+    """
+    Возвращает путь к журналу части истории
+    """
+    name = 'casual.jsonl' if shard == CASUAL_SHARD else f"tournament_{shard}.jsonl"
+    return os.path.join(GAME_HISTORY_SHARDS_DIR, name)
+
+def _group_by_shard(records):
+    groups = {}
+    for game in records:
+        groups.setdefault(_shard_of(game), []).append(game)
+    return groups
+
+def append_sharded_records(records):
+    """
+    Дописывает записи об играх в журналы их турниров
+    
+    Parameters:
+    - records: Список записей об играх
+    """
+    os.makedirs(GAME_HISTORY_SHARDS_DIR, exist_ok=True)
+    for shard, games in _group_by_shard(records).items():
+        append_game_records(games, _shard_path(shard))
+
+def rewrite_sharded_records(records):
+    """
+    Перезаписывает все журналы истории по полному списку игр
+    
+    Журналы турниров, игр которых нет в списке, удаляются.
+    
+    Parameters:
+    - records: Полный список записей об играх
+    """
+    os.makedirs(GAME_HISTORY_SHARDS_DIR, exist_ok=True)
+    groups = _group_by_shard(records)
+    for shard, games in groups.items():
+        rewrite_game_journal(games, _shard_path(shard))
+    for shard in _list_json_shards():
+        if shard not in groups:
+            os.remove(_shard_path(shard))
+
+def _list_json_shards():
+    if not os.path.isdir(GAME_HISTORY_SHARDS_DIR):
+        return []
+    shards = []
+    for name in os.listdir(GAME_HISTORY_SHARDS_DIR):
+        if name == 'casual.jsonl':
+            shards.append(CASUAL_SHARD)
+        elif name.startswith('tournament_') and name.endswith('.jsonl'):
+            try:
+                shards.append(int(name[len('tournament_'):-len('.jsonl')]))
+            except ValueError:
+                continue
+    return sorted(shards)
+
+def list_history_shards():
+    """
+    Возвращает номера частей истории, сохраненных на диске или в базе данных
+    
+    Returns:
+    - Отсортированный список ID турниров (CASUAL_SHARD - игры вне турнира)
+    """
+    if use_sqlite():
+        _import_history_into_database()
+        return sorted(CASUAL_SHARD if tournament_id is None else int(tournament_id)
+                      for tournament_id in sqlite_storage.list_game_tournaments())
+    return _list_json_shards()
+
+def _import_history_into_database():
+    """
+    Первый запуск с SQLite - один раз переносит историю из журналов в базу данных
+    """
+    if sqlite_storage.get_meta('imported_history'):
+        return
+    if not sqlite_storage.list_game_tournaments():
+        games = []
+        for shard in _list_json_shards():
+            games.extend(iter_game_journal(_shard_path(shard)))
+        sqlite_storage.append_games([_serialize_game_record(g) for g in _sorted_games(games)])
+    sqlite_storage.set_meta('imported_history', 1)
+
+def _timestamp_key(game):
+    timestamp = game.get('timestamp')
+    if isinstance(timestamp, datetime):
+        return timestamp.isoformat(sep=' ')
+    return str(timestamp or '')
+
+def _sorted_games(games):
+    """
+    Упорядочивает игры из разных частей истории по времени (стабильно)
+    """
+    return sorted(games, key=_timestamp_key)
+
+def _game_key(game):
+    """
+    Возвращает ключ, по которому игра из памяти сессии узнается среди записанных
+    """
+    return (
+        _timestamp_key(game), game.get('court_number'),
+        tuple(game.get('team_a_players', [])), tuple(game.get('team_b_players', [])),
+        game.get('team_a_score'), game.get('team_b_score')
+    )
+
+def _unsynced_games(key, state_key):
+    """
+    Возвращает игры сессии, которых еще может не быть на диске для ключа фоновой записи
+    
+    Граница (количество первых игр сессии, которые точно записаны) хранится в сессии
+    под именем state_key и сдвигается, когда для ключа не остается незавершенных записей.
+    
+    Returns:
+    - Список игр или None, если история переписывается целиком и диск ей пока не соответствует
+    """
+    game_history = st.session_state.get('game_history', [])
+    persisted = st.session_state.get('game_history_persisted', 0)
+    if persisted > len(game_history):
+        # История укорочена, но еще не переписана
+        st.session_state[state_key] = None
+    elif not persistence_worker.is_pending(key):
+        # Все отправленные на запись игры уже на диске
+        st.session_state[state_key] = persisted
+    synced = st.session_state.get(state_key)
+    return None if synced is None else game_history[synced:]
+
+def _journal_unsynced_games():
+    """
+    Возвращает игры сессии, которых еще может не быть в журнале истории
+    
+    Пока история переписывается целиком, дожидается записи журнала (редкий случай).
+    """
+    games = _unsynced_games(_history_key(), 'history_journal_synced')
+    if games is None:
+        save_game_history()
+        persistence_worker.flush()
+        games = []
+    return games
+
+def _with_unsynced(saved, unsynced):
+    """
+    Дополняет игры, прочитанные с диска, играми сессии, которых среди них нет
+    """
+    if not unsynced:
+        return saved
+    keys = {_game_key(game) for game in saved}
+    return saved + [game for game in unsynced if _game_key(game) not in keys]
+
+def _history_key():
+    """
+    Возвращает ключ фоновой записи журнала истории игр
+    """
+    return f"{sqlite_storage.DATABASE_FILE}:games" if use_sqlite() else GAME_HISTORY_SHARDS_DIR
+
+def journal_game_count():
+    """
+    Возвращает количество игр в журнале истории
+    
+    Журнал (JSON журналы турниров или таблица игр SQLite) - основное хранилище истории:
+    бинарная копия и колоночный архив строятся из него и сверяются с ним.
+    Количество игр в JSON журнале берется из кэша процесса, пока файл не изменился.
+    """
+    if use_sqlite():
+        _import_history_into_database()
+        return sqlite_storage.count_games()
+    return sum(
+        _cached_load(f"count:{shard}", lambda shard=shard: sum(1 for _ in iter_game_journal(_shard_path(shard))))
+        for shard in _list_json_shards()
+    )
+
+def _sync_game_store():
+    """
+    Сверяет бинарную копию истории с журналом и пересобирает ее, если количество игр разошлось
+    (например, файл удален или одна из фоновых записей не удалась)
+    
+    Пока для журнала или копии есть незавершенные фоновые записи, количества
+    могут расходиться временно - тогда копия не проверяется.
+    
+    Returns:
+    - (количество игр в бинарной копии, True - если копия была пересобрана,
+      True - если копия сверена с журналом)
+    """
+    with _game_log_lock:
+        if persistence_worker.is_pending(_history_key()) or persistence_worker.is_pending(game_store.GAME_STORE_FILE):
+            return game_store.game_count(), False, False
+        journal_count = journal_game_count()
+        if game_store.game_count() == journal_count:
+            return journal_count, False, True
+        
+        records = [_serialize_game_record(g) for g in _sorted_games(iter_game_history())]
+        game_store.write_games(records)
+        return len(records), True, True
+
+def _recount_game_totals(players_df):
+    """
+    Пересчитывает агрегаты игроков (победы, поражения, очки) по всему журналу игр
+    """
+    for column in ('wins', 'losses', 'points_won', 'points_lost'):
+        players_df[column] = pd.Series(0, index=players_df.index, dtype=schemas.FRAME_DTYPES[schemas.INT])
+    players_df['points_difference'] = players_df['points_won'] - players_df['points_lost']
+    apply_game_totals(players_df, game_store.open_games())
 
 def save_game_history():
     """
-    Сохраняет историю игр в JSON файл
+    Сохраняет историю игр в журналы турниров
+    
+    Дописываются только записи, которые еще не были сохранены в этой сессии.
     """
     if 'game_history' in st.session_state:
-        # Преобразуем datetime объекты для корректной сериализации
-        game_history = []
-        for game in st.session_state.game_history:
-            game_copy = game.copy()
-            for key, value in game_copy.items():
-                if isinstance(value, datetime):
-                    game_copy[key] = value.isoformat()
-            game_history.append(game_copy)
+        game_history = st.session_state.game_history
+        persisted = st.session_state.get('game_history_persisted', 0)
         
-        # Сохраняем в файл
-        with open(GAME_HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(game_history, f, ensure_ascii=False, indent=4)
+        key = _history_key()
+        if use_sqlite():
+            replace_writer, append_writer = sqlite_storage.replace_games, sqlite_storage.append_games
+        else:
+            replace_writer, append_writer = rewrite_sharded_records, append_sharded_records
+        
+        # Снимаем копии записей здесь, а пишем в фоновом потоке
+        if persisted > len(game_history):
+            # История была укорочена - переписываем журналы и архивы целиком,
+            # вместе с не загруженными в сессию турнирами
+            unloaded = st.session_state.get('history_unloaded_shards', set())
+            all_games = [g for g in game_history if _shard_of(g) not in unloaded]
+            for shard in unloaded:
+                all_games.extend(_load_shard(shard))
+            records = [_serialize_game_record(g) for g in _sorted_games(all_games)]
+            persistence_worker.submit_replace(key, _invalidating('history', replace_writer), records)
+            persistence_worker.submit_replace(history_archive.ARCHIVE_DIR, history_archive.rebuild_archive, records)
+            log_state = st.session_state.get('game_log')
+            if log_state is not None:
+                log_state['submitted'] = 0
+            persistence_worker.submit_replace(game_store.GAME_STORE_FILE, _rewrite_game_log, (log_state, records))
+            # Пока журналы и архив не переписаны, на диске могут оставаться удаленные игры
+            st.session_state.history_archive_synced = None
+            st.session_state.history_journal_synced = None
+        else:
+            # Дописываем только новые игры
+            records = [_serialize_game_record(g) for g in game_history[persisted:]]
+            persistence_worker.submit_append(key, _invalidating('history', append_writer), records)
+            persistence_worker.submit_append(history_archive.ARCHIVE_DIR, history_archive.append_to_archive, records)
+            log_state = st.session_state.get('game_log')
+            if log_state is not None:
+                log_state['submitted'] += len(records)
+            persistence_worker.submit_append(
+                game_store.GAME_STORE_FILE, _append_game_log, [(log_state, record) for record in records]
+            )
+        
+        st.session_state.game_history_persisted = len(game_history)
         
         return True
     return False
 
-def load_game_history():
+def _load_shard(shard):
     """
-    Загружает историю игр из JSON файла
+    Возвращает игры части истории из кэша процесса (общий список - не изменять)
+    """
+    return _cached_load(f"history:{shard}", lambda: _read_history_shard(shard))
+
+def _read_history_shard(shard):
+    """
+    Читает и разбирает игры одной части истории с диска
+    """
+    try:
+        return _parse_game_records(list(_iter_stored_records(shard)))
+    except Exception as e:
+        st.error(f"Ошибка при загрузке истории игр: {e}")
+        return []
+
+def _iter_stored_records(shard):
+    """
+    Потоково читает сохраненные записи части истории (даты - строки)
+    """
+    if use_sqlite():
+        _import_history_into_database()
+        return iter(sqlite_storage.load_tournament_games(None if shard == CASUAL_SHARD else shard))
+    return iter_game_journal(_shard_path(shard))
+
+def iter_game_history(shards=None):
+    """
+    Потоково читает историю игр с диска, не загружая ее в память целиком
+    
+    Записи разбираются пачками по STREAM_BATCH_SIZE и не попадают в кэш процесса,
+    поэтому вызывающий код может фильтровать и агрегировать игры по мере чтения.
+    Игры выдаются по частям истории в порядке записи (без общей сортировки по времени).
+    
+    Parameters:
+    - shards: Номера частей истории (None - все)
+    
+    Yields:
+    - Записи об играх (даты - datetime)
+    """
+    if shards is None:
+        shards = list_history_shards()
+    
+    for shard in shards:
+        batch = []
+        for record in _iter_stored_records(shard):
+            batch.append(record)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield from _parse_game_records(batch)
+                batch = []
+        yield from _parse_game_records(batch)
+
+def load_game_history(shards=None):
+    """
+    Загружает историю игр указанных турниров
+    
+    Разобранные части истории берутся из кэша процесса. Сессия получает свой список;
+    сами записи об играх общие и не изменяются после добавления в историю.
+    
+    Parameters:
+    - shards: Номера частей истории (ID турниров, CASUAL_SHARD - игры вне турнира; None - все)
     
     Returns:
-        Список с историей игр или пустой список если файл не найден
+        Список с историей игр, упорядоченный по времени
     """
-    if os.path.exists(GAME_HISTORY_FILE):
-        try:
-            with open(GAME_HISTORY_FILE, 'r', encoding='utf-8') as f:
-                game_history = json.load(f)
-            
-            # Преобразуем строки в datetime объекты
-            for game in game_history:
-                for key, value in game.items():
-                    if key == 'timestamp' or 'date' in key.lower() or 'time' in key.lower():
-                        try:
-                            game[key] = datetime.fromisoformat(value)
-                        except (ValueError, TypeError):
-                            pass
-            
-            return game_history
-        except Exception as e:
-            st.error(f"Ошибка при загрузке истории игр: {e}")
-            return []
-    else:
-        return []
+    if shards is None:
+        shards = list_history_shards()
+    
+    games = []
+    for shard in shards:
+        games.extend(_load_shard(shard))
+    return _sorted_games(games)
+
+def get_tournament_games(tournament_id):
+    """
+    Возвращает игры турнира
+    
+    Игры завершенных турниров не загружаются при запуске - они читаются с диска
+    при первом обращении и затем берутся из кэша процесса.
+    
+    Parameters:
+    - tournament_id: ID турнира (CASUAL_SHARD - игры вне турнира)
+    
+    Returns:
+    - Список записей об играх
+    """
+    shard = int(tournament_id or CASUAL_SHARD)
+    if shard not in st.session_state.get('history_unloaded_shards', set()):
+        return [g for g in st.session_state.get('game_history', []) if _shard_of(g) == shard]
+    
+    # Новые игры сессии для этого турнира, которые еще не записаны, добавляем из памяти
+    unsynced = [g for g in _journal_unsynced_games() if _shard_of(g) == shard]
+    return _with_unsynced(list(_load_shard(shard)), unsynced)
+
+def _rating_history_dir(engine):
+    """
+    Возвращает каталог рядов истории рейтингов, посчитанных движком engine
+    
+    Ряды классического рейтинга лежат в корне каталога (там они хранились до появления
+    движков), ряды остальных движков - в подкаталоге с именем движка, чтобы не смешивать шкалы.
+    """
+    if engine == 'classic':
+        return timeseries_store.RATING_HISTORY_DIR
+    return os.path.join(timeseries_store.RATING_HISTORY_DIR, engine)
+
+def _append_rating_points(points):
+    """
+    Дописывает точки (движок, ID игрока, время, рейтинг) в ряды соответствующих движков
+    """
+    by_engine = {}
+    for engine, player_id, timestamp, rating in points:
+        by_engine.setdefault(engine, []).append((player_id, timestamp, rating))
+    for engine, engine_points in by_engine.items():
+        timeseries_store.append_points(_rating_history_dir(engine), engine_points)
+
+def save_rating_history():
+    """
+    Дописывает новые точки истории рейтингов в файлы временных рядов игроков
+    
+    В сессии хранятся только точки, добавленные после запуска; для каждого игрока
+    запоминается, сколько из них уже записано, и дописываются только остальные.
+    Каждая точка попадает в ряды движка, которым посчитан ее рейтинг.
+    
+    Returns:
+    - True, если были точки для записи
+    """
+    rating_history = st.session_state.get('rating_history', {})
+    if 'rating_history_persisted' not in st.session_state:
+        st.session_state.rating_history_persisted = {}
+    persisted = st.session_state.rating_history_persisted
+    
+    points = []
+    for player_id, entries in rating_history.items():
+        points.extend((entry['engine'], int(player_id), entry['timestamp'], entry['rating'])
+                      for entry in entries[persisted.get(player_id, 0):])
+        persisted[player_id] = len(entries)
+    
+    if not points:
+        return False
+    
+    persistence_worker.submit_append(
+        timeseries_store.RATING_HISTORY_DIR,
+        _invalidating('ratings', _append_rating_points),
+        points
+    )
+    return True
+
+def load_rating_history(player_id, engine=None):
+    """
+    Загружает историю рейтинга одного игрока
+    
+    Читается только файл этого игрока в рядах движка; прочитанный ряд берется из кэша процесса,
+    пока файл не изменился.
+    Точки сессии, которые еще не записаны фоновым потоком, добавляются из памяти.
+    
+    Parameters:
+    - player_id: ID игрока
+    - engine: Движок рейтинга (по умолчанию - выбранный)
+    
+    Returns:
+    - DataFrame с колонками timestamp и rating, упорядоченный по времени
+    """
+    player_id = int(player_id)
+    engine = engine or rating_engines.selected_engine()
+    series = _cached_load(
+        f"ratings:{engine}:{player_id}",
+        lambda: timeseries_store.read_series(_rating_history_dir(engine), player_id)
+    ).rename(columns={'value': 'rating'})
+    
+    # Точки сессии, которые еще могут быть не записаны, добавляем из памяти
+    if 'rating_history_synced' not in st.session_state:
+        st.session_state.rating_history_synced = {}
+    synced = st.session_state.rating_history_synced
+    if not persistence_worker.is_pending(timeseries_store.RATING_HISTORY_DIR):
+        synced[player_id] = st.session_state.get('rating_history_persisted', {}).get(player_id, 0)
+    
+    entries = [entry for entry in st.session_state.get('rating_history', {}).get(player_id, [])[synced.get(player_id, 0):]
+               if entry['engine'] == engine]
+    if not entries:
+        return series
+    
+    unsaved = pd.DataFrame({
+        'timestamp': pd.to_datetime(pd.Series([entry['timestamp'] for entry in entries], dtype=object),
+                                    format='ISO8601').astype('datetime64[s]'),
+        'rating': [float(entry['rating']) for entry in entries],
+    })
+    return _merge_unsaved(series, unsaved, ['timestamp', 'rating'])
+
+def _merge_unsaved(saved, unsaved, subset):
+    """
+    Дополняет строки, прочитанные с диска, строками из памяти, которые еще могут быть не записаны
+    
+    Строки из памяти, успевшие попасть на диск до чтения, не дублируются.
+    
+    Parameters:
+    - saved: DataFrame, прочитанный с диска
+    - unsaved: DataFrame тех же колонок из памяти сессии
+    - subset: Колонки, по которым строки считаются одинаковыми
+    
+    Returns:
+    - DataFrame, упорядоченный по времени
+    """
+    merged = pd.concat([saved, unsaved], ignore_index=True)
+    duplicated = merged.duplicated(subset=subset, keep='first').to_numpy()
+    duplicated[:len(saved)] = False
+    return merged[~duplicated].sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+def _write_tournaments_file(tournaments_data):
+    """
+    Записывает снимок турниров в JSON файл (выполняется в фоновом потоке)
+    """
+    persistence_worker.write_json_atomic(TOURNAMENTS_DATA_FILE, tournaments_data)
 
 def save_tournaments_data():
     """
-    Сохраняет данные турниров в JSON файл
+    Сохраняет данные турниров в JSON файл или базу данных
     """
     # Сохраняем tournaments_list, если он существует
     if 'tournaments_list' in st.session_state:
         # Преобразуем datetime объекты для корректной сериализации
-        tournaments_list = []
-        for tournament in st.session_state.tournaments_list:
-            tournament_copy = tournament.copy()
-            for key, value in tournament_copy.items():
-                if isinstance(value, datetime):
-                    tournament_copy[key] = value.isoformat()
-            tournaments_list.append(tournament_copy)
+        tournaments_list = [_serialize_datetimes(tournament) for tournament in st.session_state.tournaments_list]
         
-        # Сохраняем в файл
-        with open(TOURNAMENTS_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(tournaments_list, f, ensure_ascii=False, indent=4)
+        if use_sqlite():
+            persistence_worker.submit_replace(
+                f"{sqlite_storage.DATABASE_FILE}:tournaments",
+                _invalidating('tournaments', sqlite_storage.save_tournaments),
+                tournaments_list
+            )
+        else:
+            # Сохраняем в файл
+            persistence_worker.submit_replace(TOURNAMENTS_DATA_FILE, _invalidating('tournaments', _write_tournaments_file), tournaments_list)
+        
+        _dirty_flags()['tournaments'] = False
         
         return True
     
     # Сохраняем tournaments, если он существует (для обратной совместимости)
     elif 'tournaments' in st.session_state:
         # Преобразуем datetime объекты для корректной сериализации
-        tournaments_data = {}
-        for tournament_id, tournament in st.session_state.tournaments.items():
-            tournament_copy = tournament.copy()
-            for key, value in tournament_copy.items():
-                if isinstance(value, datetime):
-                    tournament_copy[key] = value.isoformat()
-            tournaments_data[tournament_id] = tournament_copy
+        tournaments_data = {
+            tournament_id: _serialize_datetimes(tournament)
+            for tournament_id, tournament in st.session_state.tournaments.items()
+        }
         
         # Сохраняем в файл
-        with open(TOURNAMENTS_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(tournaments_data, f, ensure_ascii=False, indent=4)
+        persistence_worker.submit_replace(TOURNAMENTS_DATA_FILE, _invalidating('tournaments', _write_tournaments_file), tournaments_data)
+        
+        _dirty_flags()['tournaments'] = False
         
         return True
         
@@ -154,61 +1135,238 @@ def save_tournaments_data():
 
 def load_tournaments_data():
     """
-    Загружает данные турниров из JSON файла
+    Загружает данные турниров из JSON файла или базы данных
+    
+    Разобранные данные берутся из кэша процесса, сессия получает свою копию.
+    Данные в формате списка помещаются в st.session_state.tournaments_list.
     
     Returns:
         Словарь с данными турниров или пустой словарь если файл не найден
     """
-    if os.path.exists(TOURNAMENTS_DATA_FILE):
+    # Турниры изменяются на месте (статус, текущая игра), поэтому копируем глубоко
+    data = copy.deepcopy(_cached_load('tournaments', _read_tournaments_data))
+    
+    if isinstance(data, list):
+        # Формат списка - новая версия (tournaments_list)
+        st.session_state.tournaments_list = data
+        return {}  # Возвращаем пустой словарь для обратной совместимости
+    
+    return data or {}
+
+def _read_tournaments_data():
+    """
+    Читает и разбирает данные турниров с диска
+    
+    Returns:
+        Список турниров (новый формат), словарь турниров (старый формат) или None
+    """
+    data = None
+    if use_sqlite():
         try:
-            with open(TOURNAMENTS_DATA_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = sqlite_storage.load_tournaments()
+            if not sqlite_storage.get_meta('imported_tournaments'):
+                # Первый запуск с SQLite - один раз переносим турниры из JSON файла
+                if not data and os.path.exists(TOURNAMENTS_DATA_FILE):
+                    with open(TOURNAMENTS_DATA_FILE, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if isinstance(data, list):
+                        sqlite_storage.save_tournaments(data)
+                sqlite_storage.set_meta('imported_tournaments', 1)
+            if not data:
+                data = None
+        except Exception as e:
+            st.error(f"Ошибка при загрузке данных турниров: {e}")
+            return None
+    
+    if data or (not use_sqlite() and os.path.exists(TOURNAMENTS_DATA_FILE)):
+        try:
+            if data is None:
+                with open(TOURNAMENTS_DATA_FILE, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
             
-            # Проверяем формат данных (список или словарь)
+            # Проверяем формат данных (список или словарь) и приводим даты к datetime по схеме
             if isinstance(data, list):
                 # Формат списка - новая версия (tournaments_list)
-                tournaments_list = data
-                
-                # Преобразуем строки в datetime объекты
-                for tournament in tournaments_list:
-                    for key, value in tournament.items():
-                        if isinstance(value, str) and ('date' in key.lower() or 'time' in key.lower() or key == 'start_time' or key == 'end_time'):
-                            try:
-                                tournament[key] = datetime.fromisoformat(value)
-                            except ValueError:
-                                pass
-                
-                # Инициализируем st.session_state.tournaments_list
-                st.session_state.tournaments_list = tournaments_list
-                return {}  # Возвращаем пустой словарь для обратной совместимости
-                
+                schemas.parse_records(data, schemas.TOURNAMENT_SCHEMA)
             else:
                 # Формат словаря - старая версия
-                tournaments_data = data
-                
-                # Преобразуем строки в datetime объекты
-                for tournament_id, tournament in tournaments_data.items():
-                    for key, value in tournament.items():
-                        if isinstance(value, str) and ('date' in key.lower() or 'time' in key.lower() or key == 'start_time' or key == 'end_time'):
-                            try:
-                                tournament[key] = datetime.fromisoformat(value)
-                            except ValueError:
-                                pass
-                
-                return tournaments_data
+                schemas.parse_records(list(data.values()), schemas.TOURNAMENT_SCHEMA)
+            
+            return data
                 
         except Exception as e:
             st.error(f"Ошибка при загрузке данных турниров: {e}")
-            return {}
+            return None
     else:
-        return {}
+        return None
+
+def _to_id(value):
+    """
+    Приводит ID к int (в старых файлах ID хранились как float: 7.0)
+    """
+    if value is None or isinstance(value, bool):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def _migrate_player(player):
+    player['id'] = _to_id(player.get('id'))
+    return player
+
+def _migrate_game(game):
+    for team in ('team_a_players', 'team_b_players'):
+        if team in game:
+            game[team] = [_to_id(player_id) for player_id in game[team]]
+    tournament = game.get('tournament')
+    if tournament and 'tournament_id' in tournament:
+        tournament['tournament_id'] = _to_id(tournament['tournament_id'])
+    return game
+
+def _legacy_tournament_to_entry(tournament_id, tournament):
+    """
+    Преобразует турнир из старого формата словаря в запись tournaments_list
+    
+    Поля старого формата сохраняются, недостающие поля списка заполняются по умолчанию.
+    """
+    participants = tournament.get('participants') or tournament.get('player_ids') or []
+    players_count = tournament.get('players_count', len(participants))
+    status = tournament.get('status', 'planned')
+    date = tournament.get('date') or tournament.get('created_at') or ''
+    
+    entry = dict(tournament)
+    entry.update({
+        'id': _to_id(tournament.get('id', tournament_id)),
+        'name': tournament.get('name') or f"Турнир {tournament_id}",
+        'date': date[:10] if isinstance(date, str) else date,
+        'duration_minutes': tournament.get('duration_minutes', 120),
+        'game_duration_minutes': tournament.get('game_duration_minutes', 15),
+        'players_count': players_count,
+        'players_limit': tournament.get('players_limit') or players_count,
+        # В старом формате новый турнир имел статус 'setup'
+        'status': 'planned' if status == 'setup' else status,
+        'current_game': tournament.get('current_game', 0),
+        'total_games': tournament.get('total_games', max(1, players_count // 4)),
+        'start_time': tournament.get('start_time'),
+        'pause_time': tournament.get('pause_time'),
+        'elapsed_pause_time': tournament.get('elapsed_pause_time', 0),
+        'participants': participants,
+    })
+    return entry
+
+def _migrate_tournaments(data):
+    """
+    Приводит турниры к формату списка с целыми ID участников
+    """
+    if isinstance(data, dict):
+        data = [_legacy_tournament_to_entry(tournament_id, tournament) for tournament_id, tournament in data.items()]
+    for tournament in data:
+        tournament['id'] = _to_id(tournament.get('id'))
+        tournament['participants'] = [_to_id(player_id) for player_id in tournament.get('participants', [])]
+    return data
+
+def _read_schema_version():
+    if not os.path.exists(STORAGE_META_FILE):
+        return 0
+    try:
+        with open(STORAGE_META_FILE, 'r', encoding='utf-8') as f:
+            return int(json.load(f).get('schema_version', 0))
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+def _migrate_json_files(version):
+    """
+    Переписывает JSON файлы из версии формата version в SCHEMA_VERSION
+    """
+    if version < 1:
+        if os.path.exists(PLAYERS_DATA_FILE):
+            with open(PLAYERS_DATA_FILE, 'r', encoding='utf-8') as f:
+                players_data = json.load(f)
+            persistence_worker.write_json_atomic(PLAYERS_DATA_FILE, [_migrate_player(p) for p in players_data])
+        
+        # Старый файл истории переносится в журнал заодно с миграцией;
+        # записи читаются потоково и сразу пишутся в новый журнал
+        if os.path.exists(GAME_HISTORY_JOURNAL_FILE):
+            game_history = iter_game_journal()
+        elif os.path.exists(GAME_HISTORY_FILE):
+            game_history = json_stream.iter_json_array(GAME_HISTORY_FILE)
+        else:
+            game_history = None
+        if game_history is not None:
+            rewrite_game_journal(_migrate_game(g) for g in game_history)
+        
+        if os.path.exists(TOURNAMENTS_DATA_FILE):
+            with open(TOURNAMENTS_DATA_FILE, 'r', encoding='utf-8') as f:
+                tournaments_data = json.load(f)
+            persistence_worker.write_json_atomic(TOURNAMENTS_DATA_FILE, _migrate_tournaments(tournaments_data))
+    
+    if version < 2 and os.path.exists(GAME_HISTORY_JOURNAL_FILE):
+        # Разбиваем единый журнал на журналы по турнирам
+        rewrite_sharded_records(iter_game_journal())
+        os.remove(GAME_HISTORY_JOURNAL_FILE)
+    
+    # Версия 3 добавляет необязательные поля игроков, версия 4 меняет только базу данных -
+    # JSON файлы не переписываются
+    persistence_worker.write_json_atomic(STORAGE_META_FILE, {'schema_version': SCHEMA_VERSION})
+
+def _migrate_database(version):
+    """
+    Переписывает данные в базе данных из версии формата version в SCHEMA_VERSION
+    """
+    if version < 3:
+        # Колонки нужны до того, как игроки будут переписаны миграцией версии 1
+        sqlite_storage.add_player_columns()
+    if version < 1:
+        sqlite_storage.save_players([_migrate_player(p) for p in sqlite_storage.load_players()])
+        sqlite_storage.replace_games([_migrate_game(g) for g in sqlite_storage.load_games()])
+        sqlite_storage.save_tournaments(_migrate_tournaments(sqlite_storage.load_tournaments()))
+    # Версия 2 меняет только формат JSON журналов
+    if version < 4:
+        sqlite_storage.normalize_game_timestamps()
+    sqlite_storage.set_meta('schema_version', SCHEMA_VERSION)
+
+_migration_lock = threading.Lock()
+_migration_done = False
+
+def migrate_storage():
+    """
+    Однократно приводит сохраненные данные к текущей версии формата (SCHEMA_VERSION)
+    
+    ID игроков и турниров становятся целыми числами, турниры в старом формате
+    словаря переводятся в формат списка. После миграции загрузка и остальной код
+    могут рассчитывать на единственное представление данных.
+    """
+    global _migration_done
+    with _migration_lock:
+        if _migration_done:
+            return
+        try:
+            # Незаписанные изменения должны попасть на диск до того, как файлы будут переписаны
+            # (только если миграция действительно нужна)
+            version = _read_schema_version()
+            if version < SCHEMA_VERSION:
+                persistence_worker.flush()
+                _migrate_json_files(version)
+            if use_sqlite():
+                version = int(sqlite_storage.get_meta('schema_version', 0))
+                if version < SCHEMA_VERSION:
+                    persistence_worker.flush()
+                    _migrate_database(version)
+            invalidate_load_cache()
+            _migration_done = True
+        except Exception as e:
+            st.error(f"Ошибка при миграции данных: {e}")
 
 def initialize_storage():
     """
     Инициализирует хранилище данных при запуске приложения
     """
+    migrate_storage()
+    
     # Инициализируем данные игроков
-    if 'players_df' not in st.session_state:
+    players_loaded = 'players_df' not in st.session_state
+    if players_loaded:
         st.session_state.players_df = load_players_data()
         
         # Проверяем, есть ли колонка points_difference
@@ -219,10 +1377,8 @@ def initialize_storage():
             else:
                 # Иначе инициализируем нулями
                 st.session_state.players_df['points_difference'] = 0
-    
-    # Инициализируем историю игр
-    if 'game_history' not in st.session_state:
-        st.session_state.game_history = load_game_history()
+            
+            mark_dirty('players')
     
     # Инициализируем данные турниров
     if 'tournaments' not in st.session_state:
@@ -232,12 +1388,243 @@ def initialize_storage():
     if 'tournaments_list' not in st.session_state:
         # Если не загрузились, создаем пустой список
         st.session_state.tournaments_list = []
+    
+    # Инициализируем историю игр
+    if 'game_history' not in st.session_state:
+        # Сразу загружаем только игры вне турнира и незавершенных турниров;
+        # завершенные турниры подгружаются по запросу (get_tournament_games, query_game_history)
+        completed = {t['id'] for t in st.session_state.tournaments_list if t.get('status') == 'completed'}
+        shards = list_history_shards()
+        st.session_state.history_unloaded_shards = {shard for shard in shards if shard in completed}
+        st.session_state.game_history = load_game_history(
+            [shard for shard in shards if shard not in st.session_state.history_unloaded_shards]
+        )
+        # Все загруженные игры уже находятся в журнале и архиве
+        st.session_state.game_history_persisted = len(st.session_state.game_history)
+        st.session_state.history_archive_synced = len(st.session_state.game_history)
+        st.session_state.history_journal_synced = len(st.session_state.game_history)
+        
+        # Архив строится по всей истории, поэтому читаем ее целиком только если архива еще нет
+        # (бинарная копия сверяется с журналом ниже)
+        missing_archive = not history_archive.archive_exists()
+        if missing_archive:
+            # Читаем потоково, чтобы завершенные турниры не оседали в кэше процесса
+            all_games = [_serialize_game_record(g) for g in _sorted_games(iter_game_history(shards))]
+            if all_games:
+                # Колоночный архив для аналитики
+                persistence_worker.submit_replace(history_archive.ARCHIVE_DIR, history_archive.rebuild_archive, all_games)
+        
+        if not missing_archive and history_archive.fragment_count() > ARCHIVE_COMPACT_THRESHOLD:
+            # Отдельный ключ, чтобы уплотнение не отменило ожидающие дозаписи архива
+            persistence_worker.submit_replace(
+                f"{history_archive.ARCHIVE_DIR}:compact",
+                lambda _: history_archive.compact_archive(),
+                None
+            )
+    
+    if players_loaded:
+        # Снимок игроков + дозапись: доигрываем игры журнала, сделанные после снимка
+        # (например, если процесс завершился до записи файла игроков).
+        # Ожидающие фоновые записи не ждем: игры, которые допишутся позже,
+        # сессия доиграет при сохранении (_catch_up_game_log).
+        # Смещение снимка сверяется с журналом, а не с бинарной копией, которая из него строится
+        game_count, rebuilt, checked = _sync_game_store()
+        game_offset = st.session_state.players_df.attrs.get('game_offset')
+        from player_management import calculate_ratings
+        if game_offset is not None and game_offset > game_count and not checked:
+            # Снимок опережает еще не дописанный файл - остальное доиграется при сохранении
+            game_count = game_offset
+        elif game_offset is not None and (rebuilt or game_offset > game_count):
+            # Позиции снимка не соответствуют журналу - пересчитываем агрегаты и рейтинги по всей истории
+            _recount_game_totals(st.session_state.players_df)
+            calculate_ratings()
+            mark_dirty('players')
+        elif game_offset is not None and game_offset < game_count:
+            changed_ids, games = _replay_game_tail(st.session_state.players_df, game_offset, game_count,
+                                                   st.session_state.players_df.attrs.get('applied_games'))
+            if changed_ids:
+                calculate_ratings(player_ids=changed_ids, games=games)
+            # Следующее автосохранение запишет уплотненный снимок с новым смещением
+            mark_dirty('players')
+        
+        # Движок, которым посчитан снимок, остается выбранным в новой сессии
+        # (снимки старого формата посчитаны классическим рейтингом);
+        # если выбран другой движок - пересчитываем всех и сообщаем об этом в интерфейсе
+        players_df = st.session_state.players_df
+        snapshot_engine = players_df.attrs.get('rating_engine') or 'classic'
+        if 'rating_engine' not in st.session_state and snapshot_engine in rating_engines.ENGINES:
+            st.session_state.rating_engine = snapshot_engine
+        if len(players_df) > 0 and snapshot_engine != rating_engines.selected_engine():
+            calculate_ratings()
+            mark_dirty('players')
+            st.session_state.rating_engine_changed = (snapshot_engine, rating_engines.selected_engine())
+        
+        # Агрегаты players_df учитывают весь журнал; дальше сессия отмечает позиции своих игр
+        # ('own' - позиции записанных игр сессии, 'submitted' - сколько ее игр отправлено на запись,
+        # 'applied' - учтенные в снимке позиции, которые еще не дописаны в файл)
+        applied = {p for p in st.session_state.players_df.attrs.get('applied_games') or [] if p >= game_count}
+        st.session_state.game_log = {'offset': game_count, 'own': [], 'submitted': 0, 'applied': applied}
+
+def query_game_history(player_id=None, tournament_id=None, start=None, end=None):
+    """
+    Возвращает игры, отфильтрованные по игроку, турниру и интервалу времени
+    
+    Для SQLite бэкенда выборка выполняется запросом по индексам,
+    для JSON - фильтрацией истории по мере потокового чтения завершенных турниров.
+    
+    Parameters:
+    - player_id: ID игрока (None - любой)
+    - tournament_id: ID турнира (None - любой)
+    - start: Начало интервала (datetime, включительно)
+    - end: Конец интервала (datetime, включительно)
+    
+    Returns:
+    - Список записей об играх
+    """
+    if use_sqlite():
+        # Игры сессии, которые еще не записаны в базу данных, добавляются из памяти
+        unsynced = _filter_games(_journal_unsynced_games(), player_id, tournament_id, start, end)
+        games = _parse_game_records(sqlite_storage.query_games(player_id, tournament_id, start, end))
+        return _sorted_games(_with_unsynced(games, unsynced)) if unsynced else games
+    
+    unloaded = st.session_state.get('history_unloaded_shards', set())
+    if tournament_id is not None:
+        source = get_tournament_games(tournament_id)
+    elif unloaded:
+        # Не загруженные турниры читаются потоково: в памяти остаются только подходящие игры
+        source = itertools.chain(
+            (g for g in st.session_state.get('game_history', []) if _shard_of(g) not in unloaded),
+            iter_game_history(sorted(unloaded))
+        )
+    else:
+        source = st.session_state.get('game_history', [])
+    
+    games = _filter_games(source, player_id, tournament_id, start, end)
+    if tournament_id is None and unloaded:
+        # Игры сессии для не загруженных турниров, которые еще не записаны в их журналы
+        unsynced = [g for g in _journal_unsynced_games() if _shard_of(g) in unloaded]
+        games = _sorted_games(_with_unsynced(games, _filter_games(unsynced, player_id, tournament_id, start, end)))
+    return games
+
+def _filter_games(source, player_id=None, tournament_id=None, start=None, end=None):
+    """
+    Отбирает игры по игроку, турниру и интервалу времени (фильтры как у query_game_history)
+    """
+    games = []
+    for game in source:
+        if player_id is not None and player_id not in game.get('team_a_players', []) and player_id not in game.get('team_b_players', []):
+            continue
+        if tournament_id is not None and (game.get('tournament') or {}).get('tournament_id') != tournament_id:
+            continue
+        timestamp = game.get('timestamp')
+        if isinstance(timestamp, str):
+            try:
+                timestamp = datetime.fromisoformat(timestamp)
+            except ValueError:
+                timestamp = None
+        if start is not None and (timestamp is None or timestamp < start):
+            continue
+        if end is not None and (timestamp is None or timestamp > end):
+            continue
+        games.append(game)
+    return games
+
+def load_history_frame(player_id=None, tournament_id=None, start=None, end=None, columns=None):
+    """
+    Возвращает игры в виде DataFrame из колоночного архива
+    
+    Фильтры применяются при чтении Parquet: ненужные разделы и группы строк не читаются.
+    Прочитанная выборка кэшируется, пока не изменился набор файлов архива, а игры сессии,
+    которые еще не попали в архив, добавляются из памяти - без ожидания фоновой записи.
+    
+    Parameters:
+    - player_id: ID игрока (None - любой)
+    - tournament_id: ID турнира (None - любой)
+    - start: Начало интервала (datetime, включительно)
+    - end: Конец интервала (datetime, включительно)
+    - columns: Список нужных колонок (None - все)
+    
+    Returns:
+    - DataFrame с играми в формате history_archive.read_games
+    """
+    unsynced = _unsynced_games(history_archive.ARCHIVE_DIR, 'history_archive_synced')
+    
+    if unsynced is None or not history_archive.archive_exists():
+        # Архив еще не создан (например, история пуста) или пересобирается - строим таблицу из памяти
+        games = query_game_history(player_id, tournament_id, start, end)
+        df = history_archive.games_to_table([_serialize_game_record(g) for g in games]).to_pandas()
+        return df[columns] if columns is not None else df
+    
+    unsaved_games = _filter_games(unsynced, player_id, tournament_id, start, end)
+    if not unsaved_games:
+        return _read_archive(player_id, tournament_id, start, end, columns)
+    
+    # Для сравнения с записанными играми нужны ключевые колонки, даже если они не запрошены
+    read_columns = None if columns is None else list(dict.fromkeys([*columns, *history_archive.GAME_KEY_COLUMNS]))
+    unsaved = history_archive.games_to_table([_serialize_game_record(g) for g in unsaved_games]).to_pandas()
+    df = _merge_unsaved(
+        _read_archive(player_id, tournament_id, start, end, read_columns),
+        unsaved[read_columns] if read_columns is not None else unsaved,
+        history_archive.GAME_KEY_COLUMNS
+    )
+    return df[columns] if columns is not None else df
+
+def _read_archive(player_id, tournament_id, start, end, columns):
+    """
+    Возвращает копию выборки из архива; выборка читается заново, только если изменились файлы архива
+    """
+    columns = None if columns is None else list(columns)
+    df = _cached_load(
+        f"archive:{(player_id, tournament_id, start, end, columns)!r}",
+        lambda: history_archive.read_games(player_id, tournament_id, start, end, columns)
+    )
+    return df.copy()
+
+def load_game_array():
+    """
+    Возвращает всю историю игр как структурированный массив NumPy, отображенный в память
+    
+    Игры сессии, которые еще не записаны в бинарный файл, добавляются из памяти:
+    по позициям, отмеченным фоновой записью, точно известно, какие из них уже в файле.
+    
+    Returns:
+    - numpy массив с dtype game_store.GAME_DTYPE (только для чтения)
+    """
+    game_history = st.session_state.get('game_history', [])
+    persisted = st.session_state.get('game_history_persisted', 0)
+    log_state = st.session_state.get('game_log')
+    with _game_log_lock:
+        games = game_store.open_games()
+        waiting = None if log_state is None else log_state['submitted'] - len(log_state['own'])
+    
+    if waiting is None or waiting < 0 or persisted > len(game_history):
+        # Журнал переписывается целиком (или сессия не отслеживает свои позиции) - дожидаемся записи
+        save_game_history()
+        persistence_worker.flush()
+        return game_store.open_games()
+    
+    unsaved = game_history[persisted - waiting:]
+    if not unsaved:
+        return games
+    return np.concatenate([games, game_store.records_to_array([_serialize_game_record(g) for g in unsaved])])
 
 def auto_save_data():
     """
-    Автоматически сохраняет все данные
+    Автоматически сохраняет изменившиеся данные
     Может быть вызвана периодически или при изменении данных
+    
+    Если с момента последнего сохранения ничего не изменилось, запись на диск не выполняется.
     """
-    save_players_data()
-    save_game_history()
-    save_tournaments_data()
\ No newline at end of file
+    # Игры отправляем на запись раньше снимка игроков: смещение снимка опирается на их позиции в журнале
+    if is_dirty('history'):
+        save_game_history()
+    
+    players_flag = _dirty_flags()['players']
+    if players_flag:
+        save_players_data(player_ids=players_flag if isinstance(players_flag, set) else None)
+    
+    if is_dirty('ratings'):
+        save_rating_history()
+    
+    if is_dirty('tournaments'):
+        save_tournaments_data()
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Генератор синтетических игроков и сезонов для нагрузочного тестирования
+
+Все значения генерируются векторными операциями numpy, поэтому состав из 100 тысяч
+игроков и сезон из миллионов игр создаются за секунды. Игры возвращаются массивом
+game_store.GAME_DTYPE; записи в формате st.session_state.game_history из него
+получаются через game_store.array_to_records.
+"""
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+import game_store
+import schemas
+import storage
+
+FIRST_NAMES = np.array(["Alex", "David", "Elena", "Sophia", "Michael", "Julia", "Ivan", "Anna", "Pavel",
+                        "Natalia", "Victor", "Marina", "Sergey", "Olga", "Andrey", "Tatiana", "Nikolay", "Irina"])
+LAST_NAMES = np.array(["Smith", "Johnson", "Williams", "Jones", "Brown", "Davis", "Miller", "Wilson",
+                       "Moore", "Taylor", "Anderson", "Thomas", "Jackson", "White", "Harris", "Martin"])
+
+# Разброс активности игроков: логнормальный вес (немногие играют много, большинство - редко)
+ACTIVITY_SIGMA = 0.75
+
+# Насколько разница суммарного навыка команд влияет на вероятность победы
+SKILL_WEIGHT = 1.5
+
+# Вероятность затяжной игры (10-10 и дальше до разницы в 2 очка) для равных и неравных команд
+DEUCE_PROBABILITY = (0.25, 0.05)
+
+# Игр в одном турнире и количество кортов
+GAMES_PER_TOURNAMENT = 1_000
+COURT_COUNT = 8
+
+def generate_roster(count, seed=None, start_id=1):
+    """
+    Создает синтетический состав игроков с нулевой статистикой
+
+    Parameters:
+    - count: Количество игроков
+    - seed: Начальное значение генератора случайных чисел
+    - start_id: ID первого игрока
+
+    Returns:
+    - (DataFrame в формате st.session_state.players_df, массив скрытого навыка игроков)
+    """
+    rng = np.random.default_rng(seed)
+    ids = np.arange(start_id, start_id + count)
+    first = pd.Series(rng.choice(FIRST_NAMES, count))
+    last = pd.Series(rng.choice(LAST_NAMES, count))
+    id_text = pd.Series(ids).astype(str)
+
+    players_df = pd.DataFrame({
+        'id': ids,
+        'name': first + ' ' + last,
+        # ID в адресе делает email уникальным, как у настоящих игроков
+        'email': (first + '.' + last + id_text).str.lower() + '@example.com',
+        'phone': '+7' + pd.Series(rng.integers(9_000_000_000, 10_000_000_000, count)).astype(str),
+        'wins': 0,
+        'losses': 0,
+        'points_won': 0,
+        'points_lost': 0,
+        'points_difference': 0,
+        'rating': 0.0,
+        'created_at': datetime.now().replace(microsecond=0),
+        'last_played': pd.NaT,
+    })
+    skill = rng.normal(0.0, 1.0, count)
+    return schemas.convert_frame(players_df, schemas.PLAYER_SCHEMA), skill
+
+def _pick_players(rng, player_count, game_count, weights):
+    """
+    Выбирает по 4 разных игрока на игру с учетом активности
+    """
+    slots = rng.choice(player_count, size=(game_count, 4), p=weights)
+    while True:
+        ordered = np.sort(slots, axis=1)
+        repeated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        if not repeated.any():
+            return slots
+        slots[repeated] = rng.choice(player_count, size=(int(repeated.sum()), 4), p=weights)
+
+def _scores(rng, team_a_wins, closeness):
+    """
+    Генерирует счет по правилам pickleball: до 11 очков, при 10-10 - до разницы в 2 очка
+
+    Parameters:
+    - team_a_wins: Булев массив исходов
+    - closeness: Близость команд по силе от 0 (разгром) до 1 (равные)
+
+    Returns:
+    - (очки команды A, очки команды B)
+    """
+    count = len(team_a_wins)
+    # Проигравший набирает больше очков, когда команды близки по силе
+    loser = rng.binomial(9, 0.3 + 0.5 * closeness)
+    winner = np.full(count, 11)
+
+    equal_deuce, uneven_deuce = DEUCE_PROBABILITY
+    deuce = rng.random(count) < uneven_deuce + (equal_deuce - uneven_deuce) * closeness
+    extra = rng.geometric(0.5, count) - 1
+    loser = np.where(deuce, 10 + extra, loser)
+    winner = np.where(deuce, 12 + extra, winner)
+
+    return np.where(team_a_wins, winner, loser), np.where(team_a_wins, loser, winner)
+
+def generate_season(player_ids, skill, game_count, seed=None, start=None,
+                    games_per_day=200, tournament_share=0.0):
+    """
+    Создает синтетический сезон парных игр
+
+    Игроки выбираются с учетом активности, исход зависит от суммарного навыка команд,
+    счет - от их близости по силе.
+
+    Parameters:
+    - player_ids: ID игроков (не меньше 4)
+    - skill: Скрытый навык игроков (в том же порядке)
+    - game_count: Количество игр
+    - seed: Начальное значение генератора случайных чисел
+    - start: Время первой игры (None - сезон заканчивается сейчас)
+    - games_per_day: Сколько игр в среднем играется за день
+    - tournament_share: Доля игр, сыгранных в турнирах
+
+    Returns:
+    - numpy массив с dtype game_store.GAME_DTYPE, упорядоченный по времени
+
+    Raises:
+    - ValueError: Игроков меньше 4
+    """
+    if len(player_ids) < 4:
+        raise ValueError("Для парной игры нужно минимум 4 игрока")
+
+    rng = np.random.default_rng(seed)
+    player_ids = np.asarray(player_ids)
+    skill = np.asarray(skill, dtype=float)
+
+    weights = rng.lognormal(0.0, ACTIVITY_SIGMA, len(player_ids))
+    slots = _pick_players(rng, len(player_ids), game_count, weights / weights.sum())
+
+    # Вероятность победы команды A - логистическая функция от разницы навыков
+    difference = skill[slots[:, 0]] + skill[slots[:, 1]] - skill[slots[:, 2]] - skill[slots[:, 3]]
+    probability = 1 / (1 + np.exp(-SKILL_WEIGHT * difference))
+    team_a_wins = rng.random(game_count) < probability
+    team_a_score, team_b_score = _scores(rng, team_a_wins, 1 - 2 * np.abs(probability - 0.5))
+
+    # Игры равномерно распределены по дням сезона
+    duration = max(1, int(game_count / games_per_day * 86_400))
+    if start is None:
+        start = datetime.now() - pd.Timedelta(seconds=duration)
+    start_seconds = pd.Timestamp(start).value // 10**9
+    timestamps = np.sort(start_seconds + rng.integers(0, duration, game_count))
+
+    games = np.zeros(game_count, dtype=game_store.GAME_DTYPE)
+    games['timestamp'] = timestamps
+    games['team_a'] = player_ids[slots[:, :2]]
+    games['team_b'] = player_ids[slots[:, 2:]]
+    games['team_a_score'] = team_a_score
+    games['team_b_score'] = team_b_score
+    games['court_number'] = rng.integers(1, COURT_COUNT + 1, game_count)
+
+    in_tournament = rng.random(game_count) < tournament_share
+    order = np.arange(game_count)
+    games['tournament_id'] = np.where(in_tournament, order // GAMES_PER_TOURNAMENT + 1, game_store.CASUAL_TOURNAMENT_ID)
+    games['game_number'] = np.where(in_tournament, order % GAMES_PER_TOURNAMENT + 1, 0)
+    return games
+
+def apply_season(players_df, games):
+    """
+    Переносит итоги сезона в статистику игроков (победы, очки, дата последней игры)
+
+    Parameters:
+    - players_df: DataFrame игроков (изменяется на месте)
+    - games: Массив игр с dtype game_store.GAME_DTYPE
+
+    Returns:
+    - Список ID игроков, статистика которых изменилась
+    """
+    changed_ids = storage.apply_game_totals(players_df, games)
+
+    player_ids = np.concatenate([games['team_a'][:, 0], games['team_a'][:, 1],
+                                 games['team_b'][:, 0], games['team_b'][:, 1]])
+    latest = pd.Series(np.tile(games['timestamp'], 4)).groupby(player_ids).max()
+    last_played = players_df['id'].astype('int64').map(pd.to_datetime(latest, unit='s'))
+    players_df['last_played'] = last_played.where(last_played.notna(), players_df['last_played'])
+    return changed_ids
+
+def generate_league(player_count, games_per_player=20, seed=None, start_id=1, tournament_share=0.0):
+    """
+    Создает состав игроков вместе с сыгранным сезоном
+
+    Parameters:
+    - player_count: Количество игроков (при меньше чем 4 сезон не генерируется)
+    - games_per_player: Среднее количество игр на игрока
+    - seed: Начальное значение генератора случайных чисел
+    - start_id: ID первого игрока
+    - tournament_share: Доля игр, сыгранных в турнирах
+
+    Returns:
+    - (DataFrame игроков со статистикой сезона, массив игр сезона)
+    """
+    rng = np.random.default_rng(seed)
+    players_df, skill = generate_roster(player_count, seed=rng, start_id=start_id)
+    if player_count < 4:
+        return players_df, np.zeros(0, dtype=game_store.GAME_DTYPE)
+
+    # В каждой игре 4 игрока
+    game_count = player_count * games_per_player // 4
+    games = generate_season(players_df['id'].to_numpy(), skill, game_count, seed=rng,
+                            tournament_share=tournament_share)
+    apply_season(players_df, games)
+    return players_df, games
@@ -0,0 +1,33 @@
+import storage
+
+
+def _game(court_number):
+    return {
+        'timestamp': '2025-03-30 19:15:00',
+        'court_number': court_number,
+        'team_a_players': [1, 2],
+        'team_b_players': [3, 4],
+        'team_a_score': 11,
+        'team_b_score': 7,
+    }
+
+
+def test_append_after_torn_line_keeps_new_record(tmp_path):
+    path = str(tmp_path / 'casual.jsonl')
+    storage.append_game_records([_game(1)], path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"timestamp":"2025-03-30 19:2')
+
+    storage.append_game_records([_game(2)], path)
+
+    assert [game['court_number'] for game in storage.iter_game_journal(path)] == [1, 2]
+
+
+def test_append_after_torn_only_line(tmp_path):
+    path = str(tmp_path / 'casual.jsonl')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"timestamp":')
+
+    storage.append_game_records([_game(3)], path)
+
+    assert [game['court_number'] for game in storage.iter_game_journal(path)] == [3]
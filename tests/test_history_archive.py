@@ -0,0 +1,23 @@
+import history_archive
+
+
+def _game(minute):
+    return {
+        'timestamp': f'2025-03-30 19:{minute:02d}:00',
+        'court_number': 1,
+        'team_a_players': [1, 2],
+        'team_b_players': [3, 4],
+        'team_a_score': 11,
+        'team_b_score': 7,
+    }
+
+
+def test_appends_compact_a_crowded_partition(tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    saves = history_archive.PARTITION_COMPACT_THRESHOLD + 5
+
+    for minute in range(saves):
+        history_archive.append_to_archive([_game(minute)], archive_dir)
+
+    assert history_archive.fragment_count(archive_dir) <= history_archive.PARTITION_COMPACT_THRESHOLD
+    assert len(history_archive.read_games(archive_dir=archive_dir)) == saves
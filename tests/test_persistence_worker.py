@@ -0,0 +1,38 @@
+import persistence_worker
+
+
+def test_writes_follow_submit_order(monkeypatch):
+    monkeypatch.setattr(persistence_worker, 'ASYNC_WRITES', True)
+    monkeypatch.setattr(persistence_worker, 'WRITE_DEBOUNCE_SECONDS', 60)
+    written = []
+
+    persistence_worker.submit_replace('players', lambda snapshot: written.append(('players', snapshot)), 1)
+    persistence_worker.submit_append('games', lambda records: written.append(('games', records)), ['g1'])
+    # Новый снимок зависит от игры, поставленной в очередь раньше него
+    persistence_worker.submit_replace('players', lambda snapshot: written.append(('players', snapshot)), 2)
+    persistence_worker.flush()
+
+    assert written == [('games', ['g1']), ('players', 2)]
+
+
+def test_failed_write_stays_queued_until_it_succeeds(monkeypatch):
+    monkeypatch.setattr(persistence_worker, 'ASYNC_WRITES', True)
+    monkeypatch.setattr(persistence_worker, 'WRITE_DEBOUNCE_SECONDS', 60)
+    written = []
+    failures = [OSError('disk full')]
+
+    def writer(records):
+        if failures:
+            raise failures.pop()
+        written.extend(records)
+
+    persistence_worker.submit_append('games', writer, ['g1'])
+    assert persistence_worker.flush() is False
+    assert persistence_worker.is_pending('games')
+    assert 'games' in persistence_worker.write_errors()
+
+    persistence_worker.submit_append('games', writer, ['g2'])
+    assert persistence_worker.flush() is True
+    assert written == ['g1', 'g2']
+    assert not persistence_worker.is_pending('games')
+    assert persistence_worker.write_errors() == {}
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import sqlite_storage
+
+
+def _game(timestamp):
+    return {
+        'timestamp': timestamp,
+        'court_number': 1,
+        'team_a_players': [1, 2],
+        'team_b_players': [3, 4],
+        'team_a_score': 11,
+        'team_b_score': 7,
+        'tournament': {},
+    }
+
+
+def test_query_games_includes_games_on_start_and_end_dates(tmp_path):
+    path = str(tmp_path / 'rotation_data.db')
+    sqlite_storage.append_games([_game('2025-03-30 19:15:00'), _game(datetime(2025, 3, 31, 20, 0))], path=path)
+
+    assert len(sqlite_storage.query_games(start=datetime(2025, 3, 30), path=path)) == 2
+    assert len(sqlite_storage.query_games(start='2025-03-30T00:00:00', path=path)) == 2
+    assert len(sqlite_storage.query_games(start=datetime(2025, 3, 31), path=path)) == 1
+    assert len(sqlite_storage.query_games(end=datetime(2025, 3, 30, 19, 15), path=path)) == 1
+    assert len(sqlite_storage.query_games(end='2025-03-30T23:59:59', path=path)) == 1
+
+
+def test_query_games_matches_iso_t_timestamps(tmp_path):
+    path = str(tmp_path / 'rotation_data.db')
+    sqlite_storage.replace_games([_game('2025-03-30T01:40:33'), _game('2025-03-30T19:15:00')], path=path)
+
+    day = sqlite_storage.query_games(start=datetime(2025, 3, 30), end=datetime(2025, 3, 30, 23, 59), path=path)
+    assert len(day) == 2
+    assert len(sqlite_storage.query_games(start=datetime(2025, 3, 30, 20, 0), path=path)) == 0
+    assert len(sqlite_storage.query_games(end=datetime(2025, 3, 30, 23, 59), path=path)) == 2
+
+
+def test_normalize_game_timestamps_rewrites_iso_t_rows(tmp_path):
+    path = str(tmp_path / 'rotation_data.db')
+    sqlite_storage.append_games([_game('2025-03-30 01:40:33')], path=path)
+    conn = sqlite_storage._connect(path)
+    with conn:
+        conn.execute("UPDATE games SET timestamp = '2025-03-30T01:40:33'")
+    conn.close()
+
+    sqlite_storage.normalize_game_timestamps(path=path)
+
+    assert len(sqlite_storage.query_games(end=datetime(2025, 3, 30, 23, 59), path=path)) == 1
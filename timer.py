@@ -1,6 +1,7 @@
 import streamlit as st
 import time
 from datetime import datetime, timedelta
+import storage
 
 def start_game():
     """
@@ -30,6 +31,7 @@ def start_game():
             # Увеличиваем счетчик текущей игры
             current_game = st.session_state.tournaments_list[tournament_idx].get('current_game', 0)
             st.session_state.tournaments_list[tournament_idx]['current_game'] = current_game + 1
+            storage.mark_dirty('tournaments')
     
     # Выводим логи для диагностики
     print(f"Игра запущена: {datetime.now()}")
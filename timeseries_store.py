@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Каталог истории рейтингов: по одному файлу на игрока
+RATING_HISTORY_DIR = 'rating_history'
+
+# Точка временного ряда - 16 байт: время (секунды от эпохи) и значение
+POINT_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('value', '<f8'),
+])
+
+def series_path(series_dir, key):
+    """
+    Возвращает путь к файлу временного ряда
+    """
+    return os.path.join(series_dir, f"{key}.bin")
+
+def _to_seconds(timestamps):
+    """
+    Приводит список времен (datetime или строки) к секундам от эпохи одним векторным вызовом
+    """
+    parsed = pd.to_datetime(pd.Series(timestamps, dtype=object), format='ISO8601', errors='coerce')
+    return parsed.fillna(pd.Timestamp(0)).astype('datetime64[s]').astype('int64').to_numpy()
+
+def append_points(series_dir, points):
+    """
+    Дописывает точки в файлы временных рядов
+
+    Parameters:
+    - series_dir: Каталог рядов
+    - points: Список (ключ ряда, время, значение) в порядке добавления
+    """
+    if not points:
+        return
+
+    by_key = {}
+    for key, timestamp, value in points:
+        by_key.setdefault(key, []).append((timestamp, value))
+
+    os.makedirs(series_dir, exist_ok=True)
+    for key, series_points in by_key.items():
+        array = np.zeros(len(series_points), dtype=POINT_DTYPE)
+        array['timestamp'] = _to_seconds([timestamp for timestamp, _ in series_points])
+        array['value'] = [value for _, value in series_points]
+
+        path = series_path(series_dir, key)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        with open(path, 'ab') as f:
+            if size % POINT_DTYPE.itemsize:
+                # Отбрасываем недописанную точку (например, после сбоя во время записи)
+                f.truncate(size - size % POINT_DTYPE.itemsize)
+            f.write(array.tobytes())
+
+def read_series(series_dir, key):
+    """
+    Читает временной ряд целиком
+
+    Parameters:
+    - series_dir: Каталог рядов
+    - key: Ключ ряда
+
+    Returns:
+    - DataFrame с колонками timestamp (datetime64) и value
+    """
+    path = series_path(series_dir, key)
+    if not os.path.exists(path):
+        return pd.DataFrame({'timestamp': pd.Series(dtype='datetime64[s]'), 'value': pd.Series(dtype='float64')})
+
+    count = os.path.getsize(path) // POINT_DTYPE.itemsize
+    array = np.fromfile(path, dtype=POINT_DTYPE, count=count)
+    return pd.DataFrame({
+        'timestamp': array['timestamp'].astype('datetime64[s]'),
+        'value': array['value'],
+    })
@@ -4,6 +4,8 @@ import numpy as np
 import math
 import time
 from datetime import datetime
+import player_registry
+import storage
 
 def create_tournament(players_df):
     """
@@ -385,10 +387,7 @@ def get_player_name(player_id):
     if player_id is None:
         return 'BYE'
     
-    player = st.session_state.players_df[st.session_state.players_df['id'] == player_id]
-    if not player.empty:
-        return player.iloc[0]['name']
-    return f"Игрок {player_id}"
+    return player_registry.player_name(player_id, default=f"Игрок {player_id}")
 
 def display_tournament_bracket():
     """
@@ -597,6 +596,9 @@ def display_tournaments_list():
         
         for t in sample_tournaments:
             st.session_state.tournaments_list.append(t)
+        
+        from storage import mark_dirty
+        mark_dirty('tournaments')
             
     # Добавляем возможность удаления турниров
     with st.expander("Управление турнирами (для тестирования)"):
@@ -638,8 +640,7 @@ def display_tournaments_list():
                         st.session_state.tournaments_list.pop(tournament_idx)
                         
                         # Сохраняем данные в файл
-                        from storage import save_tournaments_data
-                        save_tournaments_data()
+                        storage.save_tournaments_data()
                         
                         st.success("Турнир успешно удален!")
                         
@@ -759,8 +760,7 @@ def display_tournaments_list():
                     st.session_state.tournaments_list[tournament_idx]['players_count'] = row['players_count']
             
             # Сохраняем данные в файл после внесения изменений
-            from storage import save_tournaments_data
-            save_tournaments_data()
+            storage.save_tournaments_data()
     else:
         st.info("Нет доступных турниров")
     
@@ -806,8 +806,7 @@ def display_tournaments_list():
         st.session_state.tournaments_list.append(new_tournament)
         
         # Сохраняем данные в файл
-        from storage import save_tournaments_data
-        save_tournaments_data()
+        storage.save_tournaments_data()
         
         st.success("Турнир успешно создан!")
         st.rerun()
@@ -842,8 +841,7 @@ def start_tournament_timer(tournament_id):
         st.session_state.active_tournament_id = tournament_id
         
         # Сохраняем данные в файл
-        from storage import save_tournaments_data
-        save_tournaments_data()
+        storage.save_tournaments_data()
         
 def pause_tournament_timer(tournament_id):
     """
@@ -863,8 +861,7 @@ def pause_tournament_timer(tournament_id):
         st.session_state.tournaments_list[tournament_idx]['pause_time'] = datetime.now()
         
         # Сохраняем данные в файл
-        from storage import save_tournaments_data
-        save_tournaments_data()
+        storage.save_tournaments_data()
 
 def resume_tournament_timer(tournament_id):
     """
@@ -888,8 +885,7 @@ def resume_tournament_timer(tournament_id):
         st.session_state.tournaments_list[tournament_idx]['pause_time'] = None
         
         # Сохраняем данные в файл
-        from storage import save_tournaments_data
-        save_tournaments_data()
+        storage.save_tournaments_data()
 
 def calculate_tournament_time(tournament_id):
     """
@@ -951,140 +947,135 @@ def calculate_tournament_time(tournament_id):
             st.session_state.tournaments_list[tournament_idx]['status'] = 'completed'
             
             # Сохраняем данные в файл
-            from storage import save_tournaments_data
-            save_tournaments_data()
+            storage.save_tournaments_data()
     
     return elapsed_minutes, elapsed_seconds, remaining_minutes, remaining_seconds
 
 def display_tournament_history():
     """
     Отображает историю турниров и статистику игроков по турнирам
+    
+    Игры турнира читаются из колоночного архива с фильтром по турниру,
+    поэтому доступны и турниры, проведенные в прошлых сессиях.
     """
-    if 'tournament_history' not in st.session_state or not st.session_state.tournament_history:
-        st.info("История турниров пуста. Проведите хотя бы один турнир для отображения истории.")
-        return
+    import storage
+    import history_archive
+    
+    tournament_history = st.session_state.get('tournament_history', {})
     
-    # Выбор турнира для просмотра истории
-    tournament_options = []
-    for tournament_id, data in st.session_state.tournament_history.items():
+    # Турниры с играми: из истории текущей сессии и из архива
+    tournament_names = {}
+    for tournament_id, data in tournament_history.items():
         if 'tournament_info' in data and 'tournament_name' in data['tournament_info']:
-            tournament_options.append(f"{tournament_id} - {data['tournament_info']['tournament_name']}")
+            tournament_names[int(tournament_id)] = data['tournament_info']['tournament_name']
     
-    if not tournament_options:
-        st.info("Нет данных о завершенных турнирах.")
+    list_names = {t['id']: t.get('name') for t in st.session_state.get('tournaments_list', []) if 'id' in t}
+    for tournament_id in history_archive.archived_tournament_ids():
+        if tournament_id not in tournament_names:
+            tournament_names[tournament_id] = list_names.get(tournament_id) or f"Турнир {tournament_id}"
+    
+    if not tournament_names:
+        st.info("История турниров пуста. Проведите хотя бы один турнир для отображения истории.")
         return
     
+    tournament_options = [f"{tournament_id} - {name}" for tournament_id, name in sorted(tournament_names.items())]
+    
     selected_tournament = st.selectbox("Выберите турнир для просмотра истории", tournament_options)
     
     if selected_tournament:
         # Извлекаем ID турнира из выбора
         tournament_id = int(selected_tournament.split(' - ')[0])
         
-        # Получаем данные турнира
-        tournament_data = st.session_state.tournament_history.get(tournament_id)
+        # Читаем только игры выбранного турнира (остальные разделы архива не читаются)
+        games = storage.load_history_frame(tournament_id=tournament_id)
+        
+        # Отображаем информацию о турнире
+        st.subheader(f"История турнира: {tournament_names.get(tournament_id, 'Неизвестный турнир')}")
+        
+        st.write(f"Всего игр: {len(games)}")
         
-        if not tournament_data:
-            st.error("Данные о турнире не найдены.")
+        if games.empty:
             return
         
-        # Отображаем информацию о турнире
-        tournament_info = tournament_data.get('tournament_info', {})
-        st.subheader(f"История турнира: {tournament_info.get('tournament_name', 'Неизвестный турнир')}")
+        # Имена игроков через словарь вместо поиска по DataFrame для каждого игрока
+        players_df = st.session_state.players_df.drop_duplicates('id')
+        player_names = pd.Series(players_df['name'].values, index=players_df['id'].astype('int64'))
         
-        # Суммарная статистика турнира
-        games = tournament_data.get('games', [])
+        def slot_names(slot):
+            ids = games[slot].astype('Int64')
+            names = ids.map(player_names)
+            return names.fillna("Игрок " + ids.astype(str)).where(ids.notna(), None)
         
-        st.write(f"Всего игр: {len(games)}")
+        def team_names(first_slot, second_slot):
+            first, second = slot_names(first_slot), slot_names(second_slot)
+            return (first + ', ' + second).fillna(first).fillna(second).fillna('')
         
         # Таблица игр
-        if games:
-            games_data = []
-            for i, game in enumerate(games):
-                team_a_names = []
-                team_b_names = []
-                
-                # Получаем имена игроков
-                for player_id in game['team_a_players']:
-                    player_name = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id, 'name'].values[0]
-                    team_a_names.append(player_name)
-                
-                for player_id in game['team_b_players']:
-                    player_name = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id, 'name'].values[0]
-                    team_b_names.append(player_name)
-                
-                games_data.append({
-                    'game_number': i + 1,
-                    'court_number': game['court_number'],
-                    'team_a': ', '.join(team_a_names),
-                    'team_b': ', '.join(team_b_names),
-                    'score': f"{game['team_a_score']} - {game['team_b_score']}",
-                    'timestamp': game['timestamp']
-                })
-            
-            games_df = pd.DataFrame(games_data)
-            
-            # Отображаем таблицу игр
-            st.write("### Игры турнира")
-            st.dataframe(
-                games_df,
-                column_config={
-                    'game_number': 'Игра',
-                    'court_number': 'Корт',
-                    'team_a': 'Команда A',
-                    'team_b': 'Команда B',
-                    'score': 'Счет (A-B)',
-                    'timestamp': 'Время'
-                },
-                use_container_width=True,
-                hide_index=True
-            )
+        games_df = pd.DataFrame({
+            'game_number': range(1, len(games) + 1),
+            'court_number': games['court_number'],
+            'team_a': team_names('team_a_p1', 'team_a_p2'),
+            'team_b': team_names('team_b_p1', 'team_b_p2'),
+            'score': games['team_a_score'].astype(str) + ' - ' + games['team_b_score'].astype(str),
+            'timestamp': games['timestamp']
+        })
+        
+        # Отображаем таблицу игр
+        st.write("### Игры турнира")
+        st.dataframe(
+            games_df,
+            column_config={
+                'game_number': 'Игра',
+                'court_number': 'Корт',
+                'team_a': 'Команда A',
+                'team_b': 'Команда B',
+                'score': 'Счет (A-B)',
+                'timestamp': 'Время'
+            },
+            use_container_width=True,
+            hide_index=True
+        )
         
         # Статистика игроков
         st.write("### Статистика игроков по турниру")
         
-        player_stats = tournament_data.get('player_stats', {})
+        # Агрегируем строки "игрок - игра" одной группировкой
+        player_rows = history_archive.explode_player_rows(games)
+        player_stats_df = player_rows.groupby('player_id').agg(
+            games=('won', 'size'),
+            wins=('won', 'sum'),
+            points_scored=('score', 'sum'),
+            points_conceded=('opponent_score', 'sum')
+        ).reset_index()
+        player_stats_df['losses'] = player_stats_df['games'] - player_stats_df['wins']
+        player_stats_df['win_rate'] = (player_stats_df['wins'] / player_stats_df['games'] * 100).map(lambda rate: f"{rate:.1f}%")
+        player_stats_df['points_difference'] = player_stats_df['points_scored'] - player_stats_df['points_conceded']
+        player_stats_df['player_name'] = player_stats_df['player_id'].map(player_names)
+        missing_names = player_stats_df['player_name'].isna()
+        player_stats_df.loc[missing_names, 'player_name'] = "Игрок " + player_stats_df.loc[missing_names, 'player_id'].astype(str)
         
-        if player_stats:
-            player_stats_data = []
-            
-            for player_id, stats in player_stats.items():
-                player_name = st.session_state.players_df.loc[st.session_state.players_df['id'] == player_id, 'name'].values[0]
-                
-                # Рассчитываем процент побед
-                total_games = stats['wins'] + stats['losses']
-                win_rate = (stats['wins'] / total_games * 100) if total_games > 0 else 0
-                
-                player_stats_data.append({
-                    'player_name': player_name,
-                    'games': total_games,
-                    'wins': stats['wins'],
-                    'losses': stats['losses'],
-                    'win_rate': f"{win_rate:.1f}%",
-                    'points_scored': stats['points_scored'],
-                    'points_conceded': stats['points_conceded'],
-                    'points_difference': stats['points_scored'] - stats['points_conceded']
-                })
-            
-            # Сортируем по проценту побед
-            player_stats_df = pd.DataFrame(player_stats_data)
-            player_stats_df = player_stats_df.sort_values(by='wins', ascending=False)
-            
-            # Отображаем таблицу со статистикой
-            st.dataframe(
-                player_stats_df,
-                column_config={
-                    'player_name': 'Игрок',
-                    'games': 'Игры',
-                    'wins': 'Победы',
-                    'losses': 'Поражения',
-                    'win_rate': 'Процент побед',
-                    'points_scored': 'Очки забиты',
-                    'points_conceded': 'Очки пропущены',
-                    'points_difference': 'Разница очков'
-                },
-                use_container_width=True,
-                hide_index=True
-            )
+        # Сортируем по количеству побед
+        player_stats_df = player_stats_df[[
+            'player_name', 'games', 'wins', 'losses', 'win_rate',
+            'points_scored', 'points_conceded', 'points_difference'
+        ]].sort_values(by='wins', ascending=False)
+        
+        # Отображаем таблицу со статистикой
+        st.dataframe(
+            player_stats_df,
+            column_config={
+                'player_name': 'Игрок',
+                'games': 'Игры',
+                'wins': 'Победы',
+                'losses': 'Поражения',
+                'win_rate': 'Процент побед',
+                'points_scored': 'Очки забиты',
+                'points_conceded': 'Очки пропущены',
+                'points_difference': 'Разница очков'
+            },
+            use_container_width=True,
+            hide_index=True
+        )
 
 def display_tournament():
     """